@@ -0,0 +1,355 @@
+# Aggregates of the log shared by the charts and tables.
+# Most views need push-ups per day and user (or sums of that). Instead of every view
+# parsing the timestamps and grouping the whole log on every rerun, the day-by-user matrix
+# is built once per version of the shared log (see SharedLog.aggregates()), and so is the
+# week x user x weekday x hour cube behind the heatmap (see SharedLog.activity()).
+# New and deleted entries are applied to both incrementally: only the affected cells and the
+# running totals from the affected day (or week) on are touched.
+import numpy as np
+import pandas as pd
+
+from storage import WEEKDAYS
+
+# Days of the floating average in the user stats
+ROLLING_WINDOW = 7
+
+
+# Function to sum up entries per day and user
+def group_entries(log_data):
+    """
+    :param log_data: DataFrame with 'Timestamp', 'Reps', and 'User' columns (and 'Date' if ingested)
+    :return: Series of push-ups indexed by (Date, User)
+    """
+    if 'Date' in log_data.columns:
+        dates = log_data['Date']
+    else:
+        dates = pd.to_datetime(log_data['Timestamp']).dt.normalize().rename('Date')
+    grouped = log_data['Reps'].astype('int64').groupby([dates, log_data['User']], observed=True).sum()
+    # Plain user names as column labels, also if User is categorical
+    return grouped.set_axis(grouped.index.set_levels(grouped.index.levels[1].astype(object), level='User'))
+
+
+class DailyAggregates:
+    """
+    Dense Date x User matrix of push-ups plus the sums the views need.
+      daily             - DataFrame, one row per day from the first to the last logged day
+                          (days without entries are 0), one column per user (sorted by name)
+      cumulative        - running totals of `daily` per user
+      daily_totals      - Series, push-ups per day of all users together
+      cumulative_totals - running total of `daily_totals`
+    Treat all of them as read-only, they are shared by every session. add() and remove()
+    update them in place (SharedLog calls them while holding its lock).
+    """
+
+    def __init__(self, daily):
+        """
+        :param daily: Dense Date x User DataFrame of push-ups (DatetimeIndex named 'Date')
+        """
+        # The frames below are views on these arrays, so updating a cell updates the frames
+        self._daily = np.array(daily.to_numpy(dtype='int64'), order='C')
+        self._cumulative = self._daily.cumsum(axis=0)
+        self._daily_totals = self._daily.sum(axis=1)
+        self._cumulative_totals = self._daily_totals.cumsum()
+
+        index, columns = daily.index.rename('Date'), daily.columns.rename('User')
+        self.daily = pd.DataFrame(self._daily, index=index, columns=columns, copy=False)
+        self.cumulative = pd.DataFrame(self._cumulative, index=index, columns=columns, copy=False)
+        self.daily_totals = pd.Series(self._daily_totals, index=index, copy=False)
+        self.cumulative_totals = pd.Series(self._cumulative_totals, index=index, copy=False)
+
+    @classmethod
+    def from_log(cls, log_data):
+        """
+        :param log_data: DataFrame containing the pushup logs with 'Timestamp', 'Reps', and 'User' columns
+        :return: DailyAggregates of the log
+        """
+        return cls._from_grouped(group_entries(log_data))
+
+    @classmethod
+    def _from_grouped(cls, grouped):
+        daily = grouped[grouped != 0].unstack(fill_value=0)
+        if not daily.empty:
+            # Days without any entries get a row of zeros
+            daily = daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq='D', name='Date'), fill_value=0)
+        return cls(daily)
+
+    @property
+    def users(self):
+        """
+        :return: List of the users that have entries
+        """
+        return list(self.daily.columns)
+
+    def user_daily(self, user):
+        """
+        :param user: Name of the user
+        :return: Series of the user's push-ups per day, from their first to their last logged day
+        """
+        if user not in self.daily.columns:
+            return pd.Series(dtype='int64', index=pd.DatetimeIndex([], name='Date'), name=user)
+        column = self.daily[user]
+        logged = column[column > 0]
+        return column.loc[logged.index.min():logged.index.max()]
+
+    def day(self, day):
+        """
+        :param day: The day (anything pd.Timestamp accepts)
+        :return: Series of push-ups per user on that day (only users with entries)
+        """
+        day = pd.Timestamp(day).normalize()
+        if day not in self.daily.index:
+            return pd.Series(dtype='int64', name='Reps')
+        row = self.daily.loc[day]
+        return row[row > 0].rename('Reps')
+
+    def total(self):
+        """
+        :return: Push-ups of all users over the whole log
+        """
+        return int(self._cumulative_totals[-1]) if len(self._cumulative_totals) else 0
+
+    # Incremental updates
+
+    def add(self, entries):
+        """
+        Adds new log entries.
+        :param entries: DataFrame with 'Timestamp', 'Reps', and 'User' columns
+        :return: The updated DailyAggregates - `self`, or a new object if a day or user was
+                 added to the matrix (then the old object stays unchanged)
+        """
+        return self._apply(group_entries(entries))
+
+    def remove(self, entries):
+        """
+        Takes deleted log entries out again. Same return value as add().
+        :param entries: DataFrame with 'Timestamp', 'Reps', and 'User' columns
+        """
+        return self._apply(-group_entries(entries))
+
+    def _apply(self, changes):
+        changes = changes[changes != 0]
+        if changes.empty:
+            return self
+        days = changes.index.get_level_values('Date')
+        users = changes.index.get_level_values('User')
+        rows = self.daily.index.get_indexer(days)
+        columns = self.daily.columns.get_indexer(users)
+        if (rows == -1).any() or (columns == -1).any():
+            # New day or user: the matrix changes shape, rebuild it from the old cells plus the changes
+            if self.daily.empty:
+                return self._from_grouped(changes)
+            return self._from_grouped(self.daily.stack().add(changes, fill_value=0))
+
+        for row, column, amount in zip(rows, columns, changes.to_numpy()):
+            self._daily[row, column] += amount
+            self._cumulative[row:, column] += amount
+            self._daily_totals[row] += amount
+            self._cumulative_totals[row:] += amount
+
+        if changes.lt(0).any() and (not self._daily[0].any() or not self._daily[-1].any()
+                                    or not self._daily.any(axis=0).all()):
+            # A user or the first/last logged day lost its last entry, trim the matrix
+            return self._from_grouped(self.daily.stack())
+        return self
+
+    # Consistency check
+
+    def differences(self, log_data):
+        """
+        Compares the aggregates with a full recompute from the log (for tests and checks
+        of the incremental updates).
+        :param log_data: The log the aggregates should describe
+        :return: List of the mismatching parts, empty if everything matches
+        """
+        expected = DailyAggregates.from_log(log_data)
+        mismatches = []
+        for name in ['daily', 'cumulative', 'daily_totals', 'cumulative_totals']:
+            mine, theirs = getattr(self, name), getattr(expected, name)
+            if not (mine.index.equals(theirs.index) and np.array_equal(mine.to_numpy(), theirs.to_numpy())
+                    and (name.endswith('totals') or mine.columns.equals(theirs.columns))):
+                mismatches.append(name)
+        return mismatches
+
+
+# Function to compute the stats of every user over a range of days in one pass
+def user_stats(aggregates, start, end, window=ROLLING_WINDOW, projection_days=None, users=None):
+    """
+    Works on the whole Date x User matrix at once, so the stats of all users cost about as
+    much as the stats of one (O(days x users)).
+    :param aggregates: DailyAggregates of the log
+    :param start: First day (anything pd.Timestamp accepts)
+    :param end: Last day, included (e.g. today or the end of the season)
+    :param window: Days of the floating average
+    :param projection_days: Number of days to project the average on (e.g. the whole season),
+                            None to project on start..end
+    :param users: Users to include (also if they have no entries), None for all users in the log
+    :return: DataFrame with one row per user (index 'User') and the columns 'Total', 'Average',
+             'Floating Average' (over the last `window` days), 'Standard Deviation' and 'Expected'
+             (Average x projection_days), rounded like the stats table shows them
+    """
+    days = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D', name='Date')
+    users = aggregates.users if users is None else list(users)
+    # Days before the first or after the last logged day count as 0, like days without entries
+    daily = aggregates.daily.reindex(index=days, columns=users, fill_value=0).to_numpy(dtype='float64')
+    projection_days = len(days) if projection_days is None else projection_days
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average = daily.mean(axis=0).round(1) if len(days) else np.full(len(users), np.nan)
+        stats = pd.DataFrame({
+            'Total': daily.sum(axis=0).astype('int64'),
+            'Average': average,
+            'Floating Average': daily[-window:].mean(axis=0).round(1) if len(days) else average,
+            'Standard Deviation': daily.std(axis=0, ddof=1).round(1) if len(days) > 1 else np.full(len(users), np.nan),
+            'Expected': (average * projection_days).round(0),
+        }, index=pd.Index(users, name='User'))
+    return stats
+
+
+class ActivityCube:
+    """
+    Push-ups per week, user, weekday and hour as one NumPy array, for the heatmap.
+    Switching the user (or "All Users") is a slice of it instead of a groupby over the log.
+    Next to the weekly counts it keeps their running totals over the weeks, so the heatmap
+    of any range of weeks is the difference of two slices.
+      weekly - array (weeks, users, 7, 24), week 0 starts on the Monday `origin`
+      prefix - array (weeks + 1, users, 7, 24), prefix[w] = sum of weekly[:w]
+    Like DailyAggregates it is shared by all sessions and updated in place by add()/remove().
+    """
+
+    def __init__(self, weekly, users, origin):
+        """
+        :param weekly: Array (weeks, users, 7, 24) of push-ups
+        :param users: List of the user names (second axis)
+        :param origin: Monday the first week starts on (Timestamp)
+        """
+        self.weekly = weekly
+        self.users = list(users)
+        self.origin = origin
+        self.prefix = np.concatenate((np.zeros((1,) + weekly.shape[1:], dtype='int64'), weekly.cumsum(axis=0)))
+
+    @staticmethod
+    def _keys(entries):
+        """Timestamps of the entries split into (day, weekday, hour) arrays."""
+        timestamps = pd.to_datetime(entries['Timestamp'])
+        return (timestamps.dt.normalize().to_numpy(), timestamps.dt.weekday.to_numpy(),
+                timestamps.dt.hour.to_numpy())
+
+    @classmethod
+    def from_log(cls, log_data):
+        """
+        :param log_data: DataFrame with 'Timestamp', 'Reps', and 'User' columns
+        :return: ActivityCube of the log
+        """
+        users = sorted(log_data['User'].unique())
+        if not len(log_data):
+            return cls(np.zeros((0, 0, 7, 24), dtype='int64'), [], None)
+        days, weekdays, hours = cls._keys(log_data)
+        origin = pd.Timestamp(days.min()) - pd.Timedelta(days=pd.Timestamp(days.min()).weekday())
+        weeks = (days - origin.to_datetime64()) // np.timedelta64(7, 'D')
+        user_codes = pd.Categorical(log_data['User'], categories=users).codes
+        shape = (int(weeks.max()) + 1, len(users), 7, 24)
+        cells = np.ravel_multi_index((weeks, user_codes, weekdays, hours), shape)
+        weekly = np.bincount(cells, weights=log_data['Reps'].to_numpy(dtype='int64'),
+                             minlength=int(np.prod(shape))).astype('int64').reshape(shape)
+        return cls(weekly, users, origin)
+
+    def week(self, day):
+        """
+        :param day: The day (anything pd.Timestamp accepts)
+        :return: Index of the week the day falls into (may be outside the cube)
+        """
+        return (pd.Timestamp(day).normalize() - self.origin).days // 7
+
+    def heatmap(self, user=None, start=None, end=None):
+        """
+        :param user: Name of a user, None for all users together
+        :param start: First day to include (the whole week it falls into counts), None for no lower bound
+        :param end: Last day to include (the whole week it falls into counts), None for no upper bound
+        :return: DataFrame of push-ups, one row per weekday (WEEKDAYS order) and one column per hour (0-23)
+        """
+        weeks = len(self.weekly)
+        first = 0 if start is None or self.origin is None else min(max(self.week(start), 0), weeks)
+        last = weeks if end is None or self.origin is None else min(max(self.week(end) + 1, 0), weeks)
+        cube = self.prefix[max(last, first)] - self.prefix[first]
+        if user is None:
+            counts = cube.sum(axis=0)
+        elif user in self.users:
+            counts = cube[self.users.index(user)]
+        else:
+            counts = np.zeros((7, 24), dtype='int64')
+        return pd.DataFrame(counts, index=pd.Index(WEEKDAYS, name='Weekday'), columns=pd.RangeIndex(24, name='Hour'))
+
+    # Incremental updates
+
+    def add(self, entries):
+        """
+        Adds new log entries.
+        :param entries: DataFrame with 'Timestamp', 'Reps', and 'User' columns
+        :return: The updated ActivityCube - `self`, or a new object if a week or user was added
+        """
+        return self._apply(entries, 1)
+
+    def remove(self, entries):
+        """
+        Takes deleted log entries out again (weeks and users stay in the cube). Same return value as add().
+        :param entries: DataFrame with 'Timestamp', 'Reps', and 'User' columns
+        """
+        return self._apply(entries, -1)
+
+    def _apply(self, entries, sign):
+        if not len(entries):
+            return self
+        days, weekdays, hours = self._keys(entries)
+        users = list(entries['User'])
+        if self.origin is None or days.min() < self.origin.to_datetime64() or any(user not in self.users for user in users):
+            # New user or week before the first one: rebuild from the weekly counts plus the entries
+            return self._grown(days, users)._apply(entries, sign)
+        weeks = (days - self.origin.to_datetime64()) // np.timedelta64(7, 'D')
+        if weeks.max() >= len(self.weekly):
+            return self._grown(days, users)._apply(entries, sign)
+
+        for week, user, weekday, hour, amount in zip(weeks, users, weekdays, hours, entries['Reps'].to_numpy(dtype='int64')):
+            column = self.users.index(user)
+            self.weekly[week, column, weekday, hour] += sign * amount
+            self.prefix[week + 1:, column, weekday, hour] += sign * amount
+        return self
+
+    def _grown(self, days, users):
+        """New cube covering the current weeks and users plus the given days and users (all zero there)."""
+        first_day = pd.Timestamp(days.min()) if self.origin is None else min(self.origin, pd.Timestamp(days.min()))
+        origin = first_day - pd.Timedelta(days=first_day.weekday())
+        last_day = pd.Timestamp(days.max())
+        if self.origin is not None:
+            last_day = max(last_day, self.origin + pd.Timedelta(weeks=len(self.weekly)) - pd.Timedelta(days=1))
+        all_users = sorted(set(self.users) | set(users))
+        weekly = np.zeros(((last_day - origin).days // 7 + 1, len(all_users), 7, 24), dtype='int64')
+        if self.origin is not None and len(self.users):
+            offset = (self.origin - origin).days // 7
+            columns = [all_users.index(user) for user in self.users]
+            weekly[offset:offset + len(self.weekly), columns] = self.weekly
+        return ActivityCube(weekly, all_users, origin)
+
+    # Consistency check
+
+    def differences(self, log_data):
+        """
+        Compares the cube with a full recompute from the log (for tests and checks of the
+        incremental updates). Weeks and users that are all zero are ignored.
+        :param log_data: The log the cube should describe
+        :return: List of the mismatching parts, empty if everything matches
+        """
+        expected = ActivityCube.from_log(log_data)
+        mismatches = []
+        if not np.array_equal(self.prefix[1:], self.weekly.cumsum(axis=0)):
+            mismatches.append('prefix')
+        for user in sorted(set(self.users) | set(expected.users)):
+            if not self.heatmap(user).equals(expected.heatmap(user)):
+                mismatches.append(f'heatmap of {user}')
+        if expected.origin is not None:
+            # The same weeks must hold the same counts (the cube may cover more weeks than the log)
+            for week in range(len(expected.weekly)):
+                day = expected.origin + pd.Timedelta(weeks=week)
+                if not self.heatmap(None, day, day).equals(expected.heatmap(None, day, day)):
+                    mismatches.append(f'week of {day:%Y-%m-%d}')
+                    break
+        return mismatches
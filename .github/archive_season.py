@@ -0,0 +1,112 @@
+#### SCRIPT TO MOVE FINISHED SEASONS OUT OF THE ACTIVE LOG
+# Run with: streamlit run .github/archive_season.py  (uses the same secrets as the app)
+# Every season except the current one gets its own log file (e.g. 'pushup_log_2025.csv'),
+# its entries are removed from the active log and the manifest (seasons.csv) lists them all.
+# The app then only loads the current season and offers the others in its season selector.
+# Run it once to set up the manifest and again after every season. The proposed seasons are
+# calendar years and can be edited before archiving (e.g. let 2025 start on 2024-12-31).
+# Safe to run while the app is in use: the active log is rewritten with the same
+# merge-and-retry as deleting entries, sets logged in the meantime are kept.
+# Every discipline has its own seasons (e.g. 'squat_log_2025.csv' listed in 'squat_seasons.csv'),
+# pick the discipline to archive at the top.
+
+
+import pandas as pd
+import streamlit as st
+
+from disciplines import DISCIPLINES, PUSHUPS
+from seasons import Season, calendar_season, manifest_frame, parse_manifest, same_log, season_log_name
+from storage import log_file_name, log_row_keys, merge_log_deltas
+from storage_setup import make_storage
+
+### STORAGE SETUP (same settings as the app)
+STORAGE_CONFIG = dict(st.secrets.get("storage", {}))
+
+storage = make_storage(st.secrets)
+
+LOG_FORMAT = STORAGE_CONFIG.get("log_format", "csv")
+
+
+st.title("Archive finished seasons")
+
+discipline = DISCIPLINES[st.selectbox("Discipline", list(DISCIPLINES), format_func=lambda name: DISCIPLINES[name].label)]
+LOG_FILE_NAME = discipline.log_name(LOG_FORMAT)
+MANIFEST_NAME = discipline.manifest_name
+# Seasons that were kept in their own file before there was a manifest (only push-ups have one)
+LEGACY_SEASONS = {"2022": log_file_name("pushup_log_2022", LOG_FORMAT)} if discipline == PUSHUPS else {}
+
+log, revision, deltas = storage.read_log(LOG_FILE_NAME)
+if log is None:
+    st.error(f"{LOG_FILE_NAME} not found.")
+    st.stop()
+timestamps = pd.to_datetime(log['Timestamp'])
+today = pd.Timestamp.now().normalize()
+
+# Known seasons from the manifest, or the legacy files plus one season per calendar year of the active log
+manifest = storage.fetch(MANIFEST_NAME)
+if manifest is not None:
+    known = parse_manifest(manifest)
+else:
+    known = [calendar_season(int(name), file_name) for name, file_name in LEGACY_SEASONS.items()
+             if storage.file_version(file_name) is not None]
+known_names = {season.name for season in known}
+for year in sorted(set(timestamps.dt.year) | {today.year}):
+    if str(year) not in known_names:
+        known.append(calendar_season(year, LOG_FILE_NAME))
+
+proposal = manifest_frame(known)
+st.write(f"{LOG_FILE_NAME}: {len(log):,} entries from {timestamps.min():%Y-%m-%d} to {timestamps.max():%Y-%m-%d}. "
+         "Seasons that are over get their own log file:")
+edited = st.data_editor(proposal, num_rows="dynamic", hide_index=True, disabled=["Log"])
+
+seasons = []
+for row in edited.itertuples(index=False):
+    start, end = pd.Timestamp(row.Start).normalize(), pd.Timestamp(row.End).normalize()
+    # The season containing today stays in the active log, all others are archived
+    log_name = LOG_FILE_NAME if start <= today <= end else (
+        row.Log if isinstance(row.Log, str) and not same_log(row.Log, LOG_FILE_NAME) else season_log_name(LOG_FILE_NAME, row.Season))
+    seasons.append(Season(str(row.Season), log_name, start, end))
+
+if sum(season.log_name == LOG_FILE_NAME for season in seasons) != 1:
+    st.error(f"Exactly one season has to contain today ({today:%Y-%m-%d}).")
+    st.stop()
+
+# Entries of the active log per archived season
+moves = []
+in_a_season = pd.Series(False, index=log.index)
+for season in seasons:
+    mask = (timestamps >= season.start) & (timestamps < season.end + pd.Timedelta(days=1))
+    in_a_season |= mask
+    if season.log_name != LOG_FILE_NAME and mask.any():
+        moves.append((season, mask))
+if not in_a_season.all():
+    st.warning(f"{(~in_a_season).sum()} entries don't belong to any season, they stay in {LOG_FILE_NAME}.")
+
+for season, mask in moves:
+    st.write(f"Season {season.name}: {mask.sum():,} entries -> {season.log_name}")
+
+if st.button("Archive", disabled=not moves and manifest is not None):
+    moved = pd.Series(False, index=log.index)
+    for season, mask in moves:
+        entries = log[mask]
+        # Add to the season's file if it exists already (entries that are in it already are skipped)
+        archived, archived_revision, archived_deltas = storage.read_log(season.log_name)
+        if archived is None:
+            archived_revision = storage.get_log_revision(season.log_name)[0]
+            archived = entries.iloc[0:0]
+        written, written_revision = storage.write_log(merge_log_deltas(archived, [entries]), season.log_name,
+                                                      archived_revision, archived)
+
+        # Make sure nothing got lost on the way before taking the entries out of the active log
+        check = storage.read_log(season.log_name)[0]
+        if check is None or not log_row_keys(entries).isin(log_row_keys(check)).all():
+            st.error(f"{season.log_name}: check failed, the entries of season {season.name} stay in {LOG_FILE_NAME}.")
+            continue
+        moved |= mask
+        st.write(f"{season.log_name}: {len(check):,} entries")
+
+    storage.push(manifest_frame(seasons), MANIFEST_NAME)
+    if moved.any():
+        storage.write_log(log[~moved], LOG_FILE_NAME, revision, log)
+    st.success(f"Done. {moved.sum():,} entries archived, {LOG_FILE_NAME} keeps the season "
+               f"{next(season.name for season in seasons if season.log_name == LOG_FILE_NAME)}.")
@@ -0,0 +1,104 @@
+#### CHART BENCHMARK
+# Measures the figure builders in charts.py on a synthetic multi-year log:
+#   - build time (median of several runs, data already loaded and aggregated)
+#   - number of traces
+#   - payload size, i.e. the figure JSON the browser receives (what st.plotly_chart sends)
+#   - time to serialize that JSON
+# Needs no storage backend and no running app.
+#
+# Usage: python .github/benchmark_charts.py [--years 3] [--entries-per-day 6] [--runs 5] [--json]
+
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_startup import USERS, sample_log
+
+
+# Function to list the figures the app builds, as (name, builder without arguments)
+def chart_builders(log_data, aggregates, user_colors):
+    """
+    :param log_data: Ingested log
+    :param aggregates: DailyAggregates of the log
+    :param user_colors: Dictionary mapping each user to a color
+    :return: List of (name, function returning the figure)
+    """
+    import charts
+    from aggregates import ActivityCube
+
+    # Built once per log version by the app, like the aggregates
+    activity = ActivityCube.from_log(log_data)
+    users = list(user_colors)
+    username = users[0]
+    month = log_data['Month'].iloc[-1]
+    return [
+        ("heatmap", lambda: charts.heatmap_figure(activity, "All Users")),
+        ("monthly_accumulated", lambda: charts.monthly_accumulated_figure(log_data, month, user_colors)),
+        ("user_daily_average", lambda: charts.user_daily_average_figure(aggregates, username)),
+        ("accumulated", lambda: charts.accumulated_figure(log_data, users, user_colors)),
+        ("time_series", lambda: charts.time_series_figure(aggregates, users, user_colors)),
+        ("dominance", lambda: charts.dominance_figure(aggregates, users, username, user_colors)),
+        ("total_accumulated", lambda: charts.total_accumulated_figure(aggregates)),
+        ("total_accumulated_by_user", lambda: charts.total_accumulated_by_user_figure(aggregates, username, user_colors)),
+        ("daily_contributions", lambda: charts.daily_contributions_figure(aggregates, username, user_colors)),
+    ]
+
+
+# Function to time one figure builder
+def measure(build, runs):
+    """
+    :param build: Function returning the figure
+    :param runs: Number of repetitions
+    :return: Dictionary with the median build and serialization time in seconds, trace count and payload bytes
+    """
+    import plotly.io as pio
+
+    build_times, serialize_times = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fig = build()
+        build_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        payload = pio.to_json(fig, validate=False)
+        serialize_times.append(time.perf_counter() - start)
+    return {"build": statistics.median(build_times), "serialize": statistics.median(serialize_times),
+            "traces": len(fig.data), "payload_bytes": len(payload.encode("utf-8"))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure build time and payload size of the charts")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--entries-per-day", type=int, default=6)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    from storage import ingest_log
+    from aggregates import DailyAggregates
+
+    log_data = ingest_log(sample_log(days=args.years * 365, entries_per_day=args.entries_per_day))
+    aggregates = DailyAggregates.from_log(log_data)
+    user_colors = {user: color for user, color in zip(USERS, ["#8dd3c7", "#ffffb3", "#bebada"])}
+
+    result = {"rows": len(log_data), "days": len(aggregates.daily), "runs": args.runs, "charts": {}}
+    for name, build in chart_builders(log_data, aggregates, user_colors):
+        result["charts"][name] = measure(build, args.runs)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['rows']} entries over {result['days']} days (median of {args.runs} runs)")
+    print(f"  {'chart':<27} {'build':>9} {'serialize':>10} {'traces':>7} {'payload':>10}")
+    for name, chart in result["charts"].items():
+        print(f"  {name:<27} {chart['build'] * 1000:6.0f} ms {chart['serialize'] * 1000:7.0f} ms "
+              f"{chart['traces']:7d} {chart['payload_bytes'] / 1024:7.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
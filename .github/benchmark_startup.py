@@ -0,0 +1,144 @@
+#### STARTUP BENCHMARK
+# Measures how long a fresh server process needs until the app shows something:
+#   - import of streamlit itself (same for every version of the app)
+#   - first run of the script (login page, nobody logged in yet)
+#   - first render after logging in (all charts)
+# Every repetition runs in a new Python process, so nothing is cached between them.
+# Runs against the "local" storage backend with a synthetic log, no credentials needed.
+#
+# Usage: python .github/benchmark_startup.py [--app path/to/streamlit_app.py] [--runs 5] [--json]
+# To compare with an older version, export it and point --app at it, e.g.
+#   mkdir /tmp/before && git archive <commit> .github | tar -x -C /tmp/before
+#   python .github/benchmark_startup.py --app /tmp/before/.github/streamlit_app.py
+
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Modules that are expensive to import and shouldn't be needed before a chart renders
+# (plotly.graph_objects is left out, streamlit itself imports it)
+HEAVY_MODULES = ["plotly.express", "seaborn", "matplotlib", "googleapiclient.discovery", "googleapiclient.http", "httplib2"]
+
+USERS = {"alice": "1111", "bob": "2222", "carol": "3333"}
+
+
+# Function to generate a synthetic log
+def sample_log(days=365, entries_per_day=6, users=USERS):
+    """
+    :param days: Number of days the log covers (ending today)
+    :param entries_per_day: Number of entries per day
+    :param users: Names of the users logging sets
+    :return: DataFrame with 'Timestamp', 'Pushups', 'User' and 'comment' columns, as stored
+    """
+    import pandas as pd
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    count = days * entries_per_day
+    end = pd.Timestamp.now().floor("s")
+    timestamps = end - pd.to_timedelta(np.sort(rng.integers(0, days * 86400, count))[::-1], unit="s")
+    return pd.DataFrame({
+        "Timestamp": timestamps.strftime("%Y-%m-%d %H:%M:%S"),
+        "Pushups": rng.integers(5, 40, count),
+        "User": rng.choice(list(users), count),
+        "comment": None,
+    })
+
+
+# Function to write a synthetic log for the local backend
+def write_sample_log(directory, days=365, entries_per_day=6):
+    """
+    :param directory: Directory of the local storage backend
+    :param days: Number of days the log covers (ending today)
+    :param entries_per_day: Number of entries per day
+    """
+    import pandas as pd
+
+    log = sample_log(days, entries_per_day)
+    log.to_csv(os.path.join(directory, "pushup_log.csv"), index=False)
+    log.head(50).to_csv(os.path.join(directory, "pushup_log_2022.csv"), index=False)
+    pd.DataFrame(columns=["Timestamp", "Username", "Suggestion"]).to_csv(
+        os.path.join(directory, "suggestion.csv"), index=False)
+
+
+# Function to measure one cold start (runs inside the child process)
+def measure(app_path, directory):
+    """
+    :param app_path: Path of the streamlit_app.py to run
+    :param directory: Directory holding the synthetic log
+    :return: Dictionary of timings in seconds and the heavy modules loaded before logging in
+    """
+    import time
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    import_streamlit = time.perf_counter() - start
+
+    app = AppTest.from_file(app_path, default_timeout=120)
+    app.secrets["user_database"] = USERS
+    app.secrets["storage"] = {"backend": "local", "path": directory,
+                              "journal_path": os.path.join(directory, "sync_journal.jsonl")}
+
+    start = time.perf_counter()
+    app.run()
+    login_page = time.perf_counter() - start
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    app.session_state["logged_in"] = True
+    app.session_state["username"] = "alice"
+    start = time.perf_counter()
+    app.run()
+    first_render = time.perf_counter() - start
+
+    errors = [element.value for element in app.error] + [str(element.value) for element in app.exception]
+    return {"import_streamlit": import_streamlit, "login_page": login_page, "first_render": first_render,
+            "heavy_modules_before_login": loaded, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold start of the app")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    app_path = os.path.abspath(args.app)
+
+    if args.child:
+        print(json.dumps(measure(app_path, args.child)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_sample_log(directory)
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--app", app_path, "--child", directory],
+                capture_output=True, text=True, check=True, cwd=os.path.dirname(app_path),
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    result = {"app": app_path, "runs": len(runs)}
+    for key in ["import_streamlit", "login_page", "first_render"]:
+        result[key] = statistics.median(run[key] for run in runs)
+    result["heavy_modules_before_login"] = runs[0]["heavy_modules_before_login"]
+    result["errors"] = runs[0]["errors"]
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{app_path} (median of {len(runs)} cold starts)")
+    print(f"  import streamlit        {result['import_streamlit'] * 1000:8.0f} ms")
+    print(f"  login page (first run)  {result['login_page'] * 1000:8.0f} ms")
+    print(f"  first render (charts)   {result['first_render'] * 1000:8.0f} ms")
+    print(f"  heavy modules loaded before login: {', '.join(result['heavy_modules_before_login']) or '-'}")
+    for error in result["errors"]:
+        print(f"  error shown by the app: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#### OFFLINE BENCHMARK SUITE
+# Times the hot paths of the app end to end against the in-memory Drive fake (fake_drive.py),
+# so it needs no credentials and no running app:
+#   - load:       fresh backend, download and parse the log (what a new server process does)
+#   - render_files: fresh backend, every file a logged-in render reads, one after the other
+#   - render_files_prefetched: the same after StorageBackend.prefetch() (one batch lookup, parallel downloads)
+#   - revalidate: the same read again, the content is unchanged and comes from the cache
+#   - aggregates, activity, user_stats: the per-version data the display_* functions read
+#   - one entry per chart drawn by a display_* function (the figure builders in charts.py)
+#   - submit:     journal one set and show it in the shared log (what "Log Push-Ups" waits for),
+#                 the requests include the sync queue writing it to the storage in the background
+#   - delete:     rewrite the log without the last three sets of a user (the "Did a mistake?" form)
+# Each step reports its median time and the Drive requests and bytes of one run.
+# The log is synthetic: any number of users, years and entries per day.
+#
+# Usage: python .github/benchmark_suite.py [--users 3] [--years 1] [--entries-per-day 6] [--runs 5]
+#                                          [--latency 0.05] [--json]
+# --latency makes every Drive request take that many seconds, like a real round trip.
+# With --json the result is printed as one JSON object, e.g. to compare two commits:
+#   python .github/benchmark_suite.py --json > before.json
+
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_startup import sample_log
+
+LOG_FILE_NAME = "pushup_log.csv"
+SUGGESTION_FILE_NAME = "suggestion.csv"
+
+# Colors handed to the charts, repeated if there are more users
+COLORS = ["#8dd3c7", "#ffffb3", "#bebada", "#fb8072", "#80b1d3", "#fdb462",
+          "#b3de69", "#fccde5", "#d9d9d9", "#bc80bd", "#ccebc5", "#ffed6f"]
+
+
+# Function to name the synthetic users
+def user_names(count):
+    """
+    :param count: Number of users
+    :return: List of user names ('user01', 'user02', ...)
+    """
+    return [f"user{number:02d}" for number in range(1, count + 1)]
+
+
+# Function to run one step repeatedly and count its Drive traffic
+def measure(step, runs, drive, settle=None):
+    """
+    :param step: Function without arguments (called `runs` times)
+    :param runs: Number of repetitions
+    :param drive: FakeDriveService whose counters are read
+    :param settle: Function waiting for the background work a run started (not timed, its requests count)
+    :return: Dictionary with the median time in seconds and the requests and bytes of the last run
+    """
+    times = []
+    for _ in range(runs):
+        drive.reset_counters()
+        start = time.perf_counter()
+        step()
+        times.append(time.perf_counter() - start)
+        if settle is not None:
+            settle()
+    requests = {method: count for method, count in drive.request_counts.items() if count}
+    return {"time": statistics.median(times), "requests": sum(requests.values()), "requests_by_method": requests,
+            "bytes_downloaded": drive.bytes_downloaded, "bytes_uploaded": drive.bytes_uploaded}
+
+
+# Function to run all steps on a synthetic log
+def run_suite(users, years, entries_per_day, runs, latency=0.0):
+    """
+    :param users: Number of users
+    :param years: Number of years the log covers
+    :param entries_per_day: Number of entries per day
+    :param runs: Number of repetitions per step
+    :param latency: Seconds every Drive request takes
+    :return: Dictionary with the log size and the result of every step (see measure())
+    """
+    import pandas as pd
+
+    from aggregates import ActivityCube, DailyAggregates, user_stats
+    from benchmark_charts import chart_builders
+    from fake_drive import FakeDriveService
+    from seasons import MANIFEST_NAME, calendar_season, manifest_frame
+    from shared_log import SharedLog
+    from storage import DriveBackend
+    from sync_queue import SyncQueue
+
+    names = user_names(users)
+    user_colors = {user: COLORS[index % len(COLORS)] for index, user in enumerate(names)}
+    drive = FakeDriveService(latency=latency)
+    drive.add_file(LOG_FILE_NAME, sample_log(years * 365, entries_per_day, names).to_csv(index=False))
+    drive.add_file(SUGGESTION_FILE_NAME, "Timestamp,Username,Suggestion\n")
+    drive.add_file(MANIFEST_NAME, manifest_frame([calendar_season(pd.Timestamp.now().year, LOG_FILE_NAME)]).to_csv(index=False))
+    steps = {}
+
+    # A new backend and shared log every run: nothing is cached, like in a fresh server process
+    def load():
+        SharedLog(DriveBackend(drive, drive.folder_id, http_factory=drive.new_http), LOG_FILE_NAME).snapshot()
+    steps["load"] = measure(load, runs, drive)
+
+    def render_files(prefetch):
+        storage = DriveBackend(drive, drive.folder_id, http_factory=drive.new_http)
+        if prefetch:
+            storage.prefetch([SUGGESTION_FILE_NAME, MANIFEST_NAME], [LOG_FILE_NAME])
+        SharedLog(storage, LOG_FILE_NAME).snapshot()
+        storage.fetch(SUGGESTION_FILE_NAME)
+        storage.fetch(MANIFEST_NAME)
+    steps["render_files"] = measure(lambda: render_files(False), runs, drive)
+    steps["render_files_prefetched"] = measure(lambda: render_files(True), runs, drive)
+
+    storage = DriveBackend(drive, drive.folder_id, http_factory=drive.new_http)
+    journal = tempfile.NamedTemporaryFile(suffix=".jsonl", delete=False).name
+    sync_queue = SyncQueue(storage, journal)
+    shared_log = SharedLog(storage, LOG_FILE_NAME, sync_queue)
+    log_data = shared_log.snapshot()[0]
+    steps["revalidate"] = measure(lambda: storage.fetch_log(LOG_FILE_NAME), runs, drive)
+
+    steps["aggregates"] = measure(lambda: DailyAggregates.from_log(log_data), runs, drive)
+    steps["activity"] = measure(lambda: ActivityCube.from_log(log_data), runs, drive)
+    aggregates = DailyAggregates.from_log(log_data)
+    today = log_data['Date'].max()
+    steps["user_stats"] = measure(lambda: user_stats(aggregates, today.replace(month=1, day=1), today), runs, drive)
+    for name, build in chart_builders(log_data, aggregates, user_colors):
+        steps[f"chart_{name}"] = measure(build, runs, drive)
+
+    def submit():
+        new_entry = pd.DataFrame({"Timestamp": [pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")],
+                                  "Reps": [20], "User": [names[0]], "comment": [None]})
+        new_entry = sync_queue.submit(new_entry, LOG_FILE_NAME)
+        shared_log.add_entries(new_entry)
+        shared_log.snapshot()
+    steps["submit"] = measure(submit, runs, drive, settle=sync_queue.flush)
+
+    def delete():
+        log, revision = shared_log.snapshot()[:2]
+        removed = log[log['User'] == names[0]].sort_values(by='Timestamp').tail(3)
+        written, written_revision = storage.write_log(log.drop(removed.index), LOG_FILE_NAME, revision, log)
+        shared_log.replace(written, written_revision, removed)
+    steps["delete"] = measure(delete, runs, drive)
+    os.remove(journal)
+
+    return {"users": users, "years": years, "entries_per_day": entries_per_day, "rows": len(log_data),
+            "runs": runs, "latency": latency, "steps": steps}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the hot paths of the app on a synthetic log and a fake Drive")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--entries-per-day", type=int, default=6)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every Drive request takes")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    result = run_suite(args.users, args.years, args.entries_per_day, args.runs, args.latency)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['rows']} entries of {result['users']} users over {result['years']} year(s) "
+          f"(median of {result['runs']} runs)")
+    print(f"  {'step':<34} {'time':>10} {'requests':>9} {'down':>10} {'up':>10}")
+    for name, step in result["steps"].items():
+        print(f"  {name:<34} {step['time'] * 1000:7.1f} ms {step['requests']:9d} "
+              f"{step['bytes_downloaded'] / 1024:6.0f} KiB {step['bytes_uploaded'] / 1024:6.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,568 @@
+# Plotly figures of the app.
+# The builders only turn the log (or its DailyAggregates) into a figure, streamlit_app.py
+# adds the widgets around them and draws them. That keeps them usable without a running
+# app, e.g. for timing them with benchmark_charts.py.
+# Every builder adds a fixed number of traces (at most one per user), never one per row:
+# each trace is serialized, sent to the browser and laid out separately, so per-day traces
+# make the figure grow with the length of the log.
+# Plotly is imported inside the builders, so it only loads once a chart renders.
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Most points a line of the raw-entry charts keeps (see downsample_per_user())
+POINTS_PER_TRACE = 1000
+
+# Figures with more points than this are drawn with WebGL (Scattergl) instead of SVG
+WEBGL_THRESHOLD = 1000
+
+
+### DOWNSAMPLING
+# The accumulated charts have one point per log entry. Past a few thousand entries the
+# extra points don't change what the line looks like, they only make the payload bigger
+# and the browser slower, so each line is reduced to a fixed budget of points first.
+
+# Function to pick the points of a line that keep its shape (Largest-Triangle-Three-Buckets)
+def lttb_indices(x, y, max_points):
+    """
+    Splits the points between the first and the last one into max_points - 2 buckets and
+    keeps the point of each bucket that spans the largest triangle with the point kept
+    from the previous bucket and the average of the next bucket.
+    :param x: Array of x values (ascending)
+    :param y: Array of y values
+    :param max_points: Number of points to keep
+    :return: Sorted array of the positions of the kept points (all positions if there are
+             no more than max_points)
+    """
+    count = len(x)
+    if max_points >= count or max_points < 3:
+        return np.arange(count)
+    x = np.asarray(x, dtype='float64') - float(x[0])
+    y = np.asarray(y, dtype='float64')
+
+    # Bucket i holds the positions edges[i]..edges[i + 1] - 1, the last "bucket" is the last point
+    edges = np.append(np.linspace(1, count - 1, max_points - 1).astype('int64'), count)
+    cumulative_x = np.concatenate(([0.0], np.cumsum(x)))
+    cumulative_y = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = np.diff(edges)
+    average_x = (cumulative_x[edges[1:]] - cumulative_x[edges[:-1]]) / sizes
+    average_y = (cumulative_y[edges[1:]] - cumulative_y[edges[:-1]]) / sizes
+
+    selected = np.empty(max_points, dtype='int64')
+    selected[0], selected[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_x, next_y = average_x[bucket + 1], average_y[bucket + 1]
+        # Twice the triangle area (the factor doesn't change which point is largest)
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+# Function to reduce every user's line of a long-format frame to a budget of points
+def downsample_per_user(data, x, y, max_points=POINTS_PER_TRACE):
+    """
+    :param data: DataFrame with one row per point and a 'User' column, sorted by `x` within each user
+    :param x: Name of the x column (numbers or datetimes)
+    :param y: Name of the y column
+    :param max_points: Most points kept per user (see lttb_indices())
+    :return: DataFrame with the kept rows, in their original order
+    """
+    if not max_points or len(data) <= max_points:
+        return data
+    kept = []
+    for positions in data.groupby('User', observed=True, sort=False).indices.values():
+        rows = data.iloc[positions]
+        x_values = rows[x].to_numpy()
+        if np.issubdtype(x_values.dtype, np.datetime64):
+            x_values = x_values.astype('int64')
+        kept.append(positions[lttb_indices(x_values, rows[y].to_numpy(), max_points)])
+    return data.iloc[np.sort(np.concatenate(kept))]
+
+
+# Function to choose how plotly express draws a line chart
+def render_mode(points, webgl_threshold=WEBGL_THRESHOLD):
+    """
+    :param points: Number of points in the figure
+    :param webgl_threshold: Number of points from which on WebGL is used
+    :return: 'webgl' or 'svg'
+    """
+    return 'webgl' if points > webgl_threshold else 'svg'
+
+
+# Function to build the line chart of the accumulated pushups per user
+def accumulated_figure(log_data, user_selection, user_colors, max_points=POINTS_PER_TRACE, webgl_threshold=WEBGL_THRESHOLD,
+                       unit="Pushups"):
+    """
+    :param log_data: DataFrame containing the pushup logs (as ingested by ingest_log())
+    :param user_selection: List of users to show
+    :param user_colors: Dictionary mapping each user to a color
+    :param max_points: Most points per user's line (None to keep every entry)
+    :param webgl_threshold: Number of points from which on the figure is drawn with WebGL
+    :param unit: What is counted, as shown in the labels (e.g. 'Squats')
+    :return: plotly Figure
+    """
+    import plotly.express as px
+    # Sort the data by Timestamp to ensure proper accumulation
+    filtered_data = log_data.loc[log_data['User'].isin(user_selection), ['Timestamp', 'User', 'Reps']].sort_values(by="Timestamp")
+
+    # Add the accumulated sum of push-ups per user (to this new frame, the log stays untouched)
+    filtered_data['Accumulated Reps'] = filtered_data.groupby('User', observed=True)['Reps'].cumsum().astype('int64')
+    filtered_data = downsample_per_user(filtered_data, 'Timestamp', 'Accumulated Reps', max_points)
+
+    # Create a Plotly line chart for the accumulated pushups data
+    fig = px.line(
+        filtered_data,
+        x="Timestamp",  # X-axis as Timestamp
+        y="Accumulated Reps",  # Y-axis as accumulated reps
+        color="User",  # Color by user
+        color_discrete_map=user_colors,  # Use the USER_COLORS dictionary
+        labels={"Timestamp": "Time", "Accumulated Reps": f"Accumulated {unit}"},
+        render_mode=render_mode(len(filtered_data), webgl_threshold),
+    )
+    fig.update_layout(height=500)
+    return fig
+
+
+# Function to build the line chart of the accumulated pushups per user within one month
+def monthly_accumulated_figure(log_data, month, user_colors, max_points=POINTS_PER_TRACE, webgl_threshold=WEBGL_THRESHOLD,
+                               unit="Pushups"):
+    """
+    :param log_data: DataFrame containing the pushup logs (as ingested by ingest_log())
+    :param month: The month to show ('YYYY-MM')
+    :param user_colors: Dictionary mapping each user to a color
+    :param max_points: Most points per user's line (None to keep every entry)
+    :param webgl_threshold: Number of points from which on the figure is drawn with WebGL
+    :param unit: What is counted, as shown in the labels (e.g. 'Squats')
+    :return: plotly Figure
+    """
+    import plotly.express as px
+    # Filter data for the selected month
+    filtered_data = log_data.loc[log_data['Month'] == month, ['Timestamp', 'User', 'Reps']]
+
+    # Reset accumulated push-ups for the selected month
+    filtered_data['Accumulated Reps'] = (
+        filtered_data.groupby('User', observed=True)['Reps'].cumsum().astype('int64')
+    )
+    filtered_data = downsample_per_user(filtered_data, 'Timestamp', 'Accumulated Reps', max_points)
+    # Plot the data
+    return px.line(
+        filtered_data,
+        x="Timestamp",
+        y="Accumulated Reps",
+        color="User",
+        color_discrete_map=user_colors,  # Use the USER_COLORS dictionary
+        category_orders={"User": list(user_colors.keys())},  # Ensure consistent color order
+        labels={"Timestamp": "Time", "Accumulated Reps": f"Accumulated {unit}"},
+        render_mode=render_mode(len(filtered_data), webgl_threshold),
+    )
+
+
+# Function to build the line chart of the pushups per day and user
+def time_series_figure(aggregates, user_selection, user_colors, unit="Pushups"):
+    """
+    :param aggregates: DailyAggregates of the pushup logs
+    :param user_selection: List of users to show
+    :param user_colors: Dictionary mapping each user to a color
+    :param unit: What is counted, as shown in the labels (e.g. 'Squats')
+    :return: plotly Figure
+    """
+    import plotly.express as px
+    selected_users = [user for user in aggregates.users if user in user_selection]
+
+    # Reps per day per user, only days on which the user logged something
+    daily_data = aggregates.daily[selected_users].stack().rename('Reps')
+    daily_data = daily_data[daily_data > 0].reset_index()
+
+    # Create the Plotly figure
+    fig = px.line(
+        daily_data,
+        x="Date",
+        y="Reps",
+        color="User",
+        color_discrete_map=user_colors,
+        labels={"Date": "Date", "Reps": unit, "User": "User"},
+    )
+
+    # Customize the layout for better interaction
+    fig.update_layout(
+        width=800,
+        height=500,
+        xaxis_title="Date",
+        yaxis_title=unit,
+        margin=dict(l=40, r=40, t=40, b=40),
+        legend_title="Users",
+    )
+
+    # Enable interactive tools like zoom and pan
+    fig.update_layout(
+        dragmode="zoom",
+        hovermode="x unified"
+    )
+    return fig
+
+
+# Function to build the stacked chart of each user's share of the pushups per day
+def dominance_figure(aggregates, user_selection, username, user_colors, unit="Pushups"):
+    """
+    :param aggregates: DailyAggregates of the pushup logs
+    :param user_selection: List of users to show
+    :param username: The current user, who will always appear as the bottom-most line
+    :param user_colors: Dictionary mapping each user to a color
+    :param unit: What is counted, as shown in the labels (e.g. 'Squats')
+    :return: plotly Figure
+    """
+    import plotly.graph_objects as go
+    # Reorder columns so the current user is the first one (always part of the selection)
+    user_order = [username] + [user for user in user_selection if user != username]
+
+    # Reps per day of the selected users, only days on which any of them logged something
+    daily_pushups = aggregates.daily.reindex(columns=user_order, fill_value=0)
+    daily_pushups = daily_pushups[daily_pushups.sum(axis=1) > 0]
+
+    # Normalize the data so each row sums to 100%
+    daily_pushups_percent = daily_pushups.div(daily_pushups.sum(axis=1), axis=0) * 100
+
+    # Create a Plotly figure for stacked lines
+    fig = go.Figure()
+
+    # Add each user as a separate line in the specified order
+    for user in user_order:
+        fig.add_trace(go.Scatter(
+            x=daily_pushups_percent.index,
+            y=daily_pushups_percent[user],
+            mode='lines',
+            stackgroup='one',  # Stack the lines
+            name=user,
+            line=dict(width=2, color=user_colors.get(user, '#000000')),  # Use color from USER_COLORS
+        ))
+
+    # Customize the layout
+    fig.update_layout(
+        xaxis_title="Date",
+        yaxis_title=f"Percentage of {unit}",
+        xaxis=dict(
+            tickformat="%b %-d",  # Display "Jan 1", "Jan 2", etc.
+            tickangle=0  # Keep ticks horizontal
+        ),
+        legend_title="User",
+        template="plotly_white",
+        height=500,
+        width=800,
+        margin=dict(l=40, r=40, t=10, b=40),  # Reduce top margin
+    )
+    return fig
+
+
+# Function to build the heatmap of the pushups by weekday and hour
+def heatmap_figure(activity, user_selection, dark=False, start=None, end=None, unit="Pushups", noun="Pushup"):
+    """
+    :param activity: ActivityCube of the pushup logs
+    :param user_selection: A single user or "All Users"
+    :param dark: Use the dark template
+    :param start: First day to include (whole weeks, see ActivityCube.heatmap()), None for the beginning
+    :param end: Last day to include, None for the end
+    :param unit: What is counted, as shown in the labels (e.g. 'Squats')
+    :param noun: One of them, as shown in the title (e.g. 'Squat')
+    :return: plotly Figure
+    """
+    import plotly.express as px
+    # Reps per weekday and hour of the selected user or all users, read off the cube
+    heatmap_data = activity.heatmap(None if user_selection == "All Users" else user_selection, start, end)
+
+    # Plot the heatmap using Plotly
+    fig = px.imshow(
+        heatmap_data.values,
+        labels=dict(x="Hour", y="Weekday", color=f"Total {unit}"),
+        x=heatmap_data.columns,
+        y=heatmap_data.index,
+        color_continuous_scale="YlGnBu",
+        title=f"{noun} Activity Heatmap ({user_selection})"
+    )
+
+    # Update layout for better visualization
+    fig.update_layout(
+        xaxis_title="Hour",
+        yaxis_title="Weekday",
+        coloraxis_colorbar=dict(title=""),
+        template="plotly_dark" if dark else "plotly",
+        height=500
+    )
+    return fig
+
+
+# Function to build the line chart of all pushups done within the project
+def total_accumulated_figure(aggregates, unit="Pushups"):
+    """
+    :param aggregates: DailyAggregates of the pushup logs
+    :param unit: What is counted, as shown in the labels (e.g. 'Squats')
+    :return: plotly Figure
+    """
+    import plotly.express as px
+    # Accumulated sum of pushups per day
+    daily_totals = aggregates.cumulative_totals.rename('Accumulated Reps').reset_index()
+
+    # Create the Plotly figure
+    fig = px.line(
+        daily_totals,
+        x="Date",
+        y="Accumulated Reps",
+        labels={"Date": "Date", "Accumulated Reps": f"Total {unit}"},
+        #title="Total Accumulated Pushups Over Time",
+    )
+
+    # Customize the layout for better interaction
+    fig.update_layout(
+        width=800,
+        height=400,
+        xaxis_title="Date",
+        yaxis_title=f"Accumulated {unit}",
+        margin=dict(l=40, r=40, t=40, b=40),
+        dragmode="zoom",  # Enable zooming and panning
+        hovermode="x unified"  # Unified hover mode for better tooltips
+    )
+    return fig
+
+
+# Function to build the stacked area chart of the accumulated pushups per user
+def total_accumulated_by_user_figure(aggregates, username, user_colors, unit="Pushups"):
+    """
+    :param aggregates: DailyAggregates of the pushup logs
+    :param username: The current user, who will always appear as the bottom-most entry
+    :param user_colors: Dictionary mapping each user to a color
+    :param unit: What is counted, as shown in the labels (e.g. 'Squats')
+    :return: plotly Figure
+    """
+    import plotly.graph_objects as go
+    # Ensure the current user is the first column
+    user_order = [username] + [user for user in aggregates.users if user != username]
+
+    # Cumulative sum for each user over time
+    accumulated_pushups = aggregates.cumulative.reindex(columns=user_order, fill_value=0)
+
+    # Create a stacked area chart
+    fig = go.Figure()
+
+    for user in accumulated_pushups.columns:
+        fig.add_trace(go.Scatter(
+            x=accumulated_pushups.index,
+            y=accumulated_pushups[user],
+            mode='lines',
+            stackgroup='one',  # Enable stacking
+            name=user,
+            line=dict(width=2, color=user_colors.get(user, '#000000')),
+        ))
+
+    # Customize the layout
+    fig.update_layout(
+        xaxis_title="Date",
+        yaxis_title=f"Total {unit}",
+        xaxis=dict(
+            tickformat="%b %-d",  # Display "Jan 1", "Jan 2", etc.
+        ),
+        legend_title="User",
+        template="plotly_white",
+        height=500,
+        width=800,
+        margin=dict(l=40, r=40, t=10, b=40),  # Adjust margins
+        dragmode="zoom",  # Enable zooming and panning
+        hovermode="x unified"  # Unified hover mode for tooltips
+    )
+    return fig
+
+
+# Function to build the stacked bar chart of the pushups per day and user
+def daily_contributions_figure(aggregates, username, user_colors, unit="Pushups"):
+    """
+    :param aggregates: DailyAggregates of the pushup logs
+    :param username: The current user, who will always appear as the bottom-most bar segment
+    :param user_colors: Dictionary mapping each user to a color
+    :param unit: What is counted, as shown in the labels (e.g. 'Squats')
+    :return: plotly Figure
+    """
+    import plotly.graph_objects as go
+    # Ensure the current user is the first column
+    user_order = [username] + [user for user in aggregates.users if user != username]
+
+    # Reps per user per day, one column per user
+    daily_totals_pivot = aggregates.daily.reindex(columns=user_order, fill_value=0)
+
+    # Create a stacked bar chart
+    fig = go.Figure()
+
+    for user in daily_totals_pivot.columns:
+        fig.add_trace(go.Bar(
+            x=daily_totals_pivot.index,
+            y=daily_totals_pivot[user],
+            name=user,
+            marker_color=user_colors.get(user, '#000000')
+        ))
+
+    # Customize the layout
+    fig.update_layout(
+        barmode="stack",  # Stacked bars
+        xaxis_title="Date",
+        yaxis_title=unit,
+        xaxis=dict(
+            tickformat="%b %-d",  # Display "Jan 1", "Jan 2", etc.
+        ),
+        legend_title="User",
+        template="plotly_white",
+        height=500,
+        width=800,
+        margin=dict(l=40, r=40, t=10, b=40),  # Adjust margins
+    )
+    return fig
+
+
+# Function to build the chart of a user's average over time with the difference of each day to it
+def user_daily_average_figure(aggregates, username, unit="Pushups"):
+    """
+    Line of the user's running daily average plus one bar per day between the average and
+    the pushups done that day: green if the day was above the average, red if below.
+    Also shows the highest average as a dashed line.
+
+    :param aggregates: DailyAggregates of the pushup logs
+    :param username: The current user to display the daily average for
+    :param unit: What is counted, as shown in the labels (e.g. 'Squats')
+    :return: plotly Figure
+    """
+    import plotly.graph_objects as go
+    # The user's pushups per day from their first to their latest recorded date (missing days are 0)
+    daily_totals_full = aggregates.user_daily(username).rename('Reps').reset_index()
+
+    # Calculate the daily average pushups
+    daily_totals_full['Daily Average'] = daily_totals_full['Reps'].expanding().mean().round(1)
+
+    # Calculate the highest average pushups
+    highest_average = daily_totals_full['Daily Average'].max()
+
+    # Create a Plotly figure
+    fig = go.Figure()
+
+    # Add a line for the highest average
+    fig.add_trace(go.Scatter(
+        x=daily_totals_full['Date'],
+        y=np.full(len(daily_totals_full), highest_average),
+        mode='lines',
+        name='Highest Average',
+        line=dict(width=2, color='orange', dash='dash'),
+        hovertemplate=f'Highest Average: {highest_average}<extra></extra>'
+    ))
+
+    # Add a line for the daily average
+    fig.add_trace(go.Scatter(
+        x=daily_totals_full['Date'],
+        y=daily_totals_full['Daily Average'],
+        mode='lines',
+        name='Daily Average',
+        line=dict(width=2, color='blue'),
+        hovertemplate='Date: %{x}<br>Daily Average: %{y}<extra></extra>'
+    ))
+
+    # Add the bars for the actual pushups done each day, one trace for the days above the
+    # average and one for the days below (each bar spans from the lower to the higher value)
+    above = daily_totals_full[daily_totals_full['Reps'] >= daily_totals_full['Daily Average']]
+    below = daily_totals_full[daily_totals_full['Reps'] < daily_totals_full['Daily Average']]
+    fig.add_trace(go.Bar(
+        x=above['Date'],
+        y=above['Reps'] - above['Daily Average'],
+        base=above['Daily Average'],
+        customdata=above['Reps'],
+        name=unit,
+        marker=dict(color='green'),
+        hovertemplate=f'Date: %{{x}}<br>{unit}: %{{customdata}}<extra></extra>'
+    ))
+    fig.add_trace(go.Bar(
+        x=below['Date'],
+        y=below['Daily Average'] - below['Reps'],
+        base=below['Reps'],
+        name=unit,
+        marker=dict(color='red'),
+        hovertemplate=f'Date: %{{x}}<br>{unit}: %{{base}}<br><extra></extra>'
+    ))
+
+    # Customize the layout
+    fig.update_layout(
+        xaxis_title="Date",
+        yaxis_title=f"Average {unit} (blue), {unit} on that day (green/red)",
+        xaxis=dict(
+            tickformat="%b %-d",  # Display "Jan 1", "Jan 2", etc.
+        ),
+        barmode="overlay",  # The two bar traces never share a day, so they don't need to make room for each other
+        showlegend=False,  # Remove the legend
+        template="plotly_white",
+        height=500,
+        width=800,
+        margin=dict(l=40, r=40, t=10, b=40),  # Adjust margins
+    )
+    return fig
+
+
+### FIGURE CACHE
+# Most reruns don't change the log (any widget interaction reruns the whole script), so the
+# figures are kept and reused until the data they were built from changes.
+
+# Number of figures a FigureCache keeps by default
+FIGURE_CACHE_SIZE = 64
+
+
+class FigureCache:
+    """
+    Process-wide LRU cache of built figures. The key holds everything a figure depends on:
+    the version of the data (e.g. SharedLog.version), the chart and its parameters (selected
+    user or month, the current user). A new data version never hits the old entries, they
+    age out of the cache instead.
+    Treat the figures as read-only, they are shared by every session.
+    """
+
+    def __init__(self, max_size=FIGURE_CACHE_SIZE):
+        """
+        :param max_size: Maximum number of figures kept, the least recently used one is dropped first
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._figures = OrderedDict()  # key -> figure, least recently used first
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        """
+        :param key: Hashable tuple identifying the figure
+        :param build: Function building the figure if it isn't cached
+        :return: The cached or newly built figure
+        """
+        with self._lock:
+            figure = self._figures.get(key)
+            if figure is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return figure
+            self.misses += 1
+        # Built without holding the lock, other sessions can use the cache meanwhile
+        figure = build()
+        with self._lock:
+            self._figures[key] = figure
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_size:
+                self._figures.popitem(last=False)
+                self.evictions += 1
+        return figure
+
+    def clear(self):
+        """Drops all figures."""
+        with self._lock:
+            self._figures.clear()
+
+    def stats(self):
+        """
+        :return: Dictionary with the hit/miss/eviction counters and the number of cached figures
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "cached": len(self._figures), "max_size": self.max_size}
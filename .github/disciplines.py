@@ -0,0 +1,52 @@
+# Disciplines of the tracker (push-ups, squats, pull-ups), each kept in a log of its own.
+# The storage is partitioned by discipline: every discipline has its own log file with its
+# own delta files, seasons and manifest, and the app its own SharedLog (and with it its own
+# aggregates, activity cube and user stats). Viewing push-ups never reads or aggregates the
+# squat history. A discipline's log is only loaded once somebody picks the discipline.
+# The entries of every log keep the LOG_COLUMNS, 'Reps' holding the number of repetitions
+# of the log's discipline (stored as 'Pushups', the name the files always had, see
+# storage.STORED_REPS_COLUMN). The push-up partition keeps the names the tracker always used
+# ('pushup_log.csv', 'seasons.csv'), so the existing files are the push-up partition as they
+# are and nothing has to be rewritten. The logs of the other disciplines are created by the
+# first set logged for them.
+from collections import OrderedDict, namedtuple
+
+from seasons import MANIFEST_NAME
+from storage import log_file_name
+
+
+class Discipline(namedtuple('Discipline', ['name', 'label', 'unit', 'noun', 'log_stem', 'manifest_name'])):
+    """
+    One discipline: its key (e.g. 'squats'), how it is called on buttons ('Squats') and in
+    charts and tables ('Squats', one of them: 'Squat'), the name of its log file without
+    extension ('squat_log') and the name of its season manifest ('squat_seasons.csv').
+    """
+
+    def log_name(self, log_format="csv"):
+        """
+        :param log_format: "csv" or "parquet"
+        :return: Name of the discipline's active log (e.g. 'squat_log.csv')
+        """
+        return log_file_name(self.log_stem, log_format)
+
+
+# Function to build a discipline that keeps its files next to the push-up files
+def make_discipline(name, label, unit, noun):
+    """
+    :param name: Key of the discipline (e.g. 'squats')
+    :param label: Name on buttons (e.g. 'Squats')
+    :param unit: Name in charts and tables (e.g. 'Squats')
+    :param noun: One repetition (e.g. 'Squat')
+    :return: Discipline logging to '<noun>_log' with the manifest '<noun>_seasons.csv'
+    """
+    stem = noun.lower().replace('-', '')
+    return Discipline(name, label, unit, noun, f"{stem}_log", f"{stem}_{MANIFEST_NAME}")
+
+
+# The disciplines in the order they are offered, push-ups (the existing files) first
+PUSHUPS = Discipline('pushups', 'Push-Ups', 'Pushups', 'Pushup', 'pushup_log', MANIFEST_NAME)
+DISCIPLINES = OrderedDict((entry.name, entry) for entry in [
+    PUSHUPS,
+    make_discipline('squats', 'Squats', 'Squats', 'Squat'),
+    make_discipline('pullups', 'Pull-Ups', 'Pull-ups', 'Pull-up'),
+])
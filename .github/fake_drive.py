@@ -0,0 +1,274 @@
+# In-memory stand-in for the GoogleDrive v3 service built in streamlit_app.py.
+# Only covers the parts of the files() API the tracker uses, but it speaks the real
+# request/response shapes, so MediaIoBaseDownload/MediaIoBaseUpload work on top of it.
+# It counts requests and transferred bytes, so callers can check how much traffic
+# a code path causes without live credentials. An optional latency per request makes
+# round trips (and what batching or parallel downloads save) show up in timings.
+import hashlib
+import itertools
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+# Matches the single conditions of the queries built in streamlit_app.py
+_QUERY_TERM = re.compile(
+    r"'(?P<parent>[^']*)' in parents"
+    r"|name = '(?P<name>[^']*)'"
+    r"|name contains '(?P<prefix>[^']*)'"
+    r"|trashed = (?P<trashed>true|false)"
+)
+
+
+# Function to build an httplib2-style response
+def _response(status, headers=None):
+    """
+    :param status: HTTP status code
+    :param headers: Optional dictionary of (lower-case) response headers
+    :return: httplib2.Response as returned by the real transport
+    """
+    response = httplib2.Response(dict(headers or {}, status=str(status)))
+    response.reason = {200: "OK", 206: "Partial Content", 404: "Not Found"}.get(status, "")
+    return response
+
+
+# Function to raise the 404 the real API answers for unknown file IDs
+def _not_found(file_id):
+    raise HttpError(_response(404), f'{{"error": {{"message": "File not found: {file_id}."}}}}'.encode(), uri=file_id)
+
+
+class _Request:
+    """A prepared API call - execute() runs it, like googleapiclient.http.HttpRequest."""
+
+    def __init__(self, drive, method, run):
+        self._drive = drive
+        self.method = method
+        self.run = run
+
+    def execute(self, http=None, num_retries=0):
+        self._drive.count_request(self.method, http)
+        return self.run()
+
+
+class _BatchRequest:
+    """What new_batch_http_request() returns: several API calls sent as one request."""
+
+    def __init__(self, drive, callback=None):
+        self._drive = drive
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request_id or str(len(self._requests) + 1), request, callback or self._callback))
+
+    def execute(self, http=None):
+        self._drive.count_request("batch", http)
+        for request_id, request, callback in self._requests:
+            try:
+                response, exception = request.run(), None
+            except HttpError as error:
+                response, exception = None, error
+            if callback is not None:
+                callback(request_id, response, exception)
+
+
+class _MediaRequest:
+    """What files().get_media() returns: MediaIoBaseDownload reads uri, headers and http from it."""
+
+    def __init__(self, drive, file_id):
+        self.uri = file_id
+        self.headers = {}
+        self.http = _MediaHttp(drive)
+
+
+class _MediaHttp:
+    """Answers the ranged GET requests MediaIoBaseDownload sends for each chunk."""
+
+    def __init__(self, drive):
+        self._drive = drive
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        self._drive.count_request("get_media", self)
+        file = self._drive.files_by_id.get(uri)
+        if file is None:
+            return _response(404), b'{"error": {"message": "File not found."}}'
+        content = file["content"]
+        first, last = 0, len(content) - 1
+        match = re.match(r"bytes=(\d+)-(\d+)", (headers or {}).get("range", ""))
+        if match:
+            first, last = int(match.group(1)), min(int(match.group(2)), len(content) - 1)
+        if not content:
+            return _response(416, {"content-range": "bytes */0"}), b""
+        chunk = content[first:last + 1]
+        with self._drive.lock:
+            self._drive.bytes_downloaded += len(chunk)
+        return _response(206, {"content-range": f"bytes {first}-{last}/{len(content)}"}), chunk
+
+
+class _Files:
+    """The files() collection of FakeDriveService."""
+
+    def __init__(self, drive):
+        self._drive = drive
+
+    def list(self, q="", fields=None, pageToken=None, orderBy=None, pageSize=None, **kwargs):
+        def run():
+            files = [file for file in self._drive.files_by_id.values() if self._drive.matches(file, q)]
+            return {"files": [self._drive.metadata(file) for file in files]}
+        return _Request(self._drive, "list", run)
+
+    def get(self, fileId, fields=None, **kwargs):
+        def run():
+            file = self._drive.files_by_id.get(fileId)
+            if file is None:
+                _not_found(fileId)
+            return self._drive.metadata(file)
+        return _Request(self._drive, "get", run)
+
+    def get_media(self, fileId, **kwargs):
+        return _MediaRequest(self._drive, fileId)
+
+    def create(self, body=None, media_body=None, fields=None, **kwargs):
+        def run():
+            content = self._drive.read_media(media_body)
+            file = self._drive.add_file(body["name"], content, (body.get("parents") or [None])[0])
+            return self._drive.metadata(file)
+        return _Request(self._drive, "create", run)
+
+    def update(self, fileId, body=None, media_body=None, fields=None, **kwargs):
+        def run():
+            file = self._drive.files_by_id.get(fileId)
+            if file is None:
+                _not_found(fileId)
+            if media_body is not None:
+                self._drive.write_content(file, self._drive.read_media(media_body))
+            file.update((body or {}))
+            return self._drive.metadata(file)
+        return _Request(self._drive, "update", run)
+
+    def delete(self, fileId, **kwargs):
+        def run():
+            if self._drive.files_by_id.pop(fileId, None) is None:
+                _not_found(fileId)
+            return ""
+        return _Request(self._drive, "delete", run)
+
+
+class FakeDriveService:
+    """
+    In-memory fake of build('drive', 'v3', ...). Pass it wherever the app expects `service`.
+    Counters: request_counts (per API method, a batch counts once as "batch"), bytes_downloaded, bytes_uploaded,
+    connections (the connections each thread sent its requests on).
+    """
+
+    def __init__(self, folder_id="fake-folder", latency=0.0):
+        """
+        :param folder_id: Folder ID that add_file() puts files into by default
+        :param latency: Seconds every request takes (a batch takes it once)
+        """
+        self.folder_id = folder_id
+        self.latency = latency
+        self.files_by_id = {}
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.reset_counters()
+
+    def files(self):
+        return _Files(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _BatchRequest(self, callback)
+
+    def new_http(self):
+        """
+        :return: A connection of its own, e.g. for DriveBackend(http_factory=drive.new_http)
+        """
+        return _MediaHttp(self)
+
+    def reset_counters(self):
+        """Sets all request and byte counters back to zero."""
+        self.request_counts = {"batch": 0, "list": 0, "get": 0, "get_media": 0, "create": 0, "update": 0, "delete": 0}
+        self.connections = {}  # thread name -> connections its requests were sent on (None: the service's own)
+        self.bytes_downloaded = 0
+        self.bytes_uploaded = 0
+
+    def count_request(self, method, http=None):
+        """Counts one request (sent from any thread on the connection `http`) and waits for the latency."""
+        with self.lock:
+            self.request_counts[method] += 1
+            self.connections.setdefault(threading.current_thread().name, set()).add(http)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add_file(self, name, content=b"", folder_id=None):
+        """
+        Puts a file into the fake Drive (without counting it as traffic when called directly).
+        :param name: File name
+        :param content: File content as bytes or str
+        :param folder_id: Parent folder, defaults to the service's folder_id
+        :return: The stored file record
+        """
+        file = {"id": f"fake-{next(self._ids)}", "name": name, "trashed": False, "revision": 0,
+                "parents": [folder_id or self.folder_id]}
+        self.write_content(file, content)
+        self.files_by_id[file["id"]] = file
+        return file
+
+    def trash(self, name):
+        """Moves every file with that name to the trash (it keeps its ID, like on Drive)."""
+        for file in self.files_by_id.values():
+            if file["name"] == name:
+                file["trashed"] = True
+
+    def content(self, name):
+        """
+        :param name: File name
+        :return: Content of the (non-trashed) file with that name as bytes, None if there is none
+        """
+        for file in self.files_by_id.values():
+            if file["name"] == name and not file["trashed"]:
+                return file["content"]
+        return None
+
+    def write_content(self, file, content):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        file["content"] = content
+        file["revision"] += 1
+        file["modifiedTime"] = datetime.now(timezone.utc).isoformat()
+
+    def read_media(self, media_body):
+        if media_body is None:
+            return b""
+        content = media_body.getbytes(0, media_body.size())
+        with self.lock:
+            self.bytes_uploaded += len(content)
+        return content
+
+    def metadata(self, file):
+        return {
+            "id": file["id"],
+            "name": file["name"],
+            "trashed": file["trashed"],
+            "size": str(len(file["content"])),
+            "md5Checksum": hashlib.md5(file["content"]).hexdigest(),
+            "headRevisionId": f"{file['id']}-r{file['revision']}",
+            "modifiedTime": file["modifiedTime"],
+        }
+
+    def matches(self, file, query):
+        # Several name terms only come as alternatives: (name = 'a' or name = 'b')
+        names = [term.group("name") for term in _QUERY_TERM.finditer(query) if term.group("name") is not None]
+        if names and file["name"] not in names:
+            return False
+        for term in _QUERY_TERM.finditer(query):
+            if term.group("parent") is not None and term.group("parent") not in file["parents"]:
+                return False
+            if term.group("prefix") is not None and not file["name"].startswith(term.group("prefix")):
+                return False
+            if term.group("trashed") is not None and file["trashed"] != (term.group("trashed") == "true"):
+                return False
+        return True
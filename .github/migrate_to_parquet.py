@@ -0,0 +1,78 @@
+#### ONE-SHOT SCRIPT TO MIGRATE THE LOGS FROM CSV TO PARQUET
+# Run with: streamlit run .github/migrate_to_parquet.py  (uses the same secrets as the app)
+# The CSV files are left untouched, the Parquet files are written next to them. Every log listed
+# in a discipline's season manifest is migrated too, and the manifest is rewritten to list the
+# Parquet files once all of them made it.
+# Afterwards switch the app over by adding to the secrets:
+#   [storage]
+#   log_format = "parquet"
+# (Not needed for the "sqlite" backend, which keeps log entries as table rows anyway.)
+
+
+import io
+
+import streamlit as st
+
+from disciplines import DISCIPLINES, PUSHUPS
+from seasons import manifest_frame, parse_manifest
+from storage import is_parquet, log_file_name, log_row_keys, serialize_frame, deserialize_frame
+from storage_setup import make_storage
+
+### STORAGE SETUP (same settings as the app)
+storage = make_storage(st.secrets)
+
+# Logs that were kept in their own file before there were manifests (file names without extension)
+LEGACY_STEMS = {PUSHUPS.name: ["pushup_log_2022"]}
+
+
+# Function to write the Parquet copy of a CSV log
+def migrate_log(csv_name):
+    """
+    :param csv_name: Name of the CSV log (e.g. 'pushup_log.csv')
+    :return: True if the Parquet file was written (or there is nothing to migrate), False if it failed
+    """
+    parquet_name = log_file_name(csv_name.rsplit('.', 1)[0], "parquet")
+
+    # Base file plus entries that are still waiting in delta files (the deltas stay in place
+    # and are skipped when merged on top of the Parquet file, since their rows are already in it)
+    log, revision, deltas = storage.read_log(csv_name)
+    if log is None:
+        st.warning(f"{csv_name} not found, skipped.")
+        return True
+
+    parquet_content, mimetype = serialize_frame(log, parquet_name)
+
+    # Make sure nothing got lost on the way before writing anything
+    check = deserialize_frame(io.BytesIO(parquet_content), parquet_name)
+    if len(check) != len(log) or log_row_keys(check).tolist() != log_row_keys(log).tolist():
+        st.error(f"{parquet_name}: round trip check failed, nothing written.")
+        return False
+
+    storage.upload(parquet_name, parquet_content, mimetype)
+    csv_size = len(serialize_frame(log, csv_name)[0])
+    st.write(
+        f"{csv_name} ({len(deltas)} deltas) -> {parquet_name}: {len(log):,} rows, "
+        f"{csv_size:,} bytes CSV -> {len(parquet_content):,} bytes Parquet"
+    )
+    return True
+
+
+st.title("Migrate logs to Parquet")
+
+for discipline in DISCIPLINES.values():
+    manifest = storage.fetch(discipline.manifest_name)
+    seasons = parse_manifest(manifest) if manifest is not None else []
+    # The active log, the seasons' logs and the legacy logs, each once
+    log_names = [discipline.log_name("csv")] + [season.log_name for season in seasons]
+    log_names += [log_file_name(stem, "csv") for stem in LEGACY_STEMS.get(discipline.name, [])]
+    migrated = [migrate_log(log_name) for log_name in dict.fromkeys(log_names) if not is_parquet(log_name)]
+
+    if seasons and not all(migrated):
+        st.error(f"{discipline.manifest_name} still lists the CSV files, not every log of it was migrated.")
+    elif seasons:
+        seasons = [season._replace(log_name=log_file_name(season.log_name.rsplit('.', 1)[0], "parquet"))
+                   for season in seasons]
+        storage.push(manifest_frame(seasons), discipline.manifest_name)
+        st.write(f"{discipline.manifest_name} now lists the Parquet files.")
+
+st.success("Done. Set log_format = \"parquet\" under [storage] in the secrets to use the Parquet files.")
@@ -0,0 +1,212 @@
+# Timing spans for the hot paths: storage calls, parsing and the display_* functions.
+# A rerun of the script is recorded as a list of spans (name, start, duration, nesting depth)
+# plus the Drive requests and bytes transferred inside each span and in the whole rerun.
+# Recording is off unless enabled under [perf] in the secrets. While it is off no rerun is
+# started, and span(), count() and @timed only look up the current thread's rerun and
+# return - the instrumented code runs as before.
+# The app shows the last reruns to the admins listed under [perf] and can append every
+# finished rerun as one JSON line to a file (export_path).
+import contextlib
+import functools
+import json
+import threading
+import time
+from collections import deque
+
+# Number of finished reruns kept for the perf panel
+PERF_HISTORY = 50
+
+# The rerun recorded on the current thread (Streamlit runs every rerun in a script thread)
+_local = threading.local()
+
+# Returned by span() while nothing is recorded
+_NO_SPAN = contextlib.nullcontext()
+
+
+class Rerun:
+    """Spans and counters of one rerun, only touched by the thread running it."""
+
+    def __init__(self, label):
+        """
+        :param label: What ran (e.g. the user, or the section of a fragment rerun)
+        """
+        self.label = label
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.requests = 0
+        self.bytes = 0
+        self.spans = []
+        self._open = []  # spans that haven't ended yet, innermost last
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """
+        Records how long the block takes, and the requests and bytes counted inside it.
+        :param name: Name of the span (e.g. 'drive.download' or 'display_pushup_heatmap')
+        """
+        record = {"name": name, "start": time.perf_counter() - self.start, "depth": len(self._open),
+                  "duration": None, "requests": 0, "bytes": 0}
+        self.spans.append(record)
+        self._open.append(record)
+        try:
+            yield record
+        finally:
+            record["duration"] = time.perf_counter() - self.start - record["start"]
+            self._open.pop()
+
+    def count(self, requests, transferred):
+        """
+        Adds requests and bytes to the rerun and to every span that is still open.
+        """
+        self.requests += requests
+        self.bytes += transferred
+        for record in self._open:
+            record["requests"] += requests
+            record["bytes"] += transferred
+
+    def to_dict(self):
+        """
+        :return: JSON-serializable dictionary of the rerun (times in seconds)
+        """
+        return {"label": self.label, "started_at": self.started_at, "duration": self.duration,
+                "requests": self.requests, "bytes": self.bytes, "spans": self.spans}
+
+
+class PerfRecorder:
+    """
+    Process-wide collector of the recorded reruns. Created once per server process like the
+    storage backend, reruns of all sessions end up in the same history.
+    """
+
+    def __init__(self, enabled=False, export_path=None, history=PERF_HISTORY):
+        """
+        :param enabled: Record reruns at all
+        :param export_path: File every finished rerun is appended to as a JSON line (optional)
+        :param history: Number of finished reruns kept in memory
+        """
+        self.enabled = enabled
+        self.export_path = export_path
+        self._history = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def start(self, label):
+        """
+        Starts recording the rerun running on this thread. A rerun that was cut short on this
+        thread before (st.rerun(), st.stop(), an exception) is never finished and gets dropped.
+        :param label: What runs (e.g. the user)
+        :return: The Rerun, None if recording is off
+        """
+        if not self.enabled:
+            return None
+        _local.rerun = Rerun(label)
+        return _local.rerun
+
+    def finish(self, rerun):
+        """
+        Stops recording a rerun and adds it to the history (and the export file).
+        :param rerun: The Rerun returned by start(), None is ignored
+        """
+        if rerun is None:
+            return
+        rerun.duration = time.perf_counter() - rerun.start
+        if getattr(_local, "rerun", None) is rerun:
+            _local.rerun = None
+        line = json.dumps(rerun.to_dict())
+        with self._lock:
+            self._history.append(rerun)
+            if self.export_path:
+                with open(self.export_path, "a", encoding="utf-8") as export:
+                    export.write(line + "\n")
+
+    @contextlib.contextmanager
+    def rerun(self, label):
+        """
+        Records the block as a rerun of its own, unless this thread already records one
+        (e.g. a fragment that reruns by itself vs. the same fragment within a full rerun).
+        Only a block that runs to its end is added to the history.
+        :param label: What runs
+        """
+        rerun = self.start(label) if getattr(_local, "rerun", None) is None else None
+        try:
+            yield rerun
+        except BaseException as e:
+            if not isinstance(e, Exception):
+                # st.rerun()/st.stop() or a widget change (they raise) cut the whole script run short,
+                # the rerun this block is part of is over as well and never gets finished
+                _local.rerun = None
+            raise
+        else:
+            self.finish(rerun)
+        finally:
+            # Cut short or not, nothing recorded on this thread afterwards goes to a rerun that ended
+            if rerun is not None and getattr(_local, "rerun", None) is rerun:
+                _local.rerun = None
+
+    def history(self):
+        """
+        :return: List of the finished Reruns, the latest last
+        """
+        with self._lock:
+            return list(self._history)
+
+    def export(self):
+        """
+        :return: The history as JSON lines (one rerun per line)
+        """
+        return "".join(json.dumps(rerun.to_dict()) + "\n" for rerun in self.history())
+
+
+# Function to time a block as a span of the current rerun
+def span(name):
+    """
+    :param name: Name of the span
+    :return: Context manager recording the span (does nothing if no rerun is recorded)
+    """
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return _NO_SPAN
+    return rerun.span(name)
+
+
+# Function to count Drive requests and transferred bytes in the current rerun
+def count(requests=0, transferred=0):
+    """
+    :param requests: Number of requests sent
+    :param transferred: Number of bytes downloaded or uploaded
+    """
+    rerun = getattr(_local, "rerun", None)
+    if rerun is not None:
+        rerun.count(requests, transferred)
+
+
+# Function to record into a given rerun on the current thread, e.g. on a worker thread
+@contextlib.contextmanager
+def recording(rerun):
+    """
+    :param rerun: The Rerun the spans and counts of the block go to (its owner adds them up afterwards)
+    """
+    previous = getattr(_local, "rerun", None)
+    _local.rerun = rerun
+    try:
+        yield rerun
+    finally:
+        _local.rerun = previous
+
+
+# Decorator to record every call of a function as a span named after it
+def timed(function):
+    """
+    :param function: The function (e.g. one of the display_* functions)
+    :return: The wrapped function
+    """
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        rerun = getattr(_local, "rerun", None)
+        if rerun is None:
+            return function(*args, **kwargs)
+        with rerun.span(name):
+            return function(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,201 @@
+# Seasons of the log, each kept in its own log file (one partition per year).
+# The active season is the log the app writes to (e.g. 'pushup_log.csv'), finished seasons
+# are moved into their own file (e.g. 'pushup_log_2025.csv', see archive_season.py). So a
+# server process only loads the current season; an older one is only loaded when somebody
+# picks it in the season selector, and then kept for the next visitors.
+# The manifest (seasons.csv) lists every season with its log file, first and last day.
+# Every discipline has its own manifest (see disciplines.py), the push-ups keep 'seasons.csv'.
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import pandas as pd
+
+from shared_log import LOG_CHECK_INTERVAL, SharedLog
+
+# Name and columns of the manifest file
+MANIFEST_NAME = 'seasons.csv'
+MANIFEST_COLUMNS = ['Season', 'Log', 'Start', 'End']
+
+# Archived seasons hardly ever change, their revision is checked less often
+ARCHIVE_CHECK_INTERVAL = 3600
+
+# Number of archived seasons kept loaded at the same time
+LOADED_SEASONS = 2
+
+
+class Season(namedtuple('Season', ['name', 'log_name', 'start', 'end'])):
+    """
+    One season: its name (e.g. '2025'), the log file holding its entries and its first and
+    last day (Timestamps at midnight, both days belong to the season).
+    """
+
+    @property
+    def days(self):
+        """Number of days of the whole season."""
+        return (self.end - self.start).days + 1
+
+
+# Function to build the season of a calendar year
+def calendar_season(year, log_name):
+    """
+    :param year: The year
+    :param log_name: Log file holding the season's entries
+    :return: Season from January 1st to December 31st
+    """
+    return Season(str(year), log_name, pd.Timestamp(year, 1, 1), pd.Timestamp(year, 12, 31))
+
+
+# Function to name the log file of an archived season
+def season_log_name(log_name, season_name):
+    """
+    :param log_name: Name of the active log (e.g. 'pushup_log.csv')
+    :param season_name: Name of the season (e.g. '2025')
+    :return: Name of the season's own log file (e.g. 'pushup_log_2025.csv')
+    """
+    stem, extension = log_name.rsplit('.', 1)
+    return f"{stem}_{season_name}.{extension}"
+
+
+# Function to tell whether two log names name the same log
+def same_log(log_name, other):
+    """
+    The manifest may still list a log as CSV after the app switched to Parquet (or the other
+    way round), so only the names without extension are compared.
+    :param log_name: Name of a log file (e.g. 'pushup_log.csv')
+    :param other: Name of another log file (e.g. 'pushup_log.parquet')
+    :return: Whether both are the same log, in whichever file format
+    """
+    return os.path.splitext(log_name)[0] == os.path.splitext(other)[0]
+
+
+# Function to turn the manifest file into seasons
+def parse_manifest(manifest):
+    """
+    :param manifest: DataFrame with the MANIFEST_COLUMNS
+    :return: List of Seasons, the latest first
+    """
+    seasons = [Season(str(row.Season), row.Log, pd.Timestamp(row.Start).normalize(), pd.Timestamp(row.End).normalize())
+               for row in manifest.itertuples(index=False)]
+    return sorted(seasons, key=lambda season: season.start, reverse=True)
+
+
+# Function to turn seasons into the manifest file
+def manifest_frame(seasons):
+    """
+    :param seasons: List of Seasons
+    :return: DataFrame with the MANIFEST_COLUMNS, the latest season first
+    """
+    seasons = sorted(seasons, key=lambda season: season.start, reverse=True)
+    return pd.DataFrame({
+        'Season': [season.name for season in seasons],
+        'Log': [season.log_name for season in seasons],
+        'Start': [season.start.strftime('%Y-%m-%d') for season in seasons],
+        'End': [season.end.strftime('%Y-%m-%d') for season in seasons],
+    }, columns=MANIFEST_COLUMNS)
+
+
+class SeasonArchive:
+    """
+    The seasons of one log. The active season's SharedLog is passed in (the app shares it
+    anyway); a SharedLog for an archived season is only created when that season is asked
+    for, and at most `loaded_seasons` of them are kept.
+    """
+
+    def __init__(self, storage, active_log, fallback_seasons=(), check_interval=LOG_CHECK_INTERVAL,
+                 loaded_seasons=LOADED_SEASONS, manifest_name=MANIFEST_NAME, fallback_active=None):
+        """
+        :param storage: StorageBackend holding the logs and the manifest
+        :param active_log: SharedLog of the active log
+        :param fallback_seasons: Archived Seasons to offer as long as there is no manifest yet
+        :param check_interval: Seconds between two checks whether the manifest changed
+        :param loaded_seasons: Number of archived seasons kept loaded
+        :param manifest_name: Name of the manifest file listing the seasons of the log
+        :param fallback_active: Season held by the active log as long as there is no manifest yet
+                                (None for the current calendar year)
+        """
+        self.storage = storage
+        self.active_log = active_log
+        self.fallback_seasons = list(fallback_seasons)
+        self.check_interval = check_interval
+        self.loaded_seasons = loaded_seasons
+        self.manifest_name = manifest_name
+        self.fallback_active = fallback_active
+        self.loads = 0
+        self._seasons = None
+        self._checked_at = None
+        self._logs = OrderedDict()  # season name -> SharedLog, least recently used first
+        self._lock = threading.Lock()
+
+    def due(self):
+        """
+        :return: Whether the next seasons() reads the manifest
+        """
+        return self._seasons is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def seasons(self):
+        """
+        Returns all seasons, re-reading the manifest at most every `check_interval` seconds.
+        Without a manifest the active season is fallback() and the older ones are the fallback seasons.
+        :return: List of Seasons, the latest first
+        """
+        with self._lock:
+            if self._seasons is None or time.monotonic() - self._checked_at >= self.check_interval:
+                manifest = self.storage.fetch(self.manifest_name)
+                if manifest is not None:
+                    self._seasons = parse_manifest(manifest)
+                else:
+                    self._seasons = [self.fallback()] + self.fallback_seasons
+                self._checked_at = time.monotonic()
+            return self._seasons
+
+    def fallback(self):
+        """
+        :return: The Season of the active log as long as there is no manifest (or it can't be read)
+        """
+        if self.fallback_active is not None:
+            return self.fallback_active
+        return calendar_season(pd.Timestamp.now().year, self.active_log.log_name)
+
+    def active(self):
+        """
+        :return: The Season stored in the active log
+        """
+        seasons = self.seasons()
+        return next((season for season in seasons if same_log(season.log_name, self.active_log.log_name)), seasons[0])
+
+    def archived(self):
+        """
+        :return: List of the finished Seasons (with their own log file), the latest first
+        """
+        return [season for season in self.seasons() if not same_log(season.log_name, self.active_log.log_name)]
+
+    def log(self, season):
+        """
+        :param season: A Season (as returned by seasons())
+        :return: SharedLog of the season, loaded on its first snapshot()
+        """
+        if same_log(season.log_name, self.active_log.log_name):
+            return self.active_log
+        with self._lock:
+            shared_log = self._logs.get(season.name)
+            if shared_log is None or shared_log.log_name != season.log_name:
+                if shared_log is not None:
+                    self.storage.forget_log(shared_log.log_name)
+                shared_log = SharedLog(self.storage, season.log_name, check_interval=ARCHIVE_CHECK_INTERVAL)
+                self._logs[season.name] = shared_log
+                self.loads += 1
+            self._logs.move_to_end(season.name)
+            # Only the most recently used seasons stay in memory, along with their files in the storage's cache
+            while len(self._logs) > self.loaded_seasons:
+                evicted = self._logs.popitem(last=False)[1]
+                self.storage.forget_log(evicted.log_name)
+            return shared_log
+
+    def stats(self):
+        """
+        :return: Dictionary with the number of seasons, the loaded archived seasons and how often one was loaded
+        """
+        with self._lock:
+            return {"seasons": len(self._seasons or []), "loaded": list(self._logs), "loads": self.loads}
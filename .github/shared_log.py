@@ -0,0 +1,258 @@
+# One copy of the log per server process, shared by all browser sessions.
+# Sessions get a read-only view of it on every rerun instead of downloading and keeping
+# their own copy, so memory use and storage traffic don't grow with the number of visitors.
+# The copy is ingested once (typed columns plus Date/Hour/Weekday/Month, see ingest_log()).
+# The copy is replaced when this process writes to the log, and reloaded when the log in
+# the storage changed (checked at most every `check_interval` seconds).
+import logging
+import threading
+import time
+
+from aggregates import ActivityCube, DailyAggregates
+from storage import ENTRY_ID_COLUMN, LogRevision, empty_log, ingest_log, merge_log_deltas
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two checks whether the log in the storage changed
+LOG_CHECK_INTERVAL = 30
+
+
+class SharedLog:
+    """
+    Version-stamped, process-wide copy of one log. `version` goes up by one every time the
+    copy is replaced, so caches built from the log can use it as their key.
+    """
+
+    def __init__(self, storage, log_name, sync_queue=None, check_interval=LOG_CHECK_INTERVAL, check_aggregates=False,
+                 empty_if_missing=False):
+        """
+        :param storage: StorageBackend the log is read from
+        :param log_name: Name of the log (e.g. 'pushup_log.csv')
+        :param sync_queue: SyncQueue whose unsynced entries are shown as part of the log (optional)
+        :param check_interval: Seconds between two checks of the log's revision in the storage
+        :param check_aggregates: Compare every incremental update of the aggregates with a full
+                                 recompute (slow, for testing)
+        :param empty_if_missing: Start with a log without entries if there is none in the storage yet
+                                 (e.g. a discipline nobody logged a set for), instead of having no log
+        """
+        self.storage = storage
+        self.log_name = log_name
+        self.sync_queue = sync_queue
+        self.check_interval = check_interval
+        self.check_aggregates = check_aggregates
+        self.empty_if_missing = empty_if_missing
+        self.version = 0
+        self.loads = 0
+        self._log = None
+        self._revision = None
+        self._checked_at = None
+        self._aggregates = None
+        self._activity = None
+        self._derived = (0, {})  # (version, key -> value) of values derived from the aggregates
+        self._lock = threading.Lock()
+        if sync_queue is not None:
+            sync_queue.register(self)
+
+    def _load(self):
+        """Reads the log from the storage and adds the entries still waiting in the sync queue."""
+        log, revision = self.storage.fetch_log(self.log_name)
+        if log is None and self.empty_if_missing:
+            # Same revision as get_log_revision() reports for it, so it is only reloaded once it exists
+            log, revision = empty_log(), LogRevision(None, frozenset())
+        if log is not None:
+            if self.sync_queue is not None:
+                log = merge_log_deltas(log, [self.sync_queue.pending_entries(self.log_name)])
+            log = ingest_log(log)
+        self._set(log, revision)
+        self.loads += 1
+
+    def _set(self, log, revision, aggregates=None, activity=None):
+        """
+        :param aggregates: DailyAggregates of `log` if they were updated along with it,
+                           None to build them from scratch when they are needed next
+        :param activity: ActivityCube of `log` if it was updated along with it, None to rebuild it
+        """
+        if self.check_aggregates:
+            if aggregates is not None and aggregates.differences(log):
+                logger.warning("Incremental update of the aggregates went wrong (%s), rebuilding them",
+                               ", ".join(aggregates.differences(log)))
+                aggregates = None
+            if activity is not None and activity.differences(log):
+                logger.warning("Incremental update of the activity cube went wrong (%s), rebuilding it",
+                               ", ".join(activity.differences(log)))
+                activity = None
+        self._log = log
+        self._revision = revision
+        self._checked_at = time.monotonic()
+        self.version += 1
+        self._aggregates = (self.version, aggregates) if aggregates is not None else None
+        self._activity = (self.version, activity) if activity is not None else None
+
+    def _current_aggregates(self):
+        """Aggregates of the current copy if they are built already, else None."""
+        if self._aggregates is not None and self._aggregates[0] == self.version:
+            return self._aggregates[1]
+        return None
+
+    def _current_activity(self):
+        """Activity cube of the current copy if it is built already, else None."""
+        if self._activity is not None and self._activity[0] == self.version:
+            return self._activity[1]
+        return None
+
+    def due(self):
+        """
+        :return: Whether the next snapshot() asks the storage (the first load or a check of the revision)
+        """
+        return self._log is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def snapshot(self):
+        """
+        Returns the current log, reloading it first if it changed in the storage.
+        The DataFrame is the process-wide copy itself - callers must treat it as read-only
+        (filter, group or copy it, but never add or assign columns).
+        :return: Tuple (pandas DataFrame or None, its LogRevision, version of the copy)
+        """
+        with self._lock:
+            if self._log is None:
+                self._load()
+            elif time.monotonic() - self._checked_at >= self.check_interval:
+                # Looked up along with the other files of the page, if it just was (see StorageBackend.prefetch())
+                revision, deltas = self.storage.get_log_revision(self.log_name, prefetched=True)
+                if revision != self._revision:
+                    self._load()
+                else:
+                    self._checked_at = time.monotonic()
+            return self._log, self._revision, self.version
+
+    def aggregates(self):
+        """
+        Returns the day-by-user aggregates of the current copy. They are built once per
+        version and shared by all sessions, just like the log itself.
+        :return: DailyAggregates, None if the log couldn't be loaded
+        """
+        with self._lock:
+            if self._log is None:
+                return None
+            if self._current_aggregates() is None:
+                self._aggregates = (self.version, DailyAggregates.from_log(self._log))
+            return self._aggregates[1]
+
+    def activity(self):
+        """
+        Returns the weekday-by-hour activity cube of the current copy (see ActivityCube),
+        built once per version and shared by all sessions.
+        :return: ActivityCube, None if the log couldn't be loaded
+        """
+        with self._lock:
+            if self._log is None:
+                return None
+            if self._current_activity() is None:
+                self._activity = (self.version, ActivityCube.from_log(self._log))
+            return self._activity[1]
+
+    def derived(self, key, build):
+        """
+        Returns a value computed from the aggregates of the current copy (e.g. the user stats),
+        built once per version and shared by all sessions.
+        :param key: Hashable key of the value (e.g. what it is and its parameters)
+        :param build: Function taking the DailyAggregates and returning the value
+        :return: The value, None if the log couldn't be loaded
+        """
+        with self._lock:
+            if self._log is None:
+                return None
+            version, values = self._derived
+            if version != self.version:
+                values = {}
+                self._derived = (self.version, values)
+            if key not in values:
+                if self._current_aggregates() is None:
+                    self._aggregates = (self.version, DailyAggregates.from_log(self._log))
+                # Built while holding the lock, so the aggregates can't be updated meanwhile
+                values[key] = build(self._aggregates[1])
+            return values[key]
+
+    def add_entries(self, new_entry):
+        """
+        Adds entries that were just handed to the sync queue, so every session sees them
+        right away. The revision stays the same, the next reload picks them up from the storage.
+        :param new_entry: DataFrame holding the new entries
+        """
+        with self._lock:
+            if self._log is None:
+                return
+            # Skips the entries if a reload already picked them up from the storage
+            log = merge_log_deltas(self._log, [ingest_log(new_entry)])
+            added = log.iloc[len(self._log):]
+            aggregates, activity = self._current_aggregates(), self._current_activity()
+            if aggregates is not None:
+                aggregates = aggregates.add(added)
+            if activity is not None:
+                activity = activity.add(added)
+            self._set(log, self._revision, aggregates, activity)
+
+    def revision(self):
+        """
+        :return: LogRevision of the current copy (None before it was loaded)
+        """
+        with self._lock:
+            return self._revision
+
+    def synced(self, based_on, revision):
+        """
+        Called by the sync queue after it appended entries of this log to the storage. The
+        entries are part of the copy already (see add_entries()), so if the copy is still at
+        `based_on` it is now at `revision` - the next revision check finds nothing new and
+        the copy (and its aggregates) stay as they are.
+        :param based_on: LogRevision the append was based on
+        :param revision: LogRevision after the append, None if unknown (then the copy is reloaded)
+        """
+        with self._lock:
+            if revision is not None and based_on is not None and self._revision == based_on:
+                self._revision = revision
+
+    def replace(self, log, revision, removed=None):
+        """
+        Replaces the copy after this process rewrote the log (e.g. after deleting entries).
+        :param log: The log as written
+        :param revision: Its LogRevision
+        :param removed: DataFrame of the entries that were deleted, if that was the only change
+                        (the aggregates are then updated instead of rebuilt)
+        """
+        log = ingest_log(log)
+        with self._lock:
+            aggregates, activity = self._current_aggregates(), self._current_activity()
+            # If the write merged in other changes, the row count gives it away
+            if removed is not None and len(log) == len(self._log) - len(removed):
+                aggregates = aggregates.remove(removed) if aggregates is not None else None
+                activity = activity.remove(removed) if activity is not None else None
+            else:
+                aggregates, activity = None, None
+            self._set(log, revision, aggregates, activity)
+
+    def drop_entries(self, entry_ids):
+        """
+        Takes entries out of the copy that were added with add_entries() but will never reach
+        the storage (the sync queue set them aside, see SyncQueue).
+        :param entry_ids: IDs of the entries
+        """
+        with self._lock:
+            if self._log is None:
+                return
+            dropped = self._log[ENTRY_ID_COLUMN].isin(list(entry_ids))
+            if not dropped.any():
+                return
+            removed = self._log[dropped]
+            aggregates, activity = self._current_aggregates(), self._current_activity()
+            aggregates = aggregates.remove(removed) if aggregates is not None else None
+            activity = activity.remove(removed) if activity is not None else None
+            self._set(self._log[~dropped].reset_index(drop=True), self._revision, aggregates, activity)
+
+    def stats(self):
+        """
+        :return: Dictionary with the copy's version, row count and how often it was loaded
+        """
+        with self._lock:
+            rows = len(self._log) if self._log is not None else 0
+            return {"version": self.version, "rows": rows, "loads": self.loads}
@@ -0,0 +1,1741 @@
+# Storage of the tracker's files (GoogleDrive, a local directory or SQLite).
+# Streamlit re-runs streamlit_app.py on every interaction, but imported modules
+# stay loaded for the whole server process. The app creates its storage backend once
+# per process, so the caches kept by the backends are shared by all sessions.
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import perf
+
+# The Google client libraries (httplib2, googleapiclient) are imported inside the Drive code,
+# the "local" and "sqlite" backends run without them
+
+# How long a resolved file ID is trusted before it is looked up again (seconds)
+FILE_ID_TTL = 600
+
+
+# Function to tell whether a Drive API error means "this file ID is gone"
+def is_not_found(error):
+    """
+    Checks whether an exception raised by the Drive API is a 404 (file deleted or ID unknown).
+    :param error: The exception raised by the Drive API call
+    :return: True if the error is a 404, False otherwise
+    """
+    from googleapiclient.errors import HttpError
+    return isinstance(error, HttpError) and getattr(error.resp, "status", None) == 404
+
+
+class FileIdRegistry:
+    """
+    Process-wide cache mapping (folder, file name) to a GoogleDrive file ID.
+    Each name is resolved with files().list once and then reused until the TTL runs out
+    or the entry is invalidated (file trashed or its ID answering with a 404).
+    A lookup miss is reported as None - the registry never creates files itself.
+    """
+
+    def __init__(self, ttl=FILE_ID_TTL):
+        """
+        :param ttl: Seconds a resolved file ID stays valid before it is looked up again
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._ids = {}  # (folder_id, file_name) -> (file_id, expires_at)
+        self._lock = threading.Lock()
+
+    def lookup(self, service, file_name, folder_id, http=None):
+        """
+        Returns the file ID for a file name, asking Drive only if it is not cached (or expired).
+        :param service: Authenticated Google Drive service instance
+        :param file_name: The name of the file to retrieve
+        :param folder_id: The folder ID to check for the file
+        :param http: HTTP connection to send the request on (None for the service's own)
+        :return: File ID if found, None otherwise
+        """
+        key = (folder_id, file_name)
+        with self._lock:
+            entry = self._ids.get(key)
+            if entry and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        query = f"'{folder_id}' in parents and name = '{file_name}' and trashed = false"
+        perf.count(requests=1)
+        results = service.files().list(q=query, fields="files(id)").execute(http=http)
+        files = results.get('files', [])
+        if not files:
+            # Don't cache misses, the file might get created by another session any moment
+            self.invalidate(file_name, folder_id)
+            return None
+
+        self.remember(file_name, files[0]['id'], folder_id)
+        return files[0]['id']
+
+    def cached(self, file_name, folder_id):
+        """
+        :param file_name: The name of the file
+        :param folder_id: The folder ID to check for the file
+        :return: The cached file ID, None if it isn't cached (nothing is asked from Drive)
+        """
+        with self._lock:
+            entry = self._ids.get((folder_id, file_name))
+            if entry and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            return None
+
+    def remember(self, file_name, file_id, folder_id):
+        """
+        Stores a known file ID (e.g. right after the file was created).
+        :param file_name: The name of the file
+        :param file_id: The Drive file ID
+        :param folder_id: The folder ID the file lives in
+        """
+        with self._lock:
+            self._ids[(folder_id, file_name)] = (file_id, time.monotonic() + self.ttl)
+
+    def invalidate(self, file_name, folder_id):
+        """
+        Drops a cached file ID so that the next lookup asks Drive again.
+        :param file_name: The name of the file
+        :param folder_id: The folder ID the file lives in
+        """
+        with self._lock:
+            self._ids.pop((folder_id, file_name), None)
+
+    def stats(self):
+        """
+        :return: Dictionary with the hit/miss counters and the number of cached IDs
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cached": len(self._ids)}
+
+
+### APPEND-ONLY DELTA LOG
+# Every logged set is written as its own small "delta" file next to the base log
+# (e.g. pushup_log.delta-20250101120000000000-1a2b3c4d.csv). Readers merge base + deltas,
+# and once enough deltas piled up they get folded back into the base file ("compaction").
+
+# Number of outstanding delta files that triggers a compaction
+DELTA_COMPACTION_THRESHOLD = 20
+
+# Column holding the ID of a log entry (used to de-duplicate and to delete entries)
+ENTRY_ID_COLUMN = 'EntryId'
+
+# Column holding the number of repetitions of an entry, in whichever discipline the log is for
+REPS_COLUMN = 'Reps'
+
+# Name of that column in the files and the database (the tracker started out with push-ups only)
+STORED_REPS_COLUMN = 'Pushups'
+
+# Columns the IDs of entries logged before there were IDs are derived from
+LOG_KEY_COLUMNS = ['Timestamp', 'User', REPS_COLUMN]
+
+
+# Function to build the name prefix shared by all delta files of a log
+def delta_prefix(file_name):
+    """
+    :param file_name: Name of the base log file (e.g. 'pushup_log.csv')
+    :return: Prefix of the delta files belonging to that log (e.g. 'pushup_log.delta-')
+    """
+    return f"{os.path.splitext(file_name)[0]}.delta-"
+
+
+# Function to build a new, unique delta file name
+def new_delta_name(file_name):
+    """
+    Delta names start with a UTC timestamp so that sorting by name gives the order they were written in.
+    :param file_name: Name of the base log file (e.g. 'pushup_log.csv')
+    :return: Name for a new delta file
+    """
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f")
+    return f"{delta_prefix(file_name)}{stamp}-{uuid.uuid4().hex[:8]}.csv"
+
+
+# Function to give the entries that have no ID (logged before there were IDs) one
+def with_entry_ids(log_data):
+    """
+    The ID of such an entry is derived from its LOG_KEY_COLUMNS plus a running number among
+    the equal entries of the frame, so two identical sets stay two entries and the same file
+    always gives the same IDs. Built with whole-column string operations (no Python call per row).
+    :param log_data: DataFrame with at least the LOG_KEY_COLUMNS
+    :return: The frame itself if every entry has an ID, else a copy with the IDs filled in
+    """
+    if ENTRY_ID_COLUMN in log_data.columns:
+        missing = log_data[ENTRY_ID_COLUMN].isna()
+        if not missing.any():
+            return log_data
+    else:
+        missing = pd.Series(True, index=log_data.index)
+    timestamps = log_data['Timestamp']
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        # The format of the CSV files, so that parsed timestamps and raw CSV strings give the same IDs
+        timestamps = timestamps.dt.strftime('%Y-%m-%d %H:%M:%S')
+    keys = timestamps.astype(str) + '|' + log_data['User'].astype(str) + '|' + log_data[REPS_COLUMN].astype(str)
+    legacy_ids = keys + '#' + keys.groupby(keys).cumcount().astype(str)
+    log_data = log_data.copy()
+    if ENTRY_ID_COLUMN in log_data.columns:
+        log_data[ENTRY_ID_COLUMN] = log_data[ENTRY_ID_COLUMN].astype(object).where(~missing, legacy_ids)
+    else:
+        log_data[ENTRY_ID_COLUMN] = legacy_ids
+    return log_data
+
+
+# Function to turn log rows into hashable keys
+def log_row_keys(log_data):
+    """
+    :param log_data: DataFrame of log entries
+    :return: Series of the entry IDs, one per row (see with_entry_ids() for entries without one)
+    """
+    return with_entry_ids(log_data)[ENTRY_ID_COLUMN]
+
+
+# Function to merge a base log with its delta records
+def merge_log_deltas(base, deltas):
+    """
+    Appends the delta rows to the base log, giving entries without an ID one (see with_entry_ids()).
+    Delta rows whose entry is already part of the base
+    (e.g. a compaction died between rewriting the base and deleting the deltas) or that
+    show up in two deltas (an append retried after a crash) are skipped.
+    :param base: DataFrame of the base log file
+    :param deltas: List of DataFrames, one per delta file, in the order they were written
+    :return: Merged DataFrame
+    """
+    base = with_entry_ids(base)
+    # IDs are derived per delta, so an old-style delta retried after a crash gives the same IDs again
+    deltas = [with_entry_ids(delta) for delta in deltas if delta is not None and not delta.empty]
+    if not deltas:
+        return base
+    new_rows = pd.concat(deltas, ignore_index=True)
+    if pd.api.types.is_datetime64_any_dtype(base['Timestamp']):
+        # Typed base (Parquet), but deltas are always CSV
+        new_rows['Timestamp'] = pd.to_datetime(new_rows['Timestamp'])
+    # The same entry in two deltas means an append was retried after it already went through
+    new_rows = new_rows[~new_rows[ENTRY_ID_COLUMN].duplicated()]
+    if not base.empty and not new_rows.empty:
+        new_rows = new_rows[~new_rows[ENTRY_ID_COLUMN].isin(set(base[ENTRY_ID_COLUMN]))]
+    base, new_rows = align_categories(base, new_rows)
+    return pd.concat([base, new_rows], ignore_index=True)
+
+
+# Function to give the categorical columns of two frames the same categories
+def align_categories(base, new_rows):
+    """
+    pd.concat turns categorical columns into plain objects unless both sides have the
+    same categories. Values of `new_rows` that `base` doesn't know yet become new categories.
+    :param base: DataFrame whose categorical columns set the categories
+    :param new_rows: DataFrame to be appended to `base`
+    :return: Tuple (base, new_rows) with matching categories
+    """
+    for column in base.columns:
+        if not isinstance(base[column].dtype, pd.CategoricalDtype) or column not in new_rows.columns:
+            continue
+        missing = pd.Index(new_rows[column].dropna().unique()).difference(base[column].cat.categories)
+        if len(missing):
+            base = base.assign(**{column: base[column].cat.add_categories(missing)})
+        new_rows = new_rows.assign(**{column: pd.Categorical(new_rows[column], dtype=base[column].dtype)})
+    return base, new_rows
+
+
+### CONDITIONAL RE-DOWNLOADS
+# Before downloading a file, its (cheap) metadata is fetched. If the content version
+# didn't change since the last download, the already parsed DataFrame is reused.
+
+# Metadata fields requested to tell whether a file's content changed
+FILE_VERSION_FIELDS = "id, trashed, size, md5Checksum, headRevisionId, modifiedTime"
+
+
+# Function to pick the content version out of a Drive file's metadata
+def drive_file_version(metadata):
+    """
+    :param metadata: Dictionary returned by files().get / files().update / files().list
+    :return: md5Checksum if available (binary files), else headRevisionId, else modifiedTime
+    """
+    return metadata.get('md5Checksum') or metadata.get('headRevisionId') or metadata.get('modifiedTime')
+
+
+class ContentCache:
+    """
+    Cache of parsed files, keyed by file name and content version.
+    A hit returns a copy, since callers (and the display functions) modify their frames in place.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # file name -> (version, DataFrame)
+        self._lock = threading.Lock()
+
+    def get(self, file_name, version):
+        """
+        :param file_name: Name of the file
+        :param version: Content version as reported by the backend
+        :return: Copy of the cached DataFrame if it is still the current version, None otherwise
+        """
+        with self._lock:
+            entry = self._entries.get(file_name)
+            if version is not None and entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1].copy()
+            self.misses += 1
+            return None
+
+    def has(self, file_name, version):
+        """
+        :return: Whether the cache holds this version of the file (without copying it)
+        """
+        with self._lock:
+            entry = self._entries.get(file_name)
+            return version is not None and entry is not None and entry[0] == version
+
+    def put(self, file_name, version, data):
+        """
+        :param file_name: Name of the file
+        :param version: Content version the data belongs to
+        :param data: The parsed DataFrame (stored as a copy)
+        """
+        if version is None:
+            return
+        with self._lock:
+            self._entries[file_name] = (version, data.copy())
+
+    def drop(self, file_name):
+        """Forgets a file (e.g. after it was deleted)."""
+        with self._lock:
+            self._entries.pop(file_name, None)
+
+    def drop_prefix(self, prefix):
+        """Forgets all files whose name starts with `prefix` (e.g. the delta files of a log)."""
+        with self._lock:
+            for file_name in [name for name in self._entries if name.startswith(prefix)]:
+                del self._entries[file_name]
+
+    def stats(self):
+        """
+        :return: Dictionary with the hit/miss counters and the number of cached files
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cached": len(self._entries)}
+
+
+### OPTIMISTIC CONCURRENCY FOR LOG REWRITES
+# Deleting entries (and compaction) rewrites the base log. Such a write carries the
+# revision of the log it was based on. If the log changed in the meantime, the change is
+# merged onto the newer rows and the write is retried - nobody has to reload the page.
+
+# Columns stored in the log files (the display functions add more columns to their frames)
+LOG_COLUMNS = ['Timestamp', REPS_COLUMN, 'User', 'comment', ENTRY_ID_COLUMN]
+
+# How often a stale log write is merged and retried before giving up
+MAX_WRITE_ATTEMPTS = 3
+
+
+class LogRevision(namedtuple('LogRevision', ['base_version', 'delta_ids'])):
+    """
+    Revision of a log: the content version of the base file plus the IDs of the delta
+    files merged on top of it. Two equal revisions mean the same log content.
+    """
+
+    def with_delta(self, delta_id):
+        """
+        :param delta_id: ID of a delta file that was just appended
+        :return: The revision including that delta
+        """
+        return LogRevision(self.base_version, self.delta_ids | {delta_id})
+
+
+class StaleRevisionError(Exception):
+    """Raised when a log still changed after MAX_WRITE_ATTEMPTS merge-and-retry rounds."""
+
+
+class StorageFileNotFoundError(FileNotFoundError):
+    """Raised when a file that should be read doesn't exist in the storage."""
+
+
+# Function to keep only the columns that belong into the log file
+def log_columns(log_data):
+    """
+    :param log_data: DataFrame of the log, possibly with derived columns (Date, Hour, ...)
+    :return: DataFrame with only the LOG_COLUMNS (the ones that exist)
+    """
+    return log_data[[column for column in LOG_COLUMNS if column in log_data.columns]]
+
+
+# Function to create a log without entries
+def empty_log():
+    """
+    :return: DataFrame with the LOG_COLUMNS and no rows
+    """
+    return pd.DataFrame(columns=LOG_COLUMNS)
+
+
+# Function to replay one writer's changes onto a newer version of the log
+def merge_log_changes(original, mine, theirs):
+    """
+    Three-way merge of log entries (rows are identified by their entry ID):
+    the rows removed between `original` and `mine` are removed from `theirs`, the rows
+    added are appended to it. Everything else in `theirs` (e.g. new sets logged by others) stays.
+    :param original: The log the writer started from
+    :param mine: The log the writer wants to store
+    :param theirs: The current remote log
+    :return: Merged DataFrame
+    """
+    original_keys = set(log_row_keys(original))
+    mine_keys = log_row_keys(mine)
+    removed = original_keys - set(mine_keys)
+    added = mine[~mine_keys.isin(original_keys)]
+
+    theirs_keys = log_row_keys(theirs)
+    merged = theirs[~theirs_keys.isin(removed)]
+    added = added[~log_row_keys(added).isin(set(theirs_keys))]
+    return pd.concat([merged, log_columns(added)], ignore_index=True)
+
+
+### FILE FORMATS
+# Files are stored as CSV by default. Files ending in .parquet are stored in the typed,
+# columnar Parquet format instead: timestamps don't have to be parsed on every load,
+# and the (dictionary-encoded, compressed) file is a lot smaller than the CSV.
+# Parquet support comes from pyarrow, which is installed together with streamlit.
+
+# Supported values for the "log_format" setting
+LOG_FORMATS = ('csv', 'parquet')
+
+
+# Function to build the name of a log file for the configured format
+def log_file_name(stem, log_format='csv'):
+    """
+    :param stem: File name without extension (e.g. 'pushup_log')
+    :param log_format: One of LOG_FORMATS
+    :return: File name (e.g. 'pushup_log.parquet')
+    """
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format '{log_format}', use one of {LOG_FORMATS}")
+    return f"{stem}.{log_format}"
+
+
+# Function to tell whether a file is stored as Parquet
+def is_parquet(file_name):
+    return file_name.endswith('.parquet')
+
+
+# Function to name the columns of a frame as they are stored
+def stored_frame(data):
+    """
+    :param data: DataFrame as the app uses it (e.g. a log with the REPS_COLUMN)
+    :return: The frame with the REPS_COLUMN named STORED_REPS_COLUMN (the frame itself if it has none)
+    """
+    if REPS_COLUMN not in data.columns:
+        return data
+    return data.rename(columns={REPS_COLUMN: STORED_REPS_COLUMN})
+
+
+# Function to name the columns of a frame read from the storage as the app uses them
+def loaded_frame(data):
+    """
+    :param data: DataFrame as stored (e.g. a log with the STORED_REPS_COLUMN)
+    :return: The frame with the STORED_REPS_COLUMN named REPS_COLUMN (the frame itself if it has none)
+    """
+    if STORED_REPS_COLUMN not in data.columns:
+        return data
+    return data.rename(columns={STORED_REPS_COLUMN: REPS_COLUMN})
+
+
+# Function to give a log its storage types
+def typed_log(log_data):
+    """
+    Converts a log to the column types used in Parquet files: datetime Timestamp,
+    int32 Reps, categorical User and string comment and EntryId.
+    :param log_data: DataFrame of the log (e.g. as parsed from CSV)
+    :return: New DataFrame with typed columns
+    """
+    log_data = log_columns(log_data).copy()
+    log_data['Timestamp'] = pd.to_datetime(log_data['Timestamp'])
+    log_data[REPS_COLUMN] = pd.to_numeric(log_data[REPS_COLUMN]).astype('int32')
+    log_data['User'] = log_data['User'].astype('category')
+    if 'comment' in log_data.columns:
+        log_data['comment'] = log_data['comment'].astype('string')
+    if ENTRY_ID_COLUMN in log_data.columns:
+        log_data[ENTRY_ID_COLUMN] = log_data[ENTRY_ID_COLUMN].astype('string')
+    return log_data
+
+
+# Weekday names in calendar order (the categories of the Weekday column)
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+# Function to turn a loaded log into the app's working copy
+def ingest_log(log_data):
+    """
+    Typed copy of a log (see typed_log()) plus the keys the views group by, computed once
+    instead of on every rerun: Date (the day as datetime), Hour, Weekday and Month ('YYYY-MM').
+    The app shares this frame between sessions, so the views must not modify it.
+    :param log_data: DataFrame of the log (e.g. as returned by fetch_log)
+    :return: New DataFrame
+    """
+    log_data = typed_log(with_entry_ids(loaded_frame(log_data)))
+    timestamps = log_data['Timestamp']
+    log_data['Date'] = timestamps.dt.normalize()
+    log_data['Hour'] = timestamps.dt.hour.astype('int8')
+    log_data['Weekday'] = pd.Categorical(timestamps.dt.day_name(), categories=WEEKDAYS, ordered=True)
+    log_data['Month'] = timestamps.dt.strftime('%Y-%m').astype('category')
+    return log_data
+
+
+# Function to turn a DataFrame into file content
+def serialize_frame(data, file_name):
+    """
+    :param data: DataFrame to store
+    :param file_name: Target file name, its extension selects the format
+    :return: Tuple (content as bytes, mimetype)
+    """
+    if is_parquet(file_name):
+        buffer = io.BytesIO()
+        stored_frame(typed_log(data)).to_parquet(buffer, index=False, compression='zstd')
+        return buffer.getvalue(), 'application/vnd.apache.parquet'
+    return stored_frame(data).to_csv(index=False).encode('utf-8'), 'text/csv'
+
+
+# Function to turn file content into a DataFrame
+def deserialize_frame(fh, file_name):
+    """
+    :param fh: File-like object holding the content
+    :param file_name: Name of the file, its extension selects the format
+    :return: pandas DataFrame
+    """
+    if is_parquet(file_name):
+        data = pd.read_parquet(fh)
+        # The display functions group by User and expect plain strings
+        # (a categorical groupby would also list users without any entries)
+        data['User'] = data['User'].astype(object)
+        return loaded_frame(data)
+    return loaded_frame(pd.read_csv(fh))
+
+
+### STREAMING READS
+# Multi-year logs don't have to be held in memory twice (raw bytes and parsed rows):
+# CSV files are parsed while the chunks arrive, and views that only show the latest
+# entries can fetch just the end of a file.
+
+# Bytes fetched per request/read while streaming (set chunk_size under [storage])
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Rows per DataFrame handed out by StorageBackend.fetch_chunks()
+CSV_ROWS_PER_CHUNK = 50000
+
+# Bytes per row guessed for the first tail request (grows until enough rows came back)
+TAIL_BYTES_PER_ROW = 64
+
+
+### PREFETCHING THE FILES OF A RENDER
+# A page render reads several files (the log and its deltas, suggestions, the season manifest).
+# StorageBackend.prefetch() looks them all up first - on Drive in one batch request - and
+# downloads the ones that changed in parallel, so a cold render waits about as long as the
+# slowest download instead of the sum of all lookups and downloads. The reads that follow
+# take the looked-up versions instead of asking again, and find the content in the cache.
+
+# Seconds a version or listing looked up by prefetch() is used by the reads (writes always ask)
+PREFETCH_TTL = 5
+
+# Parallel downloads of DriveBackend.prefetch(), each worker has its own HTTP connection
+DOWNLOAD_WORKERS = 4
+
+
+class ChunkStream(io.RawIOBase):
+    """Read-only file object on top of an iterator of byte chunks, e.g. for pd.read_csv."""
+
+    def __init__(self, chunks):
+        """
+        :param chunks: Iterator yielding bytes
+        """
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b""
+                return 0
+        count = min(len(target), len(self._buffer))
+        target[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        return count
+
+
+# Function to parse the end of a CSV file
+def parse_csv_tail(header, content, at_start):
+    """
+    :param header: The file's first line (column names), including the line break
+    :param content: The last bytes of the file
+    :param at_start: True if `content` is the whole file (starts with the header)
+    :return: pandas DataFrame of the complete rows in `content`, None if there are none yet
+    """
+    if at_start:
+        return loaded_frame(pd.read_csv(io.BytesIO(content)))
+    # The first line is most likely cut off
+    line_break = content.find(b"\n")
+    if line_break == -1:
+        return None
+    return loaded_frame(pd.read_csv(io.BytesIO(header + content[line_break + 1:])))
+
+
+### STORAGE BACKENDS
+# The app talks to one StorageBackend, chosen with `backend` under [storage] in the secrets:
+#   "drive"  - a GoogleDrive folder (default)
+#   "local"  - a directory on the server's disk
+#   "sqlite" - a SQLite database file, logs are kept as indexed rows
+# Backends raise exceptions, the app decides how to show them.
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend:
+    """
+    Base class of the storage backends. Subclasses implement the file primitives
+    (file_version, download, upload, list_files, delete_file). The file and log operations
+    the app uses (fetch, push, append, fetch_log, write_log, ...) are built on top of them:
+    a log is a base file plus small delta files, see "APPEND-ONLY DELTA LOG" above.
+    """
+
+    def __init__(self):
+        self.content_cache = ContentCache()
+        self.chunk_size = DOWNLOAD_CHUNK_SIZE
+        self._prefetched = {}  # file name or delta prefix -> (version or listing, expires_at), see prefetch()
+        self._prefetch_lock = threading.Lock()
+        # Only one log rewrite (delete or compaction) per backend at a time
+        self._write_lock = threading.Lock()
+
+    # File primitives - implemented by the subclasses
+
+    def file_version(self, file_name):
+        """
+        :param file_name: Name of the file
+        :return: Content version of the file (changes whenever the content does), None if it doesn't exist
+        """
+        raise NotImplementedError
+
+    def download(self, file_name):
+        """
+        :param file_name: Name of the file
+        :return: BytesIO holding the file content, positioned at the start
+        """
+        raise NotImplementedError
+
+    def upload(self, file_name, content, mimetype):
+        """
+        Creates or overwrites a file.
+        :param file_name: Name of the file
+        :param content: File content as bytes
+        :param mimetype: Mimetype of the content
+        :return: The new content version
+        """
+        raise NotImplementedError
+
+    def create(self, file_name, content, mimetype):
+        """
+        Creates a file whose name is known to be new (delta files). Same parameters as upload().
+        """
+        return self.upload(file_name, content, mimetype)
+
+    def list_files(self, prefix):
+        """
+        :param prefix: Start of the file names to list
+        :return: List of (file name, content version) tuples, sorted by name
+        """
+        raise NotImplementedError
+
+    def delete_file(self, file_name):
+        """
+        Deletes a file (no error if it doesn't exist).
+        :param file_name: Name of the file
+        """
+        raise NotImplementedError
+
+    # Ranged and streaming reads - the subclasses override these if they can do better
+    # than downloading the whole file
+
+    def iter_content(self, file_name):
+        """
+        :param file_name: Name of the file
+        :return: Iterator over the file content in chunks of up to self.chunk_size bytes
+        """
+        fh = self.download(file_name)
+        while True:
+            chunk = fh.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def file_size(self, file_name):
+        """
+        :param file_name: Name of the file
+        :return: Size of the file in bytes, None if it doesn't exist
+        """
+        if self.file_version(file_name) is None:
+            return None
+        return len(self.download(file_name).getbuffer())
+
+    def download_range(self, file_name, start, end):
+        """
+        :param file_name: Name of the file
+        :param start: Offset of the first byte
+        :param end: Offset after the last byte
+        :return: The bytes start..end-1 of the file
+        """
+        return self.download(file_name).getvalue()[start:end]
+
+    # Several files at once - the subclasses override these if they can do better than
+    # one file after the other
+
+    def lookup(self, file_names, prefixes=()):
+        """
+        :param file_names: Names of the files
+        :param prefixes: Starts of file names to list (e.g. the delta prefix of a log)
+        :return: Tuple (dictionary file name -> content version or None,
+                 dictionary prefix -> list of (file name, content version) as returned by list_files())
+        """
+        return ({file_name: self.file_version(file_name) for file_name in file_names},
+                {prefix: self.list_files(prefix) for prefix in prefixes})
+
+    def read_files(self, versions):
+        """
+        Downloads and parses files into the content cache.
+        :param versions: Dictionary file name -> content version
+        """
+        for file_name, version in versions.items():
+            self.read_file(file_name, version)
+
+    # Prefetching (see "PREFETCHING THE FILES OF A RENDER" above)
+
+    @perf.timed
+    def prefetch(self, file_names, log_names=()):
+        """
+        Looks up the files a page render is about to read and gets the content of those
+        that changed into the content cache.
+        :param file_names: Names of single files (e.g. 'suggestion.csv')
+        :param log_names: Names of logs, their base file and their delta files are prefetched
+        """
+        prefixes = [delta_prefix(log_name) for log_name in log_names]
+        versions, listings = self.lookup(list(file_names) + list(log_names), prefixes)
+        expires_at = time.monotonic() + PREFETCH_TTL
+        with self._prefetch_lock:
+            for key, value in list(versions.items()) + list(listings.items()):
+                self._prefetched[key] = (value, expires_at)
+        wanted = dict(versions)
+        for listing in listings.values():
+            wanted.update(listing)
+        self.read_files({file_name: version for file_name, version in wanted.items()
+                         if version is not None and not self.content_cache.has(file_name, version)})
+
+    def _prefetched_or(self, key, look_up):
+        """
+        :param key: File name or prefix
+        :param look_up: Function asking the storage, used if prefetch() didn't look the key up recently
+        :return: The version of the file or the listing of the prefix
+        """
+        with self._prefetch_lock:
+            entry = self._prefetched.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return look_up()
+
+    def _forget_prefetched(self, key):
+        """Drops what prefetch() looked up for a file name or prefix (e.g. after writing it)."""
+        with self._prefetch_lock:
+            self._prefetched.pop(key, None)
+
+    # Files
+
+    @perf.timed
+    def read_file(self, file_name, version):
+        """
+        Returns the parsed content of a file. Download and parsing only happen if the
+        content cache doesn't already hold this version of the file.
+        :param file_name: Name of the file, its extension selects the format (CSV or Parquet)
+        :param version: Content version of the file, None to always download
+        :return: pandas DataFrame containing the file's data
+        """
+        data = self.content_cache.get(file_name, version)
+        if data is None:
+            if is_parquet(file_name):
+                data = deserialize_frame(self.download(file_name), file_name)
+            else:
+                # Parsed while downloading, the raw file is never held in memory as a whole
+                stream = io.BufferedReader(ChunkStream(self.iter_content(file_name)), self.chunk_size)
+                data = loaded_frame(pd.read_csv(stream))
+            self.content_cache.put(file_name, version, data)
+        return data
+
+    @perf.timed
+    def fetch(self, file_name):
+        """
+        :param file_name: Name of the file (e.g. 'suggestion.csv')
+        :return: pandas DataFrame containing the file's data, None if the file doesn't exist
+        """
+        # Ask for the (cheap) version first, the download only happens if the content changed
+        version = self._prefetched_or(file_name, lambda: self.file_version(file_name))
+        if version is None:
+            return None
+        return self.read_file(file_name, version)
+
+    def fetch_chunks(self, file_name, rows_per_chunk=CSV_ROWS_PER_CHUNK):
+        """
+        Streams a file: rows are parsed while the download is still running, so only one
+        chunk of the file and one DataFrame of rows are in memory at a time.
+        Parquet files can't be parsed from a partial download and come as a single chunk.
+        :param file_name: Name of the file
+        :param rows_per_chunk: Most rows per DataFrame
+        :return: Iterator over DataFrames holding consecutive rows of the file
+        """
+        if is_parquet(file_name):
+            yield self.read_file(file_name, None)
+            return
+        stream = io.BufferedReader(ChunkStream(self.iter_content(file_name)), self.chunk_size)
+        with pd.read_csv(stream, chunksize=rows_per_chunk) as reader:
+            for chunk in reader:
+                yield loaded_frame(chunk)
+
+    @perf.timed
+    def fetch_tail(self, file_name, rows):
+        """
+        Returns the last rows of a file. For CSV files only the end of the file (and its
+        first line for the column names) is downloaded; if that turns out to hold too few
+        rows, a bigger piece is requested. Assumes no field contains a line break.
+        :param file_name: Name of the file
+        :param rows: Number of rows
+        :return: pandas DataFrame with (up to) the last `rows` rows, None if the file doesn't exist
+        """
+        if is_parquet(file_name):
+            data = self.fetch(file_name)
+            return data.tail(rows).reset_index(drop=True) if data is not None else None
+        size = self.file_size(file_name)
+        if size is None:
+            return None
+        if size == 0:
+            return pd.DataFrame()
+
+        # First line = column names
+        header, count = b"", 1024
+        while b"\n" not in header and len(header) < size:
+            header = self.download_range(file_name, 0, min(count, size))
+            count *= 4
+        header = header[:header.find(b"\n") + 1] if b"\n" in header else header + b"\n"
+
+        count = max(rows, 1) * TAIL_BYTES_PER_ROW
+        while True:
+            start = max(size - count, 0)
+            data = parse_csv_tail(header, self.download_range(file_name, start, size), start == 0)
+            if start == 0 or (data is not None and len(data) >= rows):
+                return data.tail(rows).reset_index(drop=True)
+            count *= 4
+
+    @perf.timed
+    def push(self, data, file_name):
+        """
+        :param data: DataFrame to store
+        :param file_name: Name of the file, its extension selects the format (CSV or Parquet)
+        :return: The new content version
+        """
+        content, mimetype = serialize_frame(data, file_name)
+        self._forget_prefetched(file_name)
+        version = self.upload(file_name, content, mimetype)
+        # Remember what was written, so the next fetch doesn't need to download it again
+        self.content_cache.put(file_name, version, deserialize_frame(io.BytesIO(content), file_name))
+        return version
+
+    # Appended records (e.g. suggestions) - like a log, new rows are delta files next to the
+    # base file, but there is no merging of edits: rows are only ever added
+
+    @perf.timed
+    def append_rows(self, new_rows, file_name):
+        """
+        Adds rows to a file without reading or rewriting it.
+        :param new_rows: DataFrame holding the rows to add
+        :param file_name: Name of the base file (e.g. 'suggestion.csv'), it doesn't have to exist
+        """
+        delta_name = new_delta_name(file_name)
+        content, mimetype = serialize_frame(new_rows, delta_name)
+        self._forget_prefetched(delta_prefix(file_name))
+        self.create(delta_name, content, mimetype)
+
+    def _read_rows(self, file_name):
+        """
+        :param file_name: Name of the base file
+        :return: Tuple (DataFrame with the rows or None, version of the base file, list of the delta files)
+        """
+        base_version = self._prefetched_or(file_name, lambda: self.file_version(file_name))
+        deltas = self.list_files(delta_prefix(file_name))
+        # Delta files never change, each one is downloaded only once
+        frames = [self.read_file(name, version) for name, version in deltas]
+        if base_version is not None:
+            frames.insert(0, self.read_file(file_name, base_version))
+        if not frames:
+            return None, base_version, deltas
+        # A sync that was retried after its write went through adds the same rows twice
+        return pd.concat(frames, ignore_index=True).drop_duplicates(ignore_index=True), base_version, deltas
+
+    @perf.timed
+    def read_rows(self, file_name):
+        """
+        Reads a file of rows. Like fetch_log(), a compaction is started in the background
+        if too many delta files piled up.
+        :param file_name: Name of the base file (e.g. 'suggestion.csv')
+        :return: pandas DataFrame with the rows of the base file followed by the added rows in
+                 the order they were added, None if there are none of either
+        """
+        rows, base_version, deltas = self._read_rows(file_name)
+        if len(deltas) >= DELTA_COMPACTION_THRESHOLD and not self._write_lock.locked():
+            threading.Thread(target=self.compact_log, args=(file_name, True), daemon=True).start()
+        return rows
+
+    # Logs
+
+    @perf.timed
+    def append(self, new_entry, log_name, based_on=None):
+        """
+        Appends entries to a log without touching the (big) base file. The cost of this
+        does not depend on how big the log already is.
+        :param new_entry: DataFrame holding the entries to append
+        :param log_name: Name of the base log file (e.g. 'pushup_log.csv')
+        :param based_on: LogRevision of the caller's copy of the log (None if unknown)
+        :return: LogRevision of the caller's copy with the new entries added, None if unknown
+        """
+        delta_name = new_delta_name(log_name)
+        content, mimetype = serialize_frame(new_entry, delta_name)
+        self._forget_prefetched(delta_prefix(log_name))
+        self.create(delta_name, content, mimetype)
+        return based_on.with_delta(delta_name) if based_on is not None else None
+
+    def forget_log(self, log_name):
+        """
+        Frees the parsed base file and deltas of a log that isn't needed anymore (e.g. a season
+        that was unloaded). Reading it again downloads it again.
+        :param log_name: Name of the base log file
+        """
+        self.content_cache.drop(log_name)
+        self.content_cache.drop_prefix(delta_prefix(log_name))
+
+    @perf.timed
+    def get_log_revision(self, log_name, prefetched=False):
+        """
+        :param log_name: Name of the base log file
+        :param prefetched: Take what prefetch() looked up, if it did so recently (only for reading)
+        :return: Tuple (current LogRevision, list of the outstanding delta files), nothing is downloaded
+        """
+        prefix = delta_prefix(log_name)
+        if prefetched:
+            base_version = self._prefetched_or(log_name, lambda: self.file_version(log_name))
+            deltas = self._prefetched_or(prefix, lambda: self.list_files(prefix))
+        else:
+            base_version = self.file_version(log_name)
+            deltas = self.list_files(prefix)
+        return LogRevision(base_version, frozenset(name for name, version in deltas)), deltas
+
+    @perf.timed
+    def read_log(self, log_name):
+        """
+        :param log_name: Name of the base log file
+        :return: Tuple (merged DataFrame or None, its LogRevision, list of the delta files that went into it)
+        """
+        prefix = delta_prefix(log_name)
+        base_version = self._prefetched_or(log_name, lambda: self.file_version(log_name))
+        deltas = self._prefetched_or(prefix, lambda: self.list_files(prefix))
+        if base_version is None:
+            # A new log has no base file until its deltas are compacted the first time
+            if not deltas:
+                return None, None, []
+            base = empty_log()
+        else:
+            base = self.read_file(log_name, base_version)
+        # Deltas never change after they were written, so each one is downloaded only once
+        delta_frames = [self.read_file(name, version) for name, version in deltas]
+        revision = LogRevision(base_version, frozenset(name for name, version in deltas))
+        return merge_log_deltas(base, delta_frames), revision, deltas
+
+    @perf.timed
+    def fetch_log(self, log_name):
+        """
+        Fetches a log (base + outstanding deltas). If too many delta files piled up,
+        a compaction is started in the background (the caller doesn't wait for it).
+        :param log_name: Name of the base log file
+        :return: Tuple (pandas DataFrame containing the log, its LogRevision), (None, None) if there is no log
+        """
+        log, revision, deltas = self.read_log(log_name)
+        if len(deltas) >= DELTA_COMPACTION_THRESHOLD and not self._write_lock.locked():
+            threading.Thread(target=self.compact_log, args=(log_name,), daemon=True).start()
+        return log, revision
+
+    @perf.timed
+    def write_log(self, log_data, log_name, based_on, original):
+        """
+        Replaces the base log with `log_data` and deletes the deltas folded into it.
+        If the log isn't at revision `based_on` anymore (somebody logged or deleted entries
+        in the meantime), the change from `original` to `log_data` is merged onto the newer
+        log and the write is tried again. A writer that still holds the current revision
+        writes right away, without downloading anything first.
+        Drive has no atomic compare-and-swap, so this narrows the race to the time between
+        the revision check and the upload; within this process writes are serialized.
+        :param log_data: The log as it should be stored
+        :param log_name: Name of the base log file
+        :param based_on: LogRevision of the log the change was made on
+        :param original: The log (DataFrame) at revision `based_on`
+        :return: Tuple (the log as written, its new LogRevision)
+        """
+        with self._write_lock:
+            # The retries below have to see what is stored right now
+            self._forget_prefetched(log_name)
+            self._forget_prefetched(delta_prefix(log_name))
+            for attempt in range(MAX_WRITE_ATTEMPTS):
+                current, deltas = self.get_log_revision(log_name)
+                if current != based_on:
+                    # Stale: replay our change onto the newer log and check again
+                    theirs, based_on, deltas = self.read_log(log_name)
+                    if theirs is None:
+                        theirs = original.iloc[0:0]
+                    log_data = merge_log_changes(original, log_data, theirs)
+                    original = theirs
+                    continue
+
+                log_data = log_columns(log_data).reset_index(drop=True)
+                version = self.push(log_data, log_name)
+                self._forget_prefetched(delta_prefix(log_name))
+                for name, delta_version in deltas:
+                    self.delete_file(name)
+                    self.content_cache.drop(name)
+                return log_data, LogRevision(version, frozenset())
+
+            raise StaleRevisionError(f"{log_name} kept changing while writing, please try again")
+
+    def compact_log(self, log_name, rows=False):
+        """
+        Folds all outstanding deltas into the base log and deletes them. Deltas written
+        while the compaction runs are left alone and picked up by the next one.
+        Runs in a background thread, so errors are logged instead of raised.
+        :param log_name: Name of the base log file
+        :param rows: True for a file of rows (see append_rows()) instead of a log
+        """
+        try:
+            if rows:
+                self._compact_rows(log_name)
+                return
+            log, revision, deltas = self.read_log(log_name)
+            if log is not None and deltas:
+                self.write_log(log, log_name, revision, log)
+        except Exception:
+            logger.exception("Compacting %s failed", log_name)
+
+    def _compact_rows(self, file_name):
+        """Folds the delta files of a file of rows into its base file (see compact_log())."""
+        with self._write_lock:
+            self._forget_prefetched(file_name)
+            rows, base_version, deltas = self._read_rows(file_name)
+            if not deltas:
+                return
+            # The base changed while the deltas were read (another process compacted), leave it to the next read
+            if self.file_version(file_name) != base_version:
+                return
+            self.push(rows, file_name)
+            self._forget_prefetched(delta_prefix(file_name))
+            for name, delta_version in deltas:
+                self.delete_file(name)
+                self.content_cache.drop(name)
+
+    @perf.timed
+    def read_log_tail(self, log_name, rows):
+        """
+        Returns the latest entries of a log without downloading the whole base file:
+        the end of the base file plus the outstanding deltas (which are newer).
+        :param log_name: Name of the base log file
+        :param rows: Number of entries
+        :return: pandas DataFrame with (up to) the last `rows` entries in log order, None if there is no log
+        """
+        base = self.fetch_tail(log_name, rows)
+        if base is None:
+            return None
+        if 'comment' in base.columns:
+            # The last rows often have no comment at all, which would make the column float
+            base['comment'] = base['comment'].astype(object)
+        deltas = self.list_files(delta_prefix(log_name))
+        delta_frames = [self.read_file(name, version) for name, version in deltas]
+        return merge_log_deltas(base, delta_frames).tail(rows).reset_index(drop=True)
+
+    @perf.timed
+    def read_log_range(self, log_name, start=None, end=None):
+        """
+        Returns the entries with start <= Timestamp < end. This base version loads the whole
+        log and filters it; SQLiteBackend reads just the range.
+        :param log_name: Name of the base log file
+        :param start: First timestamp to include (anything pd.Timestamp accepts), None for no lower bound
+        :param end: First timestamp to exclude, None for no upper bound
+        :return: pandas DataFrame with the matching entries, None if there is no log
+        """
+        log, revision = self.fetch_log(log_name)
+        if log is None:
+            return None
+        timestamps = pd.to_datetime(log['Timestamp'])
+        mask = pd.Series(True, index=log.index)
+        if start is not None:
+            mask &= timestamps >= pd.Timestamp(start)
+        if end is not None:
+            mask &= timestamps < pd.Timestamp(end)
+        return log[mask].reset_index(drop=True)
+
+
+class DriveBackend(StorageBackend):
+    """Keeps the files in a GoogleDrive folder."""
+
+    def __init__(self, service, folder_id, file_id_ttl=FILE_ID_TTL, http_factory=None):
+        """
+        :param service: Authenticated Google Drive service instance
+        :param folder_id: The Google Drive folder ID where the files are stored
+        :param file_id_ttl: Seconds a resolved file ID stays valid
+        :param http_factory: Function opening a new authorized HTTP connection (one per thread),
+                             None to open them with the service's credentials
+        """
+        super().__init__()
+        self.service = service
+        self.folder_id = folder_id
+        self.file_ids = FileIdRegistry(file_id_ttl)
+        if http_factory is None and hasattr(getattr(service, '_http', None), 'credentials'):
+            http_factory = self._authorized_http
+        # Without a way to open connections everything goes through the service's own connection
+        # and the downloads run one after the other
+        self.http_factory = http_factory
+        self._connections = threading.local()  # each thread's own HTTP connection
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _authorized_http(self):
+        """
+        :return: New HTTP connection with the service's credentials (httplib2 connections can't be shared between threads)
+        """
+        import google_auth_httplib2
+        import httplib2
+        return google_auth_httplib2.AuthorizedHttp(self.service._http.credentials, http=httplib2.Http())
+
+    def _http(self):
+        """
+        Every thread (the sessions' script threads, the sync worker, a compaction, the download
+        workers) sends its requests on a connection of its own, opened on its first request.
+        :return: The calling thread's HTTP connection, None for the service's own (no http_factory)
+        """
+        if self.http_factory is None:
+            return None
+        http = getattr(self._connections, 'http', None)
+        if http is None:
+            http = self._connections.http = self.http_factory()
+        return http
+
+    @perf.timed
+    def get_file_id(self, file_name):
+        """
+        Looks up a file's ID. IDs are cached in self.file_ids, so files().list only runs
+        the first time a name is needed (or after the cached entry expired/was invalidated).
+        Missing files are NOT created here.
+        :param file_name: The name of the file to retrieve
+        :return: File ID if found, None otherwise
+        """
+        return self.file_ids.lookup(self.service, file_name, self.folder_id, self._http())
+
+    @perf.timed
+    def get_file_metadata(self, file_name):
+        """
+        Looks up a file and asks Drive for its content version, without downloading it.
+        :param file_name: The name of the file (e.g., 'pushup_log.csv')
+        :return: Tuple (file ID, metadata dictionary), (None, None) if the file doesn't exist
+        """
+        # Second attempt only happens if the cached file ID is trashed or answered with a 404
+        for attempt in range(2):
+            file_id = self.get_file_id(file_name)
+            if not file_id:
+                return None, None
+
+            try:
+                perf.count(requests=1)
+                request = self.service.files().get(fileId=file_id, fields=FILE_VERSION_FIELDS)
+                metadata = request.execute(http=self._http())
+                if not metadata.get('trashed'):
+                    return file_id, metadata
+            except Exception as e:
+                if not is_not_found(e):
+                    raise
+            # The file behind the cached ID is gone - look the name up again
+            self.file_ids.invalidate(file_name, self.folder_id)
+        raise RuntimeError("the file ID went stale twice in a row")
+
+    def file_version(self, file_name):
+        file_id, metadata = self.get_file_metadata(file_name)
+        return drive_file_version(metadata) if file_id else None
+
+    def download(self, file_name):
+        from googleapiclient.http import DEFAULT_CHUNK_SIZE
+        fh = io.BytesIO()  # Use a BytesIO object to store the file in memory
+        for chunk in self.iter_content(file_name, DEFAULT_CHUNK_SIZE):
+            fh.write(chunk)
+
+        # Once downloaded, move the cursor to the start of the file content
+        fh.seek(0)
+        return fh
+
+    def iter_content(self, file_name, chunk_size=None):
+        """
+        Downloads a file in ranged requests of `chunk_size` bytes (default: self.chunk_size)
+        and hands out each chunk as soon as it arrived.
+        """
+        from googleapiclient.http import MediaIoBaseDownload
+        file_id = self.get_file_id(file_name)
+        if not file_id:
+            raise StorageFileNotFoundError(f"File {file_name} not found in Google Drive.")
+        try:
+            request = self.service.files().get_media(fileId=file_id)
+            if self.http_factory is not None:
+                request.http = self._http()
+            fh = io.BytesIO()  # Holds one chunk at a time
+            downloader = MediaIoBaseDownload(fh, request, chunksize=chunk_size or self.chunk_size)
+
+            done = False
+            while done is False:
+                with perf.span("DriveBackend.download_chunk"):
+                    status, done = downloader.next_chunk()
+                    perf.count(requests=1, transferred=fh.tell())
+                yield fh.getvalue()
+                fh.seek(0)
+                fh.truncate()
+        except Exception as e:
+            if is_not_found(e):
+                # Next time the name gets looked up again
+                self.file_ids.invalidate(file_name, self.folder_id)
+            raise
+
+    def file_size(self, file_name):
+        file_id, metadata = self.get_file_metadata(file_name)
+        return int(metadata.get('size', 0)) if file_id else None
+
+    @perf.timed
+    def download_range(self, file_name, start, end):
+        from googleapiclient.errors import HttpError
+        if start >= end:
+            return b""
+        file_id = self.get_file_id(file_name)
+        if not file_id:
+            raise StorageFileNotFoundError(f"File {file_name} not found in Google Drive.")
+        # Same ranged GET that MediaIoBaseDownload sends for each chunk
+        request = self.service.files().get_media(fileId=file_id)
+        if self.http_factory is not None:
+            request.http = self._http()
+        response, content = request.http.request(request.uri, headers={'range': f'bytes={start}-{end - 1}'})
+        perf.count(requests=1, transferred=len(content))
+        if response.status not in (200, 206):
+            if response.status == 404:
+                self.file_ids.invalidate(file_name, self.folder_id)
+            raise HttpError(response, content, uri=request.uri)
+        # A server that ignores the range answers with the whole file
+        return content[start:end] if response.status == 200 else content
+
+    @perf.timed
+    def upload(self, file_name, content, mimetype):
+        from googleapiclient.http import MediaIoBaseUpload
+        # Second attempt only happens if the cached file ID turned out to be stale
+        for attempt in range(2):
+            # Check if the file already exists in Google Drive
+            file_id = self.get_file_id(file_name)
+            if not file_id:
+                # Create a new file if it doesn't exist
+                return self.create(file_name, content, mimetype)
+
+            try:
+                # Update the existing file with new data
+                media = MediaIoBaseUpload(io.BytesIO(content), mimetype=mimetype)
+                perf.count(requests=1, transferred=len(content))
+                request = self.service.files().update(fileId=file_id, media_body=media, fields=FILE_VERSION_FIELDS)
+                updated_file = request.execute(http=self._http())
+                if not updated_file.get('trashed'):
+                    return drive_file_version(updated_file)
+            except Exception as e:
+                if not is_not_found(e):
+                    raise
+            # The cached ID belongs to a trashed or deleted file - forget it and look the name up again
+            self.file_ids.invalidate(file_name, self.folder_id)
+        raise RuntimeError("the file ID went stale twice in a row")
+
+    @perf.timed
+    def create(self, file_name, content, mimetype):
+        from googleapiclient.http import MediaIoBaseUpload
+        file_metadata = {
+            'name': file_name,
+            'parents': [self.folder_id]
+        }
+        media = MediaIoBaseUpload(io.BytesIO(content), mimetype=mimetype)
+        perf.count(requests=1, transferred=len(content))
+        new_file = self.service.files().create(body=file_metadata, media_body=media,
+                                               fields=FILE_VERSION_FIELDS).execute(http=self._http())
+        self.file_ids.remember(file_name, new_file['id'], self.folder_id)
+        return drive_file_version(new_file)
+
+    @perf.timed
+    def list_files(self, prefix):
+        query = f"'{self.folder_id}' in parents and name contains '{prefix}' and trashed = false"
+        files = []
+        page_token = None
+        while True:
+            perf.count(requests=1)
+            request = self.service.files().list(q=query, fields="nextPageToken, files(id, name, md5Checksum)",
+                                                pageToken=page_token)
+            results = request.execute(http=self._http())
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        return self._listing(prefix, files)
+
+    def _listing(self, prefix, files):
+        """
+        :param prefix: Start of the file names that were listed
+        :param files: Files as returned by files().list
+        :return: List of (file name, content version) tuples, sorted by name
+        """
+        # "contains" matches on word prefixes, keep only real prefix matches
+        files = [file for file in files if file['name'].startswith(prefix)]
+        for file in files:
+            # Saves the lookup when the file gets downloaded or deleted
+            self.file_ids.remember(file['name'], file['id'], self.folder_id)
+        return sorted((file['name'], drive_file_version(file)) for file in files)
+
+    @perf.timed
+    def lookup(self, file_names, prefixes=()):
+        """
+        Sends all lookups as one batch request: files().get for each file whose ID is known,
+        one files().list for the names whose ID isn't, and one files().list per prefix.
+        What the batch couldn't answer (a stale ID, a listing with more than one page) is
+        looked up on its own afterwards.
+        """
+        versions, listings = {}, {}
+        retry_names, retry_prefixes = [], []
+        file_ids = {file_name: self.file_ids.cached(file_name, self.folder_id) for file_name in file_names}
+        unknown = [file_name for file_name, file_id in file_ids.items() if file_id is None]
+
+        def got_metadata(file_name):
+            def callback(request_id, response, exception):
+                if exception is None and not response.get('trashed'):
+                    versions[file_name] = drive_file_version(response)
+                    return
+                if exception is None or is_not_found(exception):
+                    self.file_ids.invalidate(file_name, self.folder_id)
+                retry_names.append(file_name)
+            return callback
+
+        def got_names(request_id, response, exception):
+            if exception is not None:
+                retry_names.extend(unknown)
+                return
+            found = {}
+            for file in response.get('files', []):
+                found.setdefault(file['name'], file)
+            for file_name in unknown:
+                file = found.get(file_name)
+                if file is not None:
+                    self.file_ids.remember(file_name, file['id'], self.folder_id)
+                versions[file_name] = drive_file_version(file) if file is not None else None
+
+        def got_listing(prefix):
+            def callback(request_id, response, exception):
+                if exception is not None or response.get('nextPageToken'):
+                    retry_prefixes.append(prefix)
+                else:
+                    listings[prefix] = self._listing(prefix, response.get('files', []))
+            return callback
+
+        batch = self.service.new_batch_http_request()
+        for file_name, file_id in file_ids.items():
+            if file_id is not None:
+                batch.add(self.service.files().get(fileId=file_id, fields=FILE_VERSION_FIELDS),
+                          callback=got_metadata(file_name))
+        if unknown:
+            names = " or ".join(f"name = '{file_name}'" for file_name in unknown)
+            query = f"'{self.folder_id}' in parents and ({names}) and trashed = false"
+            batch.add(self.service.files().list(q=query, fields=f"files(name, {FILE_VERSION_FIELDS})"),
+                      callback=got_names)
+        for prefix in prefixes:
+            query = f"'{self.folder_id}' in parents and name contains '{prefix}' and trashed = false"
+            batch.add(self.service.files().list(q=query, fields="nextPageToken, files(id, name, md5Checksum)"),
+                      callback=got_listing(prefix))
+        if file_ids or prefixes:
+            perf.count(requests=1)
+            batch.execute(http=self._http())
+
+        for file_name in retry_names:
+            versions[file_name] = self.file_version(file_name)
+        for prefix in retry_prefixes:
+            listings[prefix] = self.list_files(prefix)
+        return versions, listings
+
+    def read_files(self, versions):
+        """
+        Downloads the files in parallel, on up to DOWNLOAD_WORKERS threads with an HTTP
+        connection each.
+        """
+        if len(versions) < 2 or self.http_factory is None:
+            return super().read_files(versions)
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(DOWNLOAD_WORKERS, thread_name_prefix="drive-download")
+        futures = [self._pool.submit(self._read_on_worker, file_name, version) for file_name, version in versions.items()]
+        for future in futures:
+            counted = future.result()
+            perf.count(requests=counted.requests, transferred=counted.bytes)
+
+    def _read_on_worker(self, file_name, version):
+        """
+        Reads a file into the content cache on a download worker.
+        :return: perf.Rerun holding the requests and bytes of the download (for the page's rerun)
+        """
+        counted = perf.Rerun(file_name)
+        with perf.recording(counted):
+            self.read_file(file_name, version)
+        return counted
+
+    @perf.timed
+    def delete_file(self, file_name):
+        file_id = self.get_file_id(file_name)
+        if file_id:
+            try:
+                perf.count(requests=1)
+                self.service.files().delete(fileId=file_id).execute(http=self._http())
+            except Exception as e:
+                if not is_not_found(e):
+                    raise
+        self.file_ids.invalidate(file_name, self.folder_id)
+
+
+class LocalBackend(StorageBackend):
+    """Keeps the files in a directory on the server (e.g. for self-hosting or offline benchmarks)."""
+
+    def __init__(self, directory):
+        """
+        :param directory: Directory holding the files (created if needed)
+        """
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, file_name):
+        return os.path.join(self.directory, file_name)
+
+    def file_version(self, file_name):
+        try:
+            stat = os.stat(self._path(file_name))
+        except FileNotFoundError:
+            return None
+        # Files are replaced (new inode) on every write, see upload()
+        return f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}"
+
+    def download(self, file_name):
+        try:
+            with open(self._path(file_name), 'rb') as f:
+                return io.BytesIO(f.read())
+        except FileNotFoundError:
+            raise StorageFileNotFoundError(f"File {file_name} not found in {self.directory}.")
+
+    def iter_content(self, file_name):
+        try:
+            with open(self._path(file_name), 'rb') as f:
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+        except FileNotFoundError:
+            raise StorageFileNotFoundError(f"File {file_name} not found in {self.directory}.")
+
+    def file_size(self, file_name):
+        try:
+            return os.path.getsize(self._path(file_name))
+        except FileNotFoundError:
+            return None
+
+    def download_range(self, file_name, start, end):
+        try:
+            with open(self._path(file_name), 'rb') as f:
+                f.seek(start)
+                return f.read(max(end - start, 0))
+        except FileNotFoundError:
+            raise StorageFileNotFoundError(f"File {file_name} not found in {self.directory}.")
+
+    def upload(self, file_name, content, mimetype):
+        # Write to a temporary file first, so readers never see a half written file
+        temp_path = self._path(f".{file_name}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, self._path(file_name))
+        return self.file_version(file_name)
+
+    def list_files(self, prefix):
+        names = sorted(name for name in os.listdir(self.directory) if name.startswith(prefix))
+        files = [(name, self.file_version(name)) for name in names]
+        # A file might have been deleted between listdir() and stat()
+        return [(name, version) for name, version in files if version is not None]
+
+    def delete_file(self, file_name):
+        try:
+            os.remove(self._path(file_name))
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Keeps everything in one SQLite database. Log entries are rows of an indexed table,
+    so appends are single INSERTs, range reads only touch the requested rows and a rewrite
+    (deleting entries) is a transaction that can't lose concurrent changes.
+    Other files (e.g. suggestion.csv) are stored as blobs.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path of the database file (created if needed)
+        """
+        super().__init__()
+        self.path = path
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, content BLOB NOT NULL, version INTEGER NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS log_entries (id INTEGER PRIMARY KEY, log_name TEXT NOT NULL, "
+                "Timestamp TEXT NOT NULL, Pushups INTEGER NOT NULL, User TEXT NOT NULL, comment TEXT, EntryId TEXT)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(log_entries)")]
+            if ENTRY_ID_COLUMN not in columns:
+                # Databases from before there were entry IDs: the row ID is unique, so it serves as one
+                conn.execute(f"ALTER TABLE log_entries ADD COLUMN {ENTRY_ID_COLUMN} TEXT")
+                conn.execute(f"UPDATE log_entries SET {ENTRY_ID_COLUMN} = 'row-' || id")
+            conn.execute("CREATE INDEX IF NOT EXISTS log_entries_by_time ON log_entries (log_name, Timestamp)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS log_entries_by_id ON log_entries (log_name, {ENTRY_ID_COLUMN})")
+            conn.execute("CREATE TABLE IF NOT EXISTS log_versions (log_name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+
+    @contextmanager
+    def _transaction(self, immediate=True):
+        """
+        Opens a connection and runs the block as one transaction.
+        :param immediate: Take the write lock right away (for read-modify-write blocks). Pure reads
+                          pass False: they only take a shared lock once they read, so they don't
+                          block each other, and still see one consistent state of the database.
+        """
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN DEFERRED")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    # Files (stored as blobs)
+
+    def file_version(self, file_name):
+        with self._transaction(immediate=False) as conn:
+            row = conn.execute("SELECT version FROM files WHERE name = ?", (file_name,)).fetchone()
+        return row[0] if row else None
+
+    def download(self, file_name):
+        with self._transaction(immediate=False) as conn:
+            row = conn.execute("SELECT content FROM files WHERE name = ?", (file_name,)).fetchone()
+        if row is None:
+            raise StorageFileNotFoundError(f"File {file_name} not found in {self.path}.")
+        return io.BytesIO(row[0])
+
+    def file_size(self, file_name):
+        with self._transaction(immediate=False) as conn:
+            row = conn.execute("SELECT length(content) FROM files WHERE name = ?", (file_name,)).fetchone()
+        return row[0] if row else None
+
+    def download_range(self, file_name, start, end):
+        with self._transaction(immediate=False) as conn:
+            row = conn.execute(
+                "SELECT substr(content, ?, ?) FROM files WHERE name = ?", (start + 1, max(end - start, 0), file_name)
+            ).fetchone()
+        if row is None:
+            raise StorageFileNotFoundError(f"File {file_name} not found in {self.path}.")
+        return bytes(row[0])
+
+    def upload(self, file_name, content, mimetype):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO files (name, content, version) VALUES (?, ?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET content = excluded.content, version = files.version + 1",
+                (file_name, content),
+            )
+            return conn.execute("SELECT version FROM files WHERE name = ?", (file_name,)).fetchone()[0]
+
+    def list_files(self, prefix):
+        with self._transaction(immediate=False) as conn:
+            rows = conn.execute(
+                "SELECT name, version FROM files WHERE substr(name, 1, ?) = ? ORDER BY name", (len(prefix), prefix)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def delete_file(self, file_name):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM files WHERE name = ?", (file_name,))
+
+    # Logs (stored as rows)
+
+    @staticmethod
+    def _log_version(conn, log_name):
+        row = conn.execute("SELECT version FROM log_versions WHERE log_name = ?", (log_name,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _bump_log_version(conn, log_name):
+        conn.execute(
+            "INSERT INTO log_versions (log_name, version) VALUES (?, 1) "
+            "ON CONFLICT (log_name) DO UPDATE SET version = version + 1",
+            (log_name,),
+        )
+        return SQLiteBackend._log_version(conn, log_name)
+
+    @staticmethod
+    def _log_rows(log_data):
+        """Turns log entries into tuples for the log_entries table (timestamps as sortable text)."""
+        rows = log_columns(with_entry_ids(loaded_frame(log_data))).copy()
+        rows['Timestamp'] = pd.to_datetime(rows['Timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        if 'comment' not in rows.columns:
+            rows['comment'] = None
+        rows = rows.astype(object).where(rows.notna(), None)
+        return list(rows[LOG_COLUMNS].itertuples(index=False, name=None))
+
+    def _read_log_rows(self, conn, log_name, where="", params=()):
+        return pd.read_sql_query(
+            f"SELECT Timestamp, Pushups AS {REPS_COLUMN}, User, comment, {ENTRY_ID_COLUMN} FROM log_entries "
+            f"WHERE log_name = ? {where} ORDER BY id",
+            conn,
+            params=(log_name, *params),
+        )
+
+    @perf.timed
+    def append(self, new_entry, log_name, based_on=None):
+        with self._transaction() as conn:
+            version = self._log_version(conn, log_name)
+            conn.executemany(
+                f"INSERT INTO log_entries (log_name, Timestamp, Pushups, User, comment, {ENTRY_ID_COLUMN}) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(log_name, *row) for row in self._log_rows(new_entry)],
+            )
+            new_version = self._bump_log_version(conn, log_name)
+        if based_on is not None and based_on.base_version == version:
+            # Nobody else wrote in between, the caller's copy plus its new entries is current
+            return LogRevision(new_version, frozenset())
+        return None
+
+    def prefetch(self, file_names, log_names=()):
+        # Logs are tables here, reading them needs no preparation
+        super().prefetch(file_names)
+
+    @perf.timed
+    def get_log_revision(self, log_name, prefetched=False):
+        with self._transaction(immediate=False) as conn:
+            return LogRevision(self._log_version(conn, log_name), frozenset()), []
+
+    @perf.timed
+    def read_log(self, log_name):
+        with self._transaction(immediate=False) as conn:
+            version = self._log_version(conn, log_name)
+            if version is None:
+                return None, None, []
+            log = self.content_cache.get(log_name, version)
+            if log is None:
+                log = self._read_log_rows(conn, log_name)
+                self.content_cache.put(log_name, version, log)
+        return log, LogRevision(version, frozenset()), []
+
+    @perf.timed
+    def write_log(self, log_data, log_name, based_on, original):
+        # The change is applied as DELETEs/INSERTs of the affected rows inside one transaction,
+        # so it merges with concurrent changes by itself - no revision check needed
+        original_keys = log_row_keys(original)
+        mine_keys = log_row_keys(log_data)
+        removed = original[~original_keys.isin(set(mine_keys))]
+        added = log_data[~mine_keys.isin(set(original_keys))]
+        with self._transaction() as conn:
+            conn.executemany(
+                f"DELETE FROM log_entries WHERE log_name = ? AND {ENTRY_ID_COLUMN} = ?",
+                [(log_name, entry_id) for entry_id in log_row_keys(removed)],
+            )
+            conn.executemany(
+                f"INSERT INTO log_entries (log_name, Timestamp, Pushups, User, comment, {ENTRY_ID_COLUMN}) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(log_name, *row) for row in self._log_rows(added)],
+            )
+            version = self._bump_log_version(conn, log_name)
+            log = self._read_log_rows(conn, log_name)
+        self.content_cache.put(log_name, version, log)
+        return log, LogRevision(version, frozenset())
+
+    def compact_log(self, log_name, rows=False):
+        # Log entries are table rows already, only files of rows (see append_rows()) pile up deltas
+        if rows:
+            super().compact_log(log_name, rows)
+
+    @perf.timed
+    def read_log_tail(self, log_name, rows):
+        with self._transaction(immediate=False) as conn:
+            if self._log_version(conn, log_name) is None:
+                return None
+            return pd.read_sql_query(
+                f"SELECT * FROM (SELECT id, Timestamp, Pushups AS {REPS_COLUMN}, User, comment, {ENTRY_ID_COLUMN} FROM log_entries "
+                "WHERE log_name = ? ORDER BY id DESC LIMIT ?) ORDER BY id",
+                conn,
+                params=(log_name, rows),
+            ).drop(columns='id')
+
+    @perf.timed
+    def read_log_range(self, log_name, start=None, end=None):
+        where, params = "", []
+        if start is not None:
+            where += " AND Timestamp >= ?"
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d %H:%M:%S'))
+        if end is not None:
+            where += " AND Timestamp < ?"
+            params.append(pd.Timestamp(end).strftime('%Y-%m-%d %H:%M:%S'))
+        with self._transaction(immediate=False) as conn:
+            if self._log_version(conn, log_name) is None:
+                return None
+            return self._read_log_rows(conn, log_name, where, params)
+
+
+# Function to create the backend selected in the [storage] settings
+def make_backend(config, drive_service_factory=None):
+    """
+    :param config: Mapping with the [storage] settings: backend ("drive", "local" or "sqlite"),
+                   path (directory or database file), folder_id (Drive folder),
+                   chunk_size (bytes per request when streaming a file)
+    :param drive_service_factory: Callable returning an authenticated Drive service (only called for "drive")
+    :return: StorageBackend instance
+    """
+    backend = config.get("backend", "drive")
+    if backend == "local":
+        storage = LocalBackend(config.get("path", "data"))
+    elif backend == "sqlite":
+        storage = SQLiteBackend(config.get("path", "pushups.sqlite"))
+    elif backend == "drive":
+        storage = DriveBackend(drive_service_factory(), config["folder_id"])
+    else:
+        raise ValueError(f"Unknown storage backend '{backend}', use drive, local or sqlite")
+    storage.chunk_size = int(config.get("chunk_size", DOWNLOAD_CHUNK_SIZE))
+    return storage
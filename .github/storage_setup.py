@@ -0,0 +1,39 @@
+# Storage backend as configured in the secrets, shared by the app and the maintenance scripts
+# (archive_season.py, migrate_to_parquet.py). The GoogleDrive client libraries are only
+# imported when the "drive" backend is used, the "local" and "sqlite" backends run without them.
+import json
+
+from storage import make_backend
+
+# Setting the scope for the GoogleDrive API
+SCOPES = ['https://www.googleapis.com/auth/drive.file']
+
+
+# Function to build the GoogleDrive client (only needed for the "drive" backend)
+def build_drive_service(secrets):
+    """
+    :param secrets: The app's secrets (st.secrets), with the service account key under [service_account]
+    :return: Authenticated Google Drive service instance
+    """
+    # Imported here, the Drive client libraries aren't needed for the other backends
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+    # Load and read service account info from secrets
+    key_dict = json.loads(secrets["service_account"]["key"])
+    # Authenticate with the service account
+    credentials = service_account.Credentials.from_service_account_info(key_dict, scopes=SCOPES)
+    # Build the Google Drive API client
+    return build('drive', 'v3', credentials=credentials)
+
+
+# Function to create the storage backend selected in the secrets
+def make_storage(secrets):
+    """
+    :param secrets: The app's secrets (st.secrets), with the settings under [storage]
+    :return: StorageBackend instance
+    """
+    config = dict(secrets.get("storage", {}))
+    if config.get("backend", "drive") == "drive":
+        # Folder ID of the GoogleDrive folder used for synching
+        config["folder_id"] = secrets["google_drive"]["folder_id"]
+    return make_backend(config, lambda: build_drive_service(secrets))
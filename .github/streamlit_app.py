@@ -2,25 +2,47 @@
 # TODO: remove unneeded packages via pipreqs
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta, date
-import time
-import json
-import io
-import plotly.express as px
-import plotly.graph_objects as go
+from datetime import datetime, date
 import pytz
 from datetime import datetime
-import seaborn as sns
-import matplotlib.colors as mcolors
-# For syncing to GoogleDrive
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload # Downloader
-from googleapiclient.http import MediaIoBaseUpload
+# Storage backends (GoogleDrive, local directory, SQLite)
+from storage import log_file_name
+from storage_setup import make_storage
+from sync_queue import SyncQueue
+from shared_log import LOG_CHECK_INTERVAL, SharedLog
+from seasons import Season, SeasonArchive, calendar_season, same_log
+# Push-ups, squats, pull-ups - each with a log of its own
+from disciplines import DISCIPLINES, PUSHUPS
+from aggregates import ROLLING_WINDOW, ActivityCube, user_stats
+# Plotly figures (plotly itself only loads once a chart renders)
+import charts
+# Timing spans of the hot paths
+import perf
+from perf import PERF_HISTORY, PerfRecorder
 
 st.set_page_config(page_title="Pushup-Tracker", page_icon="carrot")
 
 
+### PERFORMANCE RECORDING
+# Spans of every rerun (storage calls, parsing, display_* functions), see perf.py.
+# Off unless enabled under [perf] in the secrets:
+# enabled = true, admins = ["..."] (who sees the perf panel), export_path = "perf.jsonl" (optional)
+PERF_CONFIG = st.secrets.get("perf", {})
+
+# Function to create the recorder - once per server process, the reruns of all sessions end up in it
+@st.cache_resource
+def get_perf_recorder():
+    """
+    :return: PerfRecorder set up as configured under [perf]
+    """
+    return PerfRecorder(PERF_CONFIG.get("enabled", False), PERF_CONFIG.get("export_path"),
+                        PERF_CONFIG.get("history", PERF_HISTORY))
+
+PERF = get_perf_recorder()
+# Finished at the end of the script (reruns cut short are not recorded)
+PERF_RUN = PERF.start(st.session_state.get("username") or "login page")
+
+
 ### SET TIME ZONE TO GERMANY - BERLIN
 # Get the German timezone (CET/CEST)
 # Get the current time in UTC and convert it to German time
@@ -28,130 +50,150 @@ utc_time = datetime.utcnow().replace(tzinfo=pytz.utc)  # Get UTC time
 german_time = utc_time.astimezone(pytz.timezone('Europe/Berlin'))
 
 
-### GOOGLE DRIVE SETUP
-# Setting the scope for the GoogleDrive API
-SCOPES = ['https://www.googleapis.com/auth/drive.file']
+### STORAGE SETUP
+# Where the files are kept, set with backend under [storage] in the secrets:
+# "drive" (GoogleDrive folder, default), "local" (a directory, set path = "...")
+# or "sqlite" (a database file, set path = "...")
+STORAGE_CONFIG = st.secrets.get("storage", {})
 
-# Load and read service account info from secrets
-SERVICE_ACCOUNT_KEY = st.secrets["service_account"]["key"]
-key_dict = json.loads(SERVICE_ACCOUNT_KEY)
-# Authenticate with the service account
-credentials = service_account.Credentials.from_service_account_info(key_dict, scopes=SCOPES)
-# Build the Google Drive API client
-drive_service = build('drive', 'v3', credentials=credentials)
+# Function to create the storage backend - once per server process, all sessions share it (and its caches)
+@st.cache_resource
+def get_storage_backend():
+    """
+    :return: The StorageBackend selected in the secrets
+    """
+    return make_storage(st.secrets)
 
-# Folder ID of the GoogleDrive folder used for synching
-FOLDER_ID = st.secrets["google_drive"]["folder_id"]
+STORAGE = get_storage_backend()
+
+# Function to create the write-behind queue for logged sets - once per server process
+@st.cache_resource
+def get_sync_queue():
+    """
+    :return: SyncQueue that journals new entries locally and syncs them to STORAGE in the background
+    """
+    return SyncQueue(STORAGE, STORAGE_CONFIG.get("journal_path", "sync_journal.jsonl"))
+
+SYNC_QUEUE = get_sync_queue()
 
 # Dictionary of users and their PIN codes
 USER_DATABASE = st.secrets["user_database"]
 
-# Function to check if the file exists in the GoogleDrive folder - 
-# used in push_file_to_drive()
-def get_file_id(service, file_name, folder_id=FOLDER_ID):
+# File format of the logs: "csv" (default) or "parquet" (typed, smaller, no parsing on load)
+# Switch only after running migrate_to_parquet.py once.
+LOG_FORMAT = STORAGE_CONFIG.get("log_format", "csv")
+LOG_2022_FILE_NAME = log_file_name("pushup_log_2022", LOG_FORMAT)
+# The push-up season the stats were tracked for before there was a manifest: from 31.12.2024
+# (already a day of pushups) to 31.12.2025, 366 days
+LEGACY_SEASON_START = pd.Timestamp(2024, 12, 31)
+LEGACY_SEASON_END = pd.Timestamp(2025, 12, 31)
+# Suggestions: the file written before they were added as delta files, plus those delta files
+SUGGESTION_FILE_NAME = "suggestion.csv"
+
+# Function to create the process-wide copy of a discipline's log that all sessions share
+# (created when the discipline is shown the first time, the other disciplines aren't loaded)
+@st.cache_resource
+def get_shared_log(discipline_name):
     """
-    Retrieves the file ID from Google Drive based on file name and folder.
-    :param service: Authenticated Google Drive service instance
-    :param file_name: The name of the file to retrieve
-    :param folder_id: The folder ID to check for the file
-    :return: File ID if found, None otherwise
+    :param discipline_name: Key of the discipline (see DISCIPLINES)
+    :return: SharedLog of the discipline's log, including the entries waiting in SYNC_QUEUE
+             (empty until the first set of the discipline is logged)
     """
-    query = f"'{folder_id}' in parents and name = '{file_name}' and trashed = false"
-    
-    try:
-        results = service.files().list(q=query, fields="files(id)").execute()
-        files = results.get('files', [])
-        if files:
-            return files[0]['id']
-        else:
-            # File not found, create a new file
-            file_metadata = {
-                'name': file_name,
-                'parents': [folder_id]
-            }
-            # Assuming the file should be empty initially, use an empty media body
-            media = MediaIoBaseUpload(io.BytesIO(), mimetype='text/csv')  # Empty file
-            new_file = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
-            st.success(f"File '{file_name}' not found. Created a new file in Google Drive.")
-            return new_file['id']
-    except Exception as e:
-        st.error(f"Error retrieving file ID: {e}")
-        return None
+    return SharedLog(STORAGE, DISCIPLINES[discipline_name].log_name(LOG_FORMAT), SYNC_QUEUE,
+                     STORAGE_CONFIG.get("log_check_interval", LOG_CHECK_INTERVAL),
+                     STORAGE_CONFIG.get("check_aggregates", False), empty_if_missing=True)
 
-# Function to push a file to GoogleDrive
-def push_file_to_drive(data, file_name, service=drive_service, folder_id=FOLDER_ID):
+# Function to create the seasons of a discipline's log - once per server process, all sessions share the loaded ones
+@st.cache_resource
+def get_season_archive(discipline_name):
     """
-    Pushes a specific data variable (e.g., a DataFrame) to Google Drive as a CSV file.
-    :param data: The data (e.g., a pandas DataFrame) to push.
-    :param file_name: The name of the file to push (e.g., 'pushup_log.csv').
-    :param service: Authenticated Google Drive service instance.
-    :param folder_id: The Google Drive folder ID where the file should be stored.
+    :param discipline_name: Key of the discipline (see DISCIPLINES)
+    :return: SeasonArchive of the discipline's log (until archive_season.py wrote the manifest, the
+             push-ups keep the season they always had and 2022 is their only older season, the
+             other disciplines count the calendar year and have no older seasons)
     """
-    try:
-        # Convert the DataFrame (or data) to CSV in-memory
-        csv_data = data.to_csv(index=False)
+    discipline = DISCIPLINES[discipline_name]
+    shared_log = get_shared_log(discipline_name)
+    if discipline == PUSHUPS:
+        fallback_seasons = [calendar_season(2022, LOG_2022_FILE_NAME)]
+        fallback_active = Season("2025", shared_log.log_name, LEGACY_SEASON_START, LEGACY_SEASON_END)
+    else:
+        fallback_seasons, fallback_active = [], None
+    return SeasonArchive(STORAGE, shared_log, fallback_seasons,
+                         STORAGE_CONFIG.get("log_check_interval", LOG_CHECK_INTERVAL),
+                         manifest_name=discipline.manifest_name, fallback_active=fallback_active)
+
+# The discipline shown in this rerun. Its selection (see the main content) is read before the
+# widget is drawn, the log of the selected discipline is loaded before the page is drawn.
+DISCIPLINE = DISCIPLINES.get(st.session_state.get("discipline"), PUSHUPS)
+LOG_FILE_NAME = DISCIPLINE.log_name(LOG_FORMAT)
+SHARED_LOG = get_shared_log(DISCIPLINE.name)
+SEASON_ARCHIVE = get_season_archive(DISCIPLINE.name)
+
+# Function to create the cache of built charts - once per server process, all sessions share it
+@st.cache_resource
+def get_figure_cache():
+    """
+    :return: FigureCache holding up to figure_cache_size (see [storage] in the secrets) figures
+    """
+    return charts.FigureCache(STORAGE_CONFIG.get("figure_cache_size", charts.FIGURE_CACHE_SIZE))
 
-        # Create an in-memory file-like object
-        file_like = io.BytesIO(csv_data.encode('utf-8'))
-        
-        # Check if the file already exists in Google Drive
-        file_id = get_file_id(service, file_name)
-        if file_id:
-            # Update the existing file with new data
-            media = MediaIoBaseUpload(file_like, mimetype='text/csv')
-            updated_file = service.files().update(fileId=file_id, media_body=media).execute()
-            #st.success(f"Updated existing {file_name} file (File ID: {updated_file.get('id')})")
-        else:
-            # Create a new file if it doesn't exist
-            file_metadata = {
-                'name': file_name,
-                'parents': [folder_id]
-            }
-            media = MediaIoBaseUpload(file_like, mimetype='text/csv')
-            new_file = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
-            #st.success(f"Created new {file_name} file (in GoogleDrive)")
+FIGURE_CACHE = get_figure_cache()
 
-    except Exception as e:
-        st.error(f"Error syncing {file_name} to Google Drive: {e}")
+# Days of the floating average in the personal stats
+STATS_WINDOW = STORAGE_CONFIG.get("stats_window", ROLLING_WINDOW)
+
+# Point budget per line of the charts with one point per log entry, and from how many points on they use WebGL
+CHART_POINTS_PER_TRACE = STORAGE_CONFIG.get("points_per_trace", charts.POINTS_PER_TRACE)
+CHART_WEBGL_THRESHOLD = STORAGE_CONFIG.get("webgl_threshold", charts.WEBGL_THRESHOLD)
 
-# Function to fetch file from GoogleDrive
-def fetch_file_from_drive(file_name, service=drive_service, folder_id=FOLDER_ID):
+# Function to get a figure from the figure cache, it is only built if it isn't cached yet
+def cached_figure(build, chart, data_version, *params):
     """
-    Fetches a CSV file from Google Drive and loads it into a pandas DataFrame.
-    :param file_name: The name of the file to fetch (e.g., 'pushup_log.csv')
-    :param service: Authenticated Google Drive service instance
-    :param folder_id: The Google Drive folder ID where the file is stored
-    :return: pandas DataFrame containing the file's data
+    :param build: Function building the figure (no arguments)
+    :param chart: Name of the chart
+    :param data_version: Version of the shared log the figure is built from, None to build it without the cache
+    :param params: Everything else the figure depends on (selected user or month, current user, ...)
+    :return: plotly Figure
     """
-    try:
-        # Fetch the file ID from Google Drive using the file name and folder ID
-        file_id = get_file_id(service, file_name, folder_id)
-
-        if file_id:
-            # Download the file content
-            request = service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()  # Use a BytesIO object to store the file in memory
-            downloader = MediaIoBaseDownload(fh, request)
-            
-            done = False
-            while done is False:
-                status, done = downloader.next_chunk()
-            
-            # Once downloaded, move the cursor to the start of the file content
-            fh.seek(0)
-            
-            # Read the CSV content directly into a pandas DataFrame
-            data = pd.read_csv(fh)
-
-            # Return the DataFrame
-            return data
-        else:
-            st.error(f"File {file_name} not found in Google Drive.")
-            return None
+    if data_version is None:
+        return build()
+    return FIGURE_CACHE.get_or_build((data_version, chart) + params, build)
 
+# Function to get the shared log for this rerun
+@perf.timed
+def load_shared_log(shared_log=SHARED_LOG):
+    """
+    :param shared_log: The SharedLog to read.
+    :return: Tuple (read-only view of the log as pandas DataFrame, its LogRevision, version of the shared copy),
+             (None, None, None) if it couldn't be loaded
+    """
+    try:
+        log, revision, version = shared_log.snapshot()
+        if log is None:
+            st.error(f"File {shared_log.log_name} not found in the storage.")
+        return log, revision, version
     except Exception as e:
-        st.error(f"Error fetching {file_name} from Google Drive: {e}")
-        return None
+        st.error(f"Error fetching {shared_log.log_name} from the storage: {e}")
+        return None, None, None
+
+# Function to get the files this rerun reads from the storage ready in one go
+# (on Drive: one batch request for all lookups, then the downloads in parallel)
+def prefetch_render_files(logged_in, storage=STORAGE):
+    """
+    :param logged_in: Whether the main content (personal stats) is shown in this rerun.
+    :param storage: The StorageBackend to read from.
+    """
+    # Only what is actually read: the log and the manifest are checked every few seconds/minutes
+    file_names = [DISCIPLINE.manifest_name] if logged_in and SEASON_ARCHIVE.due() else []
+    log_names = [LOG_FILE_NAME] if SHARED_LOG.due() else []
+    if not file_names and not log_names:
+        return
+    try:
+        storage.prefetch(file_names, log_names)
+    except Exception:
+        # Nothing lost, the reads below ask again and report the error
+        pass
 
 # git add .
 # git commit -m "Added Table with last 5 entries"
@@ -159,6 +201,10 @@ def fetch_file_from_drive(file_name, service=drive_service, folder_id=FOLDER_ID)
 # git checkout <branch>
 # git merge <branch>
 
+# The Set3 ColorBrewer palette (same colors seaborn's color_palette("Set3") returns)
+SET3_COLORS = ['#8dd3c7', '#ffffb3', '#bebada', '#fb8072', '#80b1d3', '#fdb462',
+               '#b3de69', '#fccde5', '#d9d9d9', '#bc80bd', '#ccebc5', '#ffed6f']
+
 # assign stable colors
 def generate_user_colors(user_database):
     """
@@ -168,33 +214,31 @@ def generate_user_colors(user_database):
     :return: A dictionary mapping each user to a ColorBrewer color (hex format).
     """
     users = list(user_database.keys())
-    num_users = len(users)
-    
-    # Get the Set3 ColorBrewer palette (you can adjust the number of colors as needed)
-    palette = sns.color_palette("Set3", num_users)
     
-    # Assign colors to users
-    user_colors = {user: mcolors.to_hex(palette[i]) for i, user in enumerate(users)}
+    # Assign colors to users (starts over after 12 users, like seaborn does)
+    user_colors = {user: SET3_COLORS[i % len(SET3_COLORS)] for i, user in enumerate(users)}
     return user_colors
 
 # let's user delete his/her own last three entries if they were made by mistake
-# TODO: What happens when sombeody logs pushups between the user clicking and submitting the form?!?!?!
-def manage_user_entries(log_data, user_selection):
+# If sombeody logs pushups between the user clicking and submitting the form, write_log_to_drive()
+# notices the newer revision and merges the deletion onto it.
+@perf.timed
+def manage_user_entries(log_data, user_selection, log_revision=None):
     """
     Allow a user to delete one or more of their last three activities using a form.
 
-    :param log_data: DataFrame containing the pushup logs with 'Timestamp', 'Pushups', and 'User' columns.
+    :param log_data: DataFrame containing the pushup logs with 'Timestamp', 'Reps', and 'User' columns.
     :param user_selection: The selected user whose entries can be managed.
+    :param log_revision: LogRevision the log_data was loaded at (None if unknown).
     """
     try:
         # Filter data for the selected user
-        user_data = log_data[log_data['User'] == user_selection].copy()
+        user_data = log_data[log_data['User'] == user_selection]
 
         # Display the last three activities
         recent_activities = user_data.sort_values(by='Timestamp', ascending=False).head(3)
 
         st.write(f"Here you can delete the Last Three Activities for '{user_selection}'")
-        st.text("Afterwards you will have to reload the app to see the changes. That's what you get for clicking too fast.")
 
         # Create a form to allow selection and deletion of entries
         with st.form("delete_entries_form"):
@@ -202,7 +246,7 @@ def manage_user_entries(log_data, user_selection):
             for idx, row in recent_activities.iterrows():
                 # Add checkboxes within the form
                 if st.checkbox(
-                    f"{row['Timestamp']} - {row['Pushups']} pushups",
+                    f"{row['Timestamp']} - {row['Reps']} {DISCIPLINE.unit.lower()}",
                     key=f"delete_{idx}"
                 ):
                     delete_ids.append(idx)
@@ -212,11 +256,14 @@ def manage_user_entries(log_data, user_selection):
 
             if submitted:
                 if delete_ids:
-                    # Drop the selected entries from the DataFrame
-                    log_data.drop(delete_ids, inplace=True)
+                    # Entries still in the sync queue have to reach the storage before it gets rewritten
+                    if not SYNC_QUEUE.flush():
+                        raise RuntimeError("logged sets are still waiting to be synced, please try again in a moment")
+                    # Rewrite the log on Drive without the selected entries (this also folds in pending deltas)
+                    log, revision = STORAGE.write_log(log_data.drop(delete_ids), LOG_FILE_NAME, log_revision, log_data)
+                    # Every session continues with the written revision
+                    SHARED_LOG.replace(log, revision, log_data.loc[delete_ids])
                     st.success("Selected entries deleted successfully.")
-                    # Save the updated log data to preserve changes (if needed)
-                    push_file_to_drive(log_data, "pushup_log.csv")
                 else:
                     st.warning("No entries were selected for deletion.")
 
@@ -225,31 +272,22 @@ def manage_user_entries(log_data, user_selection):
 
 
 # graph for accum pushups
-def display_accumulated_pushups(log_data, user_selection):
+@perf.timed
+def display_accumulated_pushups(log_data, user_selection, data_version=None):
+    """
+    :param log_data: DataFrame containing the pushup logs.
+    :param user_selection: List of selected users to filter the data for plotting.
+    :param data_version: Version of the shared log the data belongs to, None to build the chart without the figure cache.
+    """
     try:
-        # Sort the data by Timestamp to ensure proper accumulation
-        log_data = log_data.sort_values(by="Timestamp")
-        
-        # Create a new column with the accumulated sum of push-ups per user
-        log_data['Accumulated Pushups'] = log_data.groupby('User')['Pushups'].cumsum()
-
         # Filter data based on selected users
         if user_selection:
-            filtered_data = log_data[log_data['User'].isin(user_selection)]
-
-            # Create a Plotly line chart for the accumulated pushups data
-            accumulated_chart = px.line(
-                filtered_data,
-                x="Timestamp",  # X-axis as Timestamp
-                y="Accumulated Pushups",  # Y-axis as accumulated pushups
-                color="User",  # Color by user
-                color_discrete_map=USER_COLORS,  # Use the USER_COLORS dictionary
-                labels={"Timestamp": "Time", "Accumulated Pushups": "Accumulated Pushups"}
-            )
-            accumulated_chart.update_layout(height=500)  
-
             # Show the chart in Streamlit
-            st.plotly_chart(accumulated_chart, use_container_width=True)
+            fig = cached_figure(lambda: charts.accumulated_figure(log_data, user_selection, USER_COLORS,
+                                                                  CHART_POINTS_PER_TRACE, CHART_WEBGL_THRESHOLD,
+                                                                  DISCIPLINE.unit),
+                               "accumulated", data_version, tuple(user_selection))
+            st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("No users selected. Please select at least one user to display the graph.")
 
@@ -257,99 +295,53 @@ def display_accumulated_pushups(log_data, user_selection):
         st.error(f"Error reading or plotting accumulated data: {e}")
 
 # Graph for accumulated pushups filtered by month
-def display_monthly_accumulated_pushups(log_data):
+@perf.timed
+def display_monthly_accumulated_pushups(log_data, data_version=None):
+    """
+    :param log_data: DataFrame containing the pushup logs.
+    :param data_version: Version of the shared log the data belongs to, None to build the chart without the figure cache.
+    """
     try:
-        # Convert the Timestamp column to datetime format
-        log_data['Timestamp'] = pd.to_datetime(log_data['Timestamp'])
-        log_data['Month'] = log_data['Timestamp'].dt.to_period('M')  # Extract month as a period
-
-        # Get unique months for the dropdown and set the default to the current month
-        unique_months = log_data['Month'].dt.strftime('%Y-%m').unique()
+        # Get unique months ('YYYY-MM', computed at load) for the dropdown and set the default to the current month
+        unique_months = list(log_data['Month'].unique())
         current_month = pd.Timestamp.now().to_period('M').strftime('%Y-%m')
+        # A discipline nobody logged a set for this month starts at its latest month (or none at all)
+        default_index = unique_months.index(current_month) if current_month in unique_months else len(unique_months) - 1
 
         # Show dropdown (do not link it to session state key directly!)
         selected_month = st.selectbox(
             "Select a month to display:",
             unique_months,
-            index=list(unique_months).index(current_month),
-        )
-
-        # Filter data for the selected month
-        filtered_data = log_data[log_data['Month'].dt.strftime('%Y-%m') == selected_month]
-
-        # Reset accumulated push-ups for the selected month
-        filtered_data['Accumulated Pushups'] = (
-            filtered_data.groupby('User')['Pushups'].cumsum()
-        )
-        # Plot the data
-        accumulated_chart = px.line(
-            filtered_data,
-            x="Timestamp",
-            y="Accumulated Pushups",
-            color="User",
-            color_discrete_map=USER_COLORS,  # Use the USER_COLORS dictionary
-            category_orders={"User": list(USER_COLORS.keys())},  # Ensure consistent color order
-            labels={"Timestamp": "Time", "Accumulated Pushups": "Accumulated Pushups"}
+            index=default_index if unique_months else None,
         )
 
         # Show the chart
-        st.plotly_chart(accumulated_chart, use_container_width=True)
+        fig = cached_figure(lambda: charts.monthly_accumulated_figure(log_data, selected_month, USER_COLORS,
+                                                                       CHART_POINTS_PER_TRACE, CHART_WEBGL_THRESHOLD,
+                                                                       DISCIPLINE.unit),
+                            "monthly_accumulated", data_version, selected_month)
+        st.plotly_chart(fig, use_container_width=True)
 
     except Exception as e:
         st.error(f"Error reading or plotting accumulated data: {e}")
 
 # graph for pushups over time
-def display_time_series_pushups(log_data, user_selection):
+@perf.timed
+def display_time_series_pushups(aggregates, user_selection, data_version=None):
     """
     Displays a time-series graph of pushups for the selected users using Plotly,
     aggregated to show one datapoint per day.
 
-    :param log_data: DataFrame containing the pushup logs with columns 'Timestamp', 'Pushups', and 'User'.
+    :param aggregates: DailyAggregates of the pushup logs.
     :param user_selection: List of selected users to filter the data for plotting.
+    :param data_version: Version of the shared log the data belongs to, None to build the chart without the figure cache.
     """
     try:
-        # Ensure the Timestamp column is in datetime format
-        log_data["Timestamp"] = pd.to_datetime(log_data["Timestamp"])
-
         # Filter data based on selected users
         if user_selection:
-            filtered_data = log_data[log_data['User'].isin(user_selection)]
-
-            # Aggregate data to sum pushups per day per user
-            filtered_data['Date'] = filtered_data['Timestamp'].dt.date  # Extract date component
-            daily_data = (
-                filtered_data.groupby(['Date', 'User'])['Pushups']
-                .sum()
-                .reset_index()
-            )
-
-            # Create the Plotly figure
-            fig = px.line(
-                daily_data,
-                x="Date",
-                y="Pushups",
-                color="User",
-                color_discrete_map=USER_COLORS,
-                labels={"Date": "Date", "Pushups": "Pushups", "User": "User"},
-            )
-
-            # Customize the layout for better interaction
-            fig.update_layout(
-                width=800,
-                height=500,
-                xaxis_title="Date",
-                yaxis_title="Pushups",
-                margin=dict(l=40, r=40, t=40, b=40),
-                legend_title="Users",
-            )
-
-            # Enable interactive tools like zoom and pan
-            fig.update_layout(
-                dragmode="zoom",
-                hovermode="x unified"
-            )
-
             # Display the chart in Streamlit
+            fig = cached_figure(lambda: charts.time_series_figure(aggregates, user_selection, USER_COLORS, DISCIPLINE.unit),
+                               "time_series", data_version, tuple(user_selection))
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("No users selected. Please select at least one user to display the graph.")
@@ -358,65 +350,22 @@ def display_time_series_pushups(log_data, user_selection):
         st.error(f"Error reading or plotting data: {e}")
 
 # dominance graph
-def display_pushups_dominance_with_selection(log_data, user_selection, username):
+@perf.timed
+def display_pushups_dominance_with_selection(aggregates, user_selection, username, data_version=None):
     """
     Displays a stacked line chart showing the dominance of pushups by user,
     with the current user always as the bottom-most line.
 
-    :param log_data: DataFrame containing the pushup logs with columns 'Timestamp', 'Pushups', and 'User'.
+    :param aggregates: DailyAggregates of the pushup logs.
     :param user_selection: List of selected users to filter the data for plotting.
     :param username: The current user, who will always appear as the bottom-most line.
+    :param data_version: Version of the shared log the data belongs to, None to build the chart without the figure cache.
     """
     try:
-        # Ensure 'Timestamp' is in datetime format
-        log_data['Timestamp'] = pd.to_datetime(log_data['Timestamp'])
-        
         if user_selection:
-            # Ensure the current user is in the selection
-            if username not in user_selection:
-                user_selection.append(username)
-            
-            # Group by date and user, then sum the pushups
-            log_data['Date'] = log_data['Timestamp'].dt.date
-            daily_pushups = log_data[log_data['User'].isin(user_selection)].groupby(['Date', 'User'])['Pushups'].sum().unstack(fill_value=0)
-            
-            # Normalize the data so each row sums to 100%
-            daily_pushups_percent = daily_pushups.div(daily_pushups.sum(axis=1), axis=0) * 100
-            
-            # Reorder columns so the current user is the first one
-            user_order = [username] + [user for user in user_selection if user != username]
-            daily_pushups_percent = daily_pushups_percent[user_order]
-            
-            # Create a Plotly figure for stacked lines
-            fig = go.Figure()
-
-            # Add each user as a separate line in the specified order
-            for user in user_order:
-                fig.add_trace(go.Scatter(
-                    x=daily_pushups_percent.index,
-                    y=daily_pushups_percent[user],
-                    mode='lines',
-                    stackgroup='one',  # Stack the lines
-                    name=user,
-                    line=dict(width=2, color=USER_COLORS.get(user, '#000000')),  # Use color from USER_COLORS                
-                ))
-
-            # Customize the layout
-            fig.update_layout(
-                xaxis_title="Date",
-                yaxis_title="Percentage of Pushups",
-                xaxis=dict(
-                    tickformat="%b %-d",  # Display "Jan 1", "Jan 2", etc.
-                    tickangle=0  # Keep ticks horizontal
-                ),
-                legend_title="User",
-                template="plotly_white",
-                height=500,
-                width=800,
-                margin=dict(l=40, r=40, t=10, b=40),  # Reduce top margin
-            )
-
             # Show the plot in Streamlit
+            fig = cached_figure(lambda: charts.dominance_figure(aggregates, user_selection, username, USER_COLORS, DISCIPLINE.unit),
+                               "dominance", data_version, tuple(user_selection), username)
             st.plotly_chart(fig)
         else:
             st.write("No users selected. Please select at least one user to display the graph.")
@@ -425,17 +374,18 @@ def display_pushups_dominance_with_selection(log_data, user_selection, username)
         st.error(f"Error: {e}")
 
 # last five entries into log
+@perf.timed
 def display_last_five_entries(log_data):
     try:
-        # Convert the Timestamp column to datetime format if it's not already
-        log_data['Timestamp'] = pd.to_datetime(log_data['Timestamp'])
+        # Only the shown entries are converted, not the whole log
+        last_five_entries = log_data.tail(5).copy()
 
         # Extract the Date and Time from the Timestamp
-        log_data['Date'] = log_data['Timestamp'].dt.date
-        log_data['Time'] = log_data['Timestamp'].dt.time
+        last_five_entries['Date'] = last_five_entries['Timestamp'].dt.date
+        last_five_entries['Time'] = last_five_entries['Timestamp'].dt.time
 
-        # Select the relevant columns and get the last 5 entries
-        last_five_entries = log_data[['Date', 'Time', 'User', 'Pushups']].tail(5)
+        # Select the relevant columns
+        last_five_entries = last_five_entries[['Date', 'Time', 'User', 'Reps']].rename(columns={'Reps': DISCIPLINE.unit})
 
         # Convert to list of dictionaries to remove the index
         data_no_index = last_five_entries.to_dict(orient="records")
@@ -448,15 +398,24 @@ def display_last_five_entries(log_data):
         st.error(f"Error displaying the last five entries: {e}")
 
 # recent entries into log (more than 5, scrollable element)
+@perf.timed
 def display_recent_entries(log_data, num_entries=20):
+    """
+    :param log_data: DataFrame containing the pushup logs - only its last rows are needed,
+                     e.g. from STORAGE.read_log_tail()
+    :param num_entries: Number of entries to show
+    """
     try:
-        # Convert the Timestamp column to datetime format if it's not already
-        log_data['Timestamp'] = pd.to_datetime(log_data['Timestamp'])
+        # Only the shown entries are converted, not the whole log
+        recent_entries = log_data.tail(num_entries).copy()
+        # Convert the Timestamp column to datetime format if it's not already (e.g. from read_log_tail())
+        recent_entries['Timestamp'] = pd.to_datetime(recent_entries['Timestamp'])
         # Extract the Date and Time from the Timestamp
-        log_data['Date'] = log_data['Timestamp'].dt.date
-        log_data['Time'] = log_data['Timestamp'].dt.time
-        # Select the relevant columns and get the most recent entries
-        recent_entries = log_data[['Date', 'Time', 'User', 'Pushups', 'comment']].tail(num_entries).iloc[::-1]
+        recent_entries['Date'] = recent_entries['Timestamp'].dt.date
+        recent_entries['Time'] = recent_entries['Timestamp'].dt.time
+        # Select the relevant columns, most recent entry first
+        recent_entries = recent_entries[['Date', 'Time', 'User', 'Reps', 'comment']].iloc[::-1]
+        recent_entries = recent_entries.rename(columns={'Reps': DISCIPLINE.unit})
         # Display the recent entries in a scrollable element
         st.dataframe(
             data = recent_entries,
@@ -468,32 +427,34 @@ def display_recent_entries(log_data, num_entries=20):
         st.error(f"Error displaying the recent entries: {e}")
 
 # table giving push ups done on the day by specific user
-def display_pushups_today(log_data):
-    # Ensure the 'Timestamp' column is in datetime format
-    log_data['Timestamp'] = pd.to_datetime(log_data['Timestamp'])
+@perf.timed
+def display_pushups_today(aggregates):
+    """
+    :param aggregates: DailyAggregates of the pushup logs.
+    """
     # Get today's date (without time component)
     today = german_time.date()
-    # Filter the DataFrame for today's pushups
-    today_df = log_data[log_data['Timestamp'].dt.date == today]
-    if not today_df.empty:
-        # Group by user and sum the pushups
-        pushups_today = today_df.groupby('User')['Pushups'].sum().reset_index()
+    # Today's pushups per user
+    pushups_today = aggregates.day(today)
+    if not pushups_today.empty:
+        pushups_today = pushups_today.reset_index()
         # Sort by pushups in descending order
-        pushups_today = pushups_today.sort_values(by='Pushups', ascending=False).reset_index(drop=True)
+        pushups_today = pushups_today.sort_values(by='Reps', ascending=False).reset_index(drop=True)
         # Display the table with total pushups for each user today
-        st.dataframe(data=pushups_today, hide_index=True)
+        st.dataframe(data=pushups_today.rename(columns={'Reps': DISCIPLINE.unit}), hide_index=True)
         # Display the total pushups today
-        total_pushups_today = pushups_today['Pushups'].sum()
-        st.write(f"Total pushups today: {total_pushups_today}")
+        total_pushups_today = pushups_today['Reps'].sum()
+        st.write(f"Total {DISCIPLINE.unit.lower()} today: {total_pushups_today}")
     else:
         # Display a message if no pushups were done today
-        st.write("No pushups logged for today.")
+        st.write(f"No {DISCIPLINE.unit.lower()} logged for today.")
     
     # Display the total pushups overall
-    total_pushups_overall = log_data['Pushups'].sum()
-    st.write(f"Total pushups overall: {total_pushups_overall:,}")
+    total_pushups_overall = aggregates.total()
+    st.write(f"Total {DISCIPLINE.unit.lower()} overall: {total_pushups_overall:,}")
 
 # table giving the push up average (daily)
+@perf.timed
 def display_daily_average_pushups(log_data, start_date="2024-12-31"):
     """
     Displays a table showing the daily average of pushups for each user, 
@@ -503,9 +464,6 @@ def display_daily_average_pushups(log_data, start_date="2024-12-31"):
     :param log_data: DataFrame containing pushup logs.
     :param start_date: Start date as a string in the format 'YYYY-MM-DD'.
     """
-    # Ensure the 'Timestamp' column is in datetime format
-    log_data['Timestamp'] = pd.to_datetime(log_data['Timestamp'])
-    
     # Parse the start date and calculate the days passed
     start_date = pd.to_datetime(start_date).date()
     today = date.today()
@@ -516,10 +474,10 @@ def display_daily_average_pushups(log_data, start_date="2024-12-31"):
         return
 
     # Calculate the total pushups for each user
-    user_totals = log_data.groupby('User')['Pushups'].sum().reset_index()
+    user_totals = log_data.groupby('User', observed=True)['Reps'].sum().reset_index()
     
     # Add a column for daily average based on total days passed
-    user_totals['Daily Average'] = user_totals['Pushups'] / days_passed
+    user_totals['Daily Average'] = user_totals['Reps'] / days_passed
     
     # Sort the table by the daily average in descending order
     user_totals = user_totals.sort_values(by='Daily Average', ascending=False).reset_index(drop=True)
@@ -528,299 +486,122 @@ def display_daily_average_pushups(log_data, start_date="2024-12-31"):
     st.dataframe(user_totals[['User', 'Daily Average']], hide_index=True)
 
 # Table personal stats
-def display_user_stats(log_data, user_selection):
+@perf.timed
+def display_user_stats(shared_log, user_selection, season, window=STATS_WINDOW):
     """
-    Display the current user's pushup stats: total, average, 7-day floating average,
-    expected pushups for 31.12.2025, and standard deviation.
+    Display the current user's pushup stats for the season: total, average, floating average,
+    expected pushups for the last day of the season, and standard deviation.
 
-    :param log_data: DataFrame containing the pushup logs with 'Timestamp', 'Pushups', and 'User' columns.
+    :param shared_log: SharedLog of the pushup logs (its stats are computed once per version for all users).
     :param user_selection: Selected user to display stats for.
+    :param season: The Season the stats are tracked for (see seasons.py).
+    :param window: Days of the floating average.
     """
     try:
-        # Filter the data for the selected user
-        user_data = log_data[log_data['User'] == user_selection].copy()
-
-        # Convert the Timestamp column to datetime
-        user_data['Timestamp'] = pd.to_datetime(user_data['Timestamp'])
-
-        # Set a start date for tracking stats (e.g., from 31.12.2024 onward)
-        start_date = datetime(2024, 12, 31)
-        user_data = user_data[user_data['Timestamp'] >= start_date]
-
-        # Create a daily pushups series, summing pushups by day
-        user_data['Date'] = user_data['Timestamp'].dt.date
-        daily_pushups = user_data.groupby('Date')['Pushups'].sum()
-
-        # Create a complete date range from the start date to the latest recorded date
-        all_dates = pd.date_range(start=start_date, end=datetime.today().date(), freq='D')
-        
-        # Reindex the daily pushups data to include all dates, filling missing days with 0
-        daily_pushups_full = daily_pushups.reindex(all_dates, fill_value=0)
-
-        # Calculate the total pushups
-        total_pushups = daily_pushups_full.sum()
-
-        # Calculate the average pushups per day
-        average_pushups = daily_pushups_full.mean().round(1)
-
-        # Calculate the 7-day floating average
-        daily_pushups_7day_avg = daily_pushups_full.rolling(window=7, min_periods=1).mean().round(1)
-
-        # Calculate the expected pushups for 31.12.2025
-        end_date = datetime(2025, 12, 31)
-        #days_to_2025 = (end_date - daily_pushups_full.index[-1]).days
-        expected_pushups_2025 = (average_pushups * 366).round(0) # 366 because 31.12.2024 was a day of pushups already
-
-        # Calculate the standard deviation of pushups
-        std_dev_pushups = daily_pushups_full.std().round(1)
+        # Stats are tracked from the start of the season up to today (or the season's end if it is over)
+        # The active log takes new sets until archive_season.py moves its season out, so its stats
+        # keep running up to today, also past the end of the season
+        last_day = pd.Timestamp(datetime.today().date())
+        if not same_log(season.log_name, shared_log.log_name):
+            last_day = min(last_day, season.end)
+
+        # Stats of all users at once (also the ones without entries yet), shared by every session until the log changes
+        all_stats = shared_log.derived(
+            ("user_stats", season, last_day, window),
+            lambda aggregates: user_stats(aggregates, season.start, last_day, window, season.days,
+                                          aggregates.users + [user for user in USER_DATABASE if user not in aggregates.users]),
+        )
+        user_row = all_stats.loc[user_selection]
 
         # Create a summary DataFrame
         stats = {
-            "Metric": ["Name", "Total Pushups", "Average Pushups", "7-Day Floating Average", "Expected Pushups for 31.12.2025", "Standard Deviation"],
-            "Value": [user_selection, total_pushups, average_pushups, daily_pushups_7day_avg.iloc[-1], expected_pushups_2025, std_dev_pushups]
+            "Metric": ["Name", f"Total {DISCIPLINE.unit}", f"Average {DISCIPLINE.unit}", f"{window}-Day Floating Average", f"Expected {DISCIPLINE.unit} for {season.end:%d.%m.%Y}", "Standard Deviation"],
+            "Value": [user_selection, int(user_row['Total']), user_row['Average'], user_row['Floating Average'], user_row['Expected'], user_row['Standard Deviation']]
         }
         stats_df = pd.DataFrame(stats)
 
         # Display the stats table
-        st.write(f"### {user_selection}'s Pushup Stats")
+        st.write(f"### {user_selection}'s {DISCIPLINE.noun} Stats")
         st.dataframe(stats_df, hide_index=True)
 
-    except Exception as e:
-        st.error(f"Error calculating user stats: {e}")
-
     except Exception as e:
         st.error(f"Error calculating stats for {user_selection}: {e}")
 
 # display heatmap
-def display_pushup_heatmap(log_data):
+@perf.timed
+def display_pushup_heatmap(activity, data_version=None):
     """
     Displays a heatmap showing pushup activity by weekday and hour.
     Allows selection of a single user or all users combined.
 
-    :param log_data: DataFrame containing pushup logs with 'Timestamp', 'Pushups', and 'User' columns.
+    :param activity: ActivityCube of the pushup logs (pushups per user, week, weekday and hour).
+    :param data_version: Version of the shared log the data belongs to, None to build the chart without the figure cache.
     """
-    # Ensure 'Timestamp' is in datetime format
-    log_data['Timestamp'] = pd.to_datetime(log_data['Timestamp'])
-
-    # Extract weekday and hour from the timestamp
-    log_data['Weekday'] = log_data['Timestamp'].dt.day_name()
-    log_data['Hour'] = log_data['Timestamp'].dt.hour
-
-    # Define weekday order for plotting
-    weekday_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-
     # Create a user selection dropdown
     user_selection = st.selectbox(
         "Select User", 
-        options=["All Users"] + log_data['User'].unique().tolist(), 
+        options=["All Users"] + activity.users, 
         index=0
     )
 
-    # Filter the data for the selected user or keep all users
-    if user_selection != "All Users":
-        filtered_data = log_data[log_data['User'] == user_selection]
-    else:
-        filtered_data = log_data
-
-    # Group by weekday and hour to sum pushups
-    heatmap_data = (
-        filtered_data.groupby(['Weekday', 'Hour'])['Pushups'].sum()
-        .reindex(weekday_order, level=0)  # Ensure correct weekday order
-        .unstack(fill_value=0)  # Reshape for heatmap
-    )
-
-    # Plot the heatmap using Plotly
-    fig = px.imshow(
-        heatmap_data.values, 
-        labels=dict(x="Hour", y="Weekday", color="Total Pushups"),
-        x=heatmap_data.columns,
-        y=heatmap_data.index,
-        color_continuous_scale="YlGnBu",
-        title=f"Pushup Activity Heatmap ({user_selection})"
-    )
+    dark = st.session_state.get("theme", {"base": "light"})["base"] == "dark"
 
-    # Update layout for better visualization
-    fig.update_layout(
-        xaxis_title="Hour",
-        yaxis_title="Weekday",
-        coloraxis_colorbar=dict(title=""),
-        template="plotly_dark" if st.session_state.get("theme", {"base": "light"})["base"] == "dark" else "plotly",
-        height=500
-    )
-
-    # Display the heatmap in Streamlit
+    # Display the heatmap in Streamlit (switching users only reads another slice of the cube)
+    fig = cached_figure(lambda: charts.heatmap_figure(activity, user_selection, dark,
+                                                      unit=DISCIPLINE.unit, noun=DISCIPLINE.noun),
+                        "heatmap", data_version, user_selection, dark)
     st.plotly_chart(fig)
 
 # total pushups done within the project
-def display_total_accumulated_pushups(log_data):
+@perf.timed
+def display_total_accumulated_pushups(aggregates, data_version=None):
     """
     Displays a time-series graph of the total accumulated pushups over time.
 
-    :param log_data: DataFrame containing the pushup logs with columns 'Timestamp' and 'Pushups'.
+    :param aggregates: DailyAggregates of the pushup logs.
+    :param data_version: Version of the shared log the data belongs to, None to build the chart without the figure cache.
     """
     try:
-        # Ensure the Timestamp column is in datetime format
-        log_data["Timestamp"] = pd.to_datetime(log_data["Timestamp"])
-
-        # Aggregate data to sum pushups per day
-        log_data['Date'] = log_data['Timestamp'].dt.date  # Extract date component
-        daily_totals = (
-            log_data.groupby('Date')['Pushups']
-            .sum()
-            .reset_index()
-            .sort_values('Date')  # Ensure data is sorted by date
-        )
-
-        # Compute the accumulated sum of pushups
-        daily_totals['Accumulated Pushups'] = daily_totals['Pushups'].cumsum()
-
-        # Create the Plotly figure
-        fig = px.line(
-            daily_totals,
-            x="Date",
-            y="Accumulated Pushups",
-            labels={"Date": "Date", "Accumulated Pushups": "Total Pushups"},
-            #title="Total Accumulated Pushups Over Time",
-        )
-
-        # Customize the layout for better interaction
-        fig.update_layout(
-            width=800,
-            height=400,
-            xaxis_title="Date",
-            yaxis_title="Accumulated Pushups",
-            margin=dict(l=40, r=40, t=40, b=40),
-            dragmode="zoom",  # Enable zooming and panning
-            hovermode="x unified"  # Unified hover mode for better tooltips
-        )
-
         # Display the chart in Streamlit
+        fig = cached_figure(lambda: charts.total_accumulated_figure(aggregates, DISCIPLINE.unit), "total_accumulated", data_version)
         st.plotly_chart(fig, use_container_width=True)
 
     except Exception as e:
         st.error(f"Error reading or plotting data: {e}")
 
 # total pushups done within the project stacked users
-def display_total_accumulated_pushups_by_user(log_data, username):
+@perf.timed
+def display_total_accumulated_pushups_by_user(aggregates, username, data_version=None):
     """
     Displays a stacked area chart of the accumulated pushups by each user, 
     with the current user as the bottommost entry.
 
-    :param log_data: DataFrame containing the pushup logs with columns 'Timestamp', 'Pushups', and 'User'.
+    :param aggregates: DailyAggregates of the pushup logs.
     :param username: The current user, who will always appear as the bottom-most entry.
+    :param data_version: Version of the shared log the data belongs to, None to build the chart without the figure cache.
     """
     try:
-        # Ensure 'Timestamp' is in datetime format
-        log_data["Timestamp"] = pd.to_datetime(log_data["Timestamp"])
-
-        # Extract date component and sum pushups per user per day
-        log_data['Date'] = log_data['Timestamp'].dt.date
-        daily_totals = (
-            log_data.groupby(['Date', 'User'])['Pushups']
-            .sum()
-            .reset_index()
-            .sort_values(['Date', 'User'])  # Ensure data is sorted by date and user
-        )
-
-        # Pivot data to have one column per user
-        daily_totals_pivot = daily_totals.pivot(index='Date', columns='User', values='Pushups').fillna(0)
-
-        # Ensure the current user is the first column
-        user_order = [username] + [user for user in daily_totals_pivot.columns if user != username]
-        daily_totals_pivot = daily_totals_pivot[user_order]
-
-        # Compute cumulative sum for each user over time
-        accumulated_pushups = daily_totals_pivot.cumsum()
-
-        # Create a stacked area chart
-        fig = go.Figure()
-
-        for user in accumulated_pushups.columns:
-            fig.add_trace(go.Scatter(
-                x=accumulated_pushups.index,
-                y=accumulated_pushups[user],
-                mode='lines',
-                stackgroup='one',  # Enable stacking
-                name=user,
-                line=dict(width=2, color=USER_COLORS.get(user, '#000000')),
-            ))
-
-        # Customize the layout
-        fig.update_layout(
-            xaxis_title="Date",
-            yaxis_title="Total Pushups",
-            xaxis=dict(
-                tickformat="%b %-d",  # Display "Jan 1", "Jan 2", etc.
-            ),
-            legend_title="User",
-            template="plotly_white",
-            height=500,
-            width=800,
-            margin=dict(l=40, r=40, t=10, b=40),  # Adjust margins
-            dragmode="zoom",  # Enable zooming and panning
-            hovermode="x unified"  # Unified hover mode for tooltips
-        )
-
         # Display the chart in Streamlit
+        fig = cached_figure(lambda: charts.total_accumulated_by_user_figure(aggregates, username, USER_COLORS, DISCIPLINE.unit),
+                            "total_accumulated_by_user", data_version, username)
         st.plotly_chart(fig, use_container_width=True)
 
     except Exception as e:
         st.error(f"Error: {e}")
 
-def display_daily_pushup_contributions(log_data, username):
+@perf.timed
+def display_daily_pushup_contributions(aggregates, username, data_version=None):
     """
     Displays a stacked bar plot of daily pushup contributions by each user.
 
-    :param log_data: DataFrame containing the pushup logs with columns 'Timestamp', 'Pushups', and 'User'.
+    :param aggregates: DailyAggregates of the pushup logs.
     :param username: The current user, who will always appear as the bottom-most bar segment.
+    :param data_version: Version of the shared log the data belongs to, None to build the chart without the figure cache.
     """
     try:
-        # Ensure 'Timestamp' is in datetime format
-        log_data["Timestamp"] = pd.to_datetime(log_data["Timestamp"])
-
-        # Extract date component and sum pushups per user per day
-        log_data['Date'] = log_data['Timestamp'].dt.date
-        daily_totals = (
-            log_data.groupby(['Date', 'User'])['Pushups']
-            .sum()
-            .reset_index()
-            .sort_values(['Date', 'User'])  # Ensure data is sorted by date and user
-        )
-
-        # Pivot data to have one column per user
-        daily_totals_pivot = daily_totals.pivot(index='Date', columns='User', values='Pushups').fillna(0)
-
-        # Ensure the current user is the first column
-        user_order = [username] + [user for user in daily_totals_pivot.columns if user != username]
-        daily_totals_pivot = daily_totals_pivot[user_order]
-
-        # Create a stacked bar chart
-        fig = go.Figure()
-
-        for user in daily_totals_pivot.columns:
-            fig.add_trace(go.Bar(
-                x=daily_totals_pivot.index,
-                y=daily_totals_pivot[user],
-                name=user,
-                marker_color=USER_COLORS.get(user, '#000000') 
-            ))
-
-        # Customize the layout
-        fig.update_layout(
-            barmode="stack",  # Stacked bars
-            xaxis_title="Date",
-            yaxis_title="Pushups",
-            xaxis=dict(
-                tickformat="%b %-d",  # Display "Jan 1", "Jan 2", etc.
-            ),
-            legend_title="User",
-            template="plotly_white",
-            height=500,
-            width=800,
-            margin=dict(l=40, r=40, t=10, b=40),  # Adjust margins
-        )
-
         # Display the chart in Streamlit
+        fig = cached_figure(lambda: charts.daily_contributions_figure(aggregates, username, USER_COLORS, DISCIPLINE.unit),
+                            "daily_contributions", data_version, username)
         st.plotly_chart(fig, use_container_width=True)
 
     except Exception as e:
@@ -830,110 +611,151 @@ def display_daily_pushup_contributions(log_data, username):
 # amount of pushups done on that day. if the amount is below the average, display a red bar between the average line and
 # the value of pushups on that day, if there is a positive difference between the average on that day and the pushups done
 # on that day, display a green bar between the average line and the value of pushups on that day.
-def display_user_daily_average(log_data, username):
+@perf.timed
+def display_user_daily_average(aggregates, username, data_version=None):
     """
     Displays a line chart showing the daily average of pushups for the current user,
     with bars indicating the actual pushups done on each day. Green bars for above average,
     red bars for below average. Also shows the highest average line.
 
-    :param log_data: DataFrame containing the pushup logs with columns 'Timestamp', 'Pushups', and 'User'.
+    :param aggregates: DailyAggregates of the pushup logs.
     :param username: The current user to display the daily average for.
+    :param data_version: Version of the shared log the data belongs to, None to build the chart without the figure cache.
     """
     try:
-        # Ensure 'Timestamp' is in datetime format
-        log_data["Timestamp"] = pd.to_datetime(log_data["Timestamp"])
-
-        # Filter the data for the selected user
-        user_data = log_data[log_data['User'] == username].copy()
-
-        # Extract date component and sum pushups per user per day
-        user_data['Date'] = user_data['Timestamp'].dt.date
-        daily_totals = (
-            user_data
-            .groupby('Date')['Pushups']
-            .sum()
-            .reset_index()
-            .sort_values('Date')  # Ensure data is sorted by date
-        )
-
-        # Create a complete date range from the start date to the latest recorded date
-        start_date = daily_totals['Date'].min()
-        end_date = daily_totals['Date'].max()
-        all_dates = pd.date_range(start=start_date, end=end_date, freq='D')
-
-        # Reindex the daily pushups data to include all dates, filling missing days with 0
-        daily_totals_full = daily_totals.set_index('Date').reindex(all_dates, fill_value=0).reset_index().rename(columns={'index': 'Date'})
-
-        # Calculate the daily average pushups
-        daily_totals_full['Daily Average'] = daily_totals_full['Pushups'].expanding().mean().round(1)
-
-        # Calculate the highest average pushups
-        highest_average = daily_totals_full['Daily Average'].max()
-
-        # Create a Plotly figure
-        fig = go.Figure()
-
-        # Add a line for the highest average
-        fig.add_trace(go.Scatter(
-            x=daily_totals_full['Date'],
-            y=[highest_average] * len(daily_totals_full),
-            mode='lines',
-            name='Highest Average',
-            line=dict(width=2, color='orange', dash='dash'),
-            hovertemplate=f'Highest Average: {highest_average}<extra></extra>'
-        ))
-
-        # Add a line for the daily average
-        fig.add_trace(go.Scatter(
-            x=daily_totals_full['Date'],
-            y=daily_totals_full['Daily Average'],
-            mode='lines',
-            name='Daily Average',
-            line=dict(width=2, color='blue'),
-            hovertemplate='Date: %{x}<br>Daily Average: %{y}<extra></extra>'
-        ))
-
-        # Add bars for the actual pushups done each day
-        for _, row in daily_totals_full.iterrows():
-            if row['Pushups'] >= row['Daily Average']:
-                fig.add_trace(go.Bar(
-                    x=[row['Date']],
-                    y=[row['Pushups'] - row['Daily Average']],
-                    base=row['Daily Average'],
-                    name='Pushups',
-                    marker=dict(color='green'),
-                    hovertemplate='Date: %{x}<br>Pushups: %{y}<extra></extra>'
-                ))
-            else:
-                fig.add_trace(go.Bar(
-                    x=[row['Date']],
-                    y=[row['Daily Average'] - row['Pushups']],
-                    base=[row['Pushups']],
-                    name='Pushups',
-                    marker=dict(color='red'),
-                    hovertemplate='Date: %{x}<br>Pushups: %{base}<br><extra></extra>'
-                ))
-
-        # Customize the layout
-        fig.update_layout(
-            xaxis_title="Date",
-            yaxis_title="Average Pushups (blue), Pushups on that day (green/red)",
-            xaxis=dict(
-                tickformat="%b %-d",  # Display "Jan 1", "Jan 2", etc.
-            ),
-            showlegend=False,  # Remove the legend
-            template="plotly_white",
-            height=500,
-            width=800,
-            margin=dict(l=40, r=40, t=10, b=40),  # Adjust margins
-        )
-
         # Display the chart in Streamlit
+        fig = cached_figure(lambda: charts.user_daily_average_figure(aggregates, username, DISCIPLINE.unit),
+                            "user_daily_average", data_version, username)
         st.plotly_chart(fig, use_container_width=True)
 
     except Exception as e:
         st.error(f"Error: {e}")
 
+# charts of a finished season, its log is only loaded once somebody selects it
+@perf.timed
+def display_past_seasons(season_archive):
+    """
+    :param season_archive: SeasonArchive of the pushup log.
+    """
+    try:
+        seasons = season_archive.archived()
+    except Exception as e:
+        st.error(f"Error reading the seasons from the storage: {e}")
+        return
+    if not seasons:
+        st.write("No finished seasons yet.")
+        return
+
+    # Season selection, the latest finished season first
+    season_name = st.selectbox("Select a season:", [season.name for season in seasons])
+    season = next(season for season in seasons if season.name == season_name)
+
+    shared_log = season_archive.log(season)
+    log_data_season, revision_season, version_season = load_shared_log(shared_log)
+    if log_data_season is None:
+        return
+    # user selection for the season
+    #user_selection_season = st.multiselect(
+    #    "Select Users",
+    #    log_data_season['User'].unique(),
+    #    default=list(log_data_season['User'].unique()),  # Set default to all unique users
+    #    key="user_selection_season"
+    #    )
+    user_selection_season = list(log_data_season['User'].unique())
+    # The season's SharedLog may be dropped and loaded again, its file and revision identify the content
+    data_version = (season.log_name, revision_season)
+    display_accumulated_pushups(log_data_season, user_selection_season, data_version)
+    display_time_series_pushups(shared_log.aggregates(), user_selection_season, data_version)
+
+# suggestions of all users, the latest first (only read while shown)
+@perf.timed
+def display_suggestions():
+    """
+    Displays the suggestions in the storage and those still waiting in the sync queue.
+    """
+    try:
+        suggestions = STORAGE.read_rows(SUGGESTION_FILE_NAME)
+    except Exception as e:
+        st.error(f"Error fetching {SUGGESTION_FILE_NAME} from the storage: {e}")
+        return
+    frames = [frame for frame in [suggestions, SYNC_QUEUE.pending_entries(SUGGESTION_FILE_NAME)]
+              if frame is not None and not frame.empty]
+    if not frames:
+        st.write("No suggestions yet.")
+        return
+    suggestions = pd.concat(frames, ignore_index=True).drop_duplicates()
+    st.dataframe(suggestions.sort_values(by="Timestamp", ascending=False), hide_index=True)
+
+# perf panel for the admins: where the time of the last reruns went
+def display_perf_panel(recorder):
+    """
+    Shows the recorded reruns (without the one running right now), the spans of a selected
+    rerun and the time per span summed over all of them.
+
+    :param recorder: The PerfRecorder of the server process.
+    """
+    reruns = recorder.history()[::-1]
+    if not reruns:
+        st.write("No reruns recorded yet.")
+        return
+
+    st.dataframe(pd.DataFrame({
+        "Started": [datetime.fromtimestamp(rerun.started_at).strftime("%H:%M:%S") for rerun in reruns],
+        "Rerun": [rerun.label for rerun in reruns],
+        "Duration (ms)": [round(rerun.duration * 1000, 1) for rerun in reruns],
+        "Requests": [rerun.requests for rerun in reruns],
+        "KiB": [round(rerun.bytes / 1024, 1) for rerun in reruns],
+        "Spans": [len(rerun.spans) for rerun in reruns],
+    }), hide_index=True)
+
+    # Spans of one rerun, nested spans indented below the span they ran in
+    selected = st.selectbox("Spans of rerun", range(len(reruns)),
+                            format_func=lambda i: f"{reruns[i].label} at {datetime.fromtimestamp(reruns[i].started_at):%H:%M:%S}")
+    spans = pd.DataFrame(reruns[selected].spans, columns=["name", "start", "duration", "depth", "requests", "bytes"])
+    st.dataframe(pd.DataFrame({
+        "Span": ["  " * depth + name for name, depth in zip(spans["name"], spans["depth"])],
+        "Start (ms)": (spans["start"] * 1000).round(1),
+        "Duration (ms)": (spans["duration"] * 1000).round(1),
+        "Requests": spans["requests"],
+        "KiB": (spans["bytes"] / 1024).round(1),
+    }), hide_index=True)
+
+    # Time per span summed over all recorded reruns, the most expensive first
+    all_spans = pd.DataFrame([span for rerun in reruns for span in rerun.spans],
+                             columns=["name", "start", "duration", "depth", "requests", "bytes"])
+    totals = all_spans.groupby("name").agg(Calls=("duration", "size"), Total=("duration", "sum"),
+                                           Requests=("requests", "sum"), Bytes=("bytes", "sum"))
+    totals = totals.sort_values("Total", ascending=False).rename_axis("Span")
+    st.dataframe(pd.DataFrame({
+        "Calls": totals["Calls"],
+        "Total (ms)": (totals["Total"] * 1000).round(1),
+        "Mean (ms)": (totals["Total"] / totals["Calls"] * 1000).round(2),
+        "Requests": totals["Requests"],
+        "KiB": (totals["Bytes"] / 1024).round(1),
+    }))
+
+    st.download_button("Download as JSON lines", recorder.export(), file_name="perf.jsonl", mime="application/jsonl")
+
+# Expander whose content only runs while it is open. Opening or closing it, and the widgets
+# inside (e.g. the month selection), only rerun this section instead of the whole page.
+# The section keeps the arguments of the last full run of the page.
+@st.fragment
+def lazy_section(label, key, display, *args, text=None):
+    """
+    :param label: Label of the expander
+    :param key: Session state key of the expander (True while it is open)
+    :param display: Function drawing the content, called with `args`
+    :param text: Short description shown above the content (optional)
+    """
+    expander = st.expander(label, key=key, on_change="rerun")
+    with expander:
+        if expander.open:
+            if text:
+                st.text(text)
+            # Part of the page's rerun, or a rerun of its own if only this section reruns
+            with PERF.rerun(f"{st.session_state.get('username')} {key}"):
+                display(*args)
+
 ### GIMMICK AREA
 # Custom CSS for the banner
 st.markdown(
@@ -1074,10 +896,11 @@ if not st.session_state.get('logged_in', False):
         else:
             st.error("Invalid username or PIN!")
 
-# Initialize session state for log_data if not already present
 ### LOAD LOG TO BE DISPLAYED
-if 'log_data' not in st.session_state:
-    st.session_state.log_data = fetch_file_from_drive("pushup_log.csv")
+# Everything this rerun reads is looked up (and downloaded if it changed) together first
+prefetch_render_files(st.session_state['logged_in'])
+# All sessions share one copy of the log per server process, only a view of it is used here
+log_data, log_revision, log_version = load_shared_log()
 
 ### MAIN CONTENT that is displayed when login was successfull
 if st.session_state['logged_in']:
@@ -1086,22 +909,24 @@ if st.session_state['logged_in']:
     #time.sleep(3)  # Wait for 3 seconds
     #st.empty()  # Clear the success message
     username = st.session_state['username']
-    ### LOAD LOG TO BE DISPLAYED
-    #log_data = fetch_file_from_drive("pushup_log.csv")
+    ## DISCIPLINE
+    # Everything below (logging, stats, charts, seasons) is about the selected discipline only
+    st.radio("Discipline", list(DISCIPLINES), format_func=lambda name: DISCIPLINES[name].label,
+             horizontal=True, label_visibility="collapsed", key="discipline")
 
     ## ADD PUSH-UPS
     # Create a form to group the input and button together
     with st.form("log_pushups_form"):
         # Create two columns to place the input field and button side by side
         # Input field for the number of push-ups (broad column)
-        pushups = st.number_input("Enter the number of push-ups you just did:", min_value=1, step=1, label_visibility="collapsed")
+        pushups = st.number_input(f"Enter the number of {DISCIPLINE.unit.lower()} you just did:", min_value=1, step=1, label_visibility="collapsed")
         col1, col2 = st.columns([3, 1], vertical_alignment="bottom")  # Adjust the width ratio as needed
         with col1:
             # Optional comment input (right column)
             comment = st.text_input("Add a comment (optional):", label_visibility="collapsed", placeholder="Add an optional comment here...")
         with col2:
             # Submit button (aligned with the bottom of the comment input)
-            submit_button = st.form_submit_button("Log Push-Ups", use_container_width=True)
+            submit_button = st.form_submit_button(f"Log {DISCIPLINE.label}", use_container_width=True)
 
         # If the button is pressed or Enter is hit, log the data
         if submit_button:
@@ -1110,32 +935,31 @@ if st.session_state['logged_in']:
             timestamp = german_time.strftime("%Y-%m-%d %H:%M:%S")
             # Create a DataFrame for the current entry
             new_entry = pd.DataFrame({"Timestamp": [timestamp], 
-                                        "Pushups": [pushups], 
+                                        "Reps": [pushups], 
                                         "User": [username],
                                         "comment":[comment if comment.strip() else None]})
 
-            # Try to append to the existing log file or create a new one
-            # TODO: this is quite slow because it does two syncs. how can i get this to be faster?
-            with st.spinner('Working on it...'):
-                try:
-                    # fetch file from GoogleDrive to Local
-                    log = fetch_file_from_drive("pushup_log.csv")
-                    # append local file with current push-ups
-                    log = pd.concat([log, new_entry], ignore_index=True)
-                    # push the updated local log file to Google Drive
-                    push_file_to_drive(log, "pushup_log.csv")
-                    # Update the log in session_state to reflect the changes
-                    st.session_state.log_data = log
-                    # Placeholder success message
-                    success_message = st.empty()
-                    formatted_timestamp = german_time.strftime('%Y-%m-%d %H:%M')
-                    success_message.success(f"Logged {pushups} push-ups at {formatted_timestamp}")
-                    time.sleep(2)
-                    # Clear the message
-                    success_message.empty()
-
-                except Exception as e:
-                    st.error(f"Error writing to file: {e}")
+            # Journal the entry locally, the sync queue writes it to the storage in the background
+            try:
+                new_entry = SYNC_QUEUE.submit(new_entry, LOG_FILE_NAME)
+                # Update the shared log to reflect the changes (for all sessions)
+                SHARED_LOG.add_entries(new_entry)
+                log_data, log_revision, log_version = load_shared_log()
+                # Short success message that disappears by itself
+                formatted_timestamp = german_time.strftime('%Y-%m-%d %H:%M')
+                st.toast(f"Logged {pushups} {DISCIPLINE.unit.lower()} at {formatted_timestamp}")
+
+            except Exception as e:
+                st.error(f"Error writing to file: {e}")
+
+    # Let people know if their sets haven't reached the storage yet
+    backlog = SYNC_QUEUE.backlog()
+    if backlog:
+        st.caption(f"{backlog} logged set(s) waiting to be synced.")
+    set_aside = SYNC_QUEUE.dead_letters()
+    if set_aside:
+        st.warning(f"{len(set_aside)} logged set(s) couldn't be synced and were set aside in "
+                   f"{SYNC_QUEUE.dead_letter_path}: {set_aside[-1]['error']}")
 
     ### RICKROLL
     st.subheader("")
@@ -1156,27 +980,38 @@ if st.session_state['logged_in']:
     ### SHOW RECENT ENTRIES
     st.subheader("")
     st.header("Recent entries")
-    display_recent_entries(st.session_state.log_data)
+    display_recent_entries(log_data)
     #display_last_five_entries(log_data)
     with st.expander("Did a mistake?"):
-        manage_user_entries(st.session_state.log_data, username)
+        manage_user_entries(log_data, username, log_revision)
     
     ### SHOW TODAYS PUSHUPS PER USER
     st.subheader("")
-    st.header("Today's pushups")
-    display_pushups_today(st.session_state.log_data)
+    st.header(f"Today's {DISCIPLINE.unit.lower()}")
+    # Reps per day and user, built once per version of the shared log
+    aggregates = SHARED_LOG.aggregates()
+    # The charts are cached per log and version of the shared log - unless it changed since log_data
+    # was loaded (e.g. entries were just deleted), then log_data and the aggregates don't match
+    data_version = (LOG_FILE_NAME, log_version) if SHARED_LOG.version == log_version else None
+    display_pushups_today(aggregates)
 
     ### SHOW PERSONAL STATS
     st.subheader("")
     st.header("Your personal stats!")
-    display_user_stats(st.session_state.log_data, username)
+    # The season the active log holds (listed in the manifest, see seasons.py)
+    try:
+        season = SEASON_ARCHIVE.active()
+    except Exception as e:
+        st.error(f"Error reading the seasons from the storage: {e}")
+        season = SEASON_ARCHIVE.fallback()
+    display_user_stats(SHARED_LOG, username, season)
 
     ### SHOW AVERAGE OF ALL USERS
     # TOO COMPETITIVE, TOO PERSONAL
     #with st.expander("Average pushups per day"):
-    #    display_daily_average_pushups(st.session_state.log_data)
+    #    display_daily_average_pushups(log_data)
 
-    user_selection = list(st.session_state.log_data['User'].unique())
+    user_selection = list(log_data['User'].unique())
 
     ### VISUALIZATION
     st.subheader("")
@@ -1184,36 +1019,39 @@ if st.session_state['logged_in']:
 
     # TODO: Nowhere here is the user_selection actually needed since now plotly is employed to "filter" the data
 
+    # The charts are only computed while their expander is open (see lazy_section())
     # Display heatmap
-    with st.expander("Pushup Heatmap"):
-        display_pushup_heatmap(st.session_state.log_data)
+    # Reps per user, week, weekday and hour, kept up to date along with the shared log
+    activity = SHARED_LOG.activity() if data_version is not None else ActivityCube.from_log(log_data)
+    lazy_section(f"{DISCIPLINE.noun} Heatmap", "section_heatmap",
+                 display_pushup_heatmap, activity, data_version)
 
     # Display monthly accumulation
-    with st.expander("Accumulated pushups by month and user"):
-        display_monthly_accumulated_pushups(st.session_state.log_data)
+    lazy_section(f"Accumulated {DISCIPLINE.unit.lower()} by month and user", "section_monthly",
+                 display_monthly_accumulated_pushups, log_data, data_version)
 
-    with st.expander ("Your average pushups evolving over time"):
-        display_user_daily_average(st.session_state.log_data, username)
+    lazy_section(f"Your average {DISCIPLINE.unit.lower()} evolving over time", "section_user_average",
+                 display_user_daily_average, aggregates, username, data_version)
 
-    with st.expander ("Accumulated pushups for the full year"):
-        st.text("Accumulated, unstacked, full year")
-        display_accumulated_pushups(st.session_state.log_data, user_selection)
+    lazy_section(f"Accumulated {DISCIPLINE.unit.lower()} for the full year", "section_accumulated",
+                 display_accumulated_pushups, log_data, user_selection, data_version,
+                 text="Accumulated, unstacked, full year")
 
-    with st.expander ("Pushups by users on each day"):
-        st.text("Not-accumulated, unstacked")
-        display_time_series_pushups(st.session_state.log_data, user_selection)
+    lazy_section(f"{DISCIPLINE.unit} by users on each day", "section_time_series",
+                 display_time_series_pushups, aggregates, user_selection, data_version,
+                 text="Not-accumulated, unstacked")
 
-    with st.expander ("Pushup dominance"):
-        st.text("Percentage of all pushups done by each user per day. Current user is always the bottommost line.")
-        display_pushups_dominance_with_selection(st.session_state.log_data, user_selection, username)
+    lazy_section(f"{DISCIPLINE.noun} dominance", "section_dominance",
+                 display_pushups_dominance_with_selection, aggregates, user_selection, username, data_version,
+                 text=f"Percentage of all {DISCIPLINE.unit.lower()} done by each user per day. Current user is always the bottommost line.")
 
-    with st.expander ("Total pushups done within this tracker"):
-        st.text("Accumulated, stacked")
-        display_total_accumulated_pushups_by_user(st.session_state.log_data, username)
+    lazy_section(f"Total {DISCIPLINE.unit.lower()} done within this tracker", "section_total_by_user",
+                 display_total_accumulated_pushups_by_user, aggregates, username, data_version,
+                 text="Accumulated, stacked")
 
-    with st.expander ("Stacked bar plot of each day."):
-        st.text("Not-accumulated, stacked")
-        display_daily_pushup_contributions(st.session_state.log_data, username)
+    lazy_section("Stacked bar plot of each day.", "section_daily_contributions",
+                 display_daily_pushup_contributions, aggregates, username, data_version,
+                 text="Not-accumulated, stacked")
     
     #if st.button("Show/Refresh Visualization"):
         # TODO: make it so that the vis is displayed but only updated by the button
@@ -1221,51 +1059,34 @@ if st.session_state['logged_in']:
         #st.subheader("Accumulated Push-Ups")
         ## DISPLAY the accumulated push-ups graph
         #st.text("Accumulated, unstacked, full year")
-        #display_accumulated_pushups(st.session_state.log_data, user_selection)
+        #display_accumulated_pushups(log_data, user_selection)
 
         ## DISPLAY the original push-ups over time graph
         #st.subheader("Push-Ups Over Time")
         #st.text("Not-accumulated, unstacked")
-        #display_time_series_pushups(st.session_state.log_data, user_selection)
+        #display_time_series_pushups(log_data, user_selection)
 
         ## DISPLAY dominance plot
         #st.subheader("Pushup dominance")
         #st.text("Percentage of all pushups done by each user per day. Current user is always the bottommost line.")
-        #display_pushups_dominance_with_selection(st.session_state.log_data, user_selection, username)
+        #display_pushups_dominance_with_selection(log_data, user_selection, username)
 
         ## DISPLAY total pushups done within the project
         #st.subheader("Total pushups done for this tracker")
         #st.text("Accumulated, stacked")
-        #display_total_accumulated_pushups_by_user(st.session_state.log_data, username)
+        #display_total_accumulated_pushups_by_user(log_data, username)
 
         ## DISPLAY TODO:
         #st.subheader("Total pushups done per day and how much each user contributed")
         #st.text("Not-accumulated, stacked")
-        #display_daily_pushup_contributions(st.session_state.log_data, username)
+        #display_daily_pushup_contributions(log_data, username)
 
 
-    ## SHOW LEGACY DATA FROM 2022
+    ## SHOW PAST SEASONS
     st.subheader("")
     st.subheader("Legacy") 
-    # Use session_state to track if the expander is open
-    if 'expander_opened' not in st.session_state:
-        st.session_state.expander_opened = False       
-    with st.expander("2022"):
-        st.session_state.expander_opened = True
-        if st.session_state.expander_opened:
-        # fetch 2022 data from GoogleDrive
-            log_data_2022 = fetch_file_from_drive("pushup_log_2022.csv")
-            log_data_2022["Timestamp"] = pd.to_datetime(log_data_2022["Timestamp"])
-            # user selection for 2022
-            #user_selection_2022 = st.multiselect(
-            #    "Select Users",
-            #    log_data_2022['User'].unique(),
-            #    default=list(log_data_2022['User'].unique()),  # Set default to all unique users
-            #    key="user_selection_2022"
-            #    )
-            user_selection_2022 = list(log_data_2022['User'].unique())
-            display_accumulated_pushups(log_data_2022, user_selection_2022)
-            display_time_series_pushups(log_data_2022, user_selection_2022)
+    # A season's log is only downloaded while this expander is open and the season is selected
+    lazy_section("Past seasons", "section_past_seasons", display_past_seasons, SEASON_ARCHIVE)
 
     with st.expander("1998"):
         st.image("https://media1.tenor.com/m/ZAMoMuQgf9UAAAAd/mapache-pedro.gif", width = 300)
@@ -1276,18 +1097,12 @@ if st.session_state['logged_in']:
     - get different color palette (suggestions welcome)
     - handle different timezones
     - allow users to set personal goals for the year
-    - might add different disciplines (squats or pull-ups or w/e)
-    - differentiate types of push-ups
+    - more disciplines than push-ups, squats and pull-ups (suggestions welcome)
     - add prizes (cash or sexual favors. tbd.)
     '''
 
     ### USER SUGGESTIONS
-    # fetch suggestions from GoogleDrive
-    suggestion = fetch_file_from_drive("suggestion.csv")
-
-    # Ensure suggestion is a DataFrame, if it's empty, initialize with the proper structure
-    if suggestion is None or suggestion.empty:
-        suggestion = pd.DataFrame(columns=["Timestamp", "Username", "Suggestion"])
+    # Nothing is read here: a suggestion is only added (see below), the list is only read while it is shown
 
     # Form for user suggestions
     with st.form("suggestion_form"):
@@ -1306,15 +1121,20 @@ if st.session_state['logged_in']:
                     "Suggestion": [suggestion_text.strip()]
                 })
                 
-                # Append new suggestion to the existing suggestions DataFrame
-                suggestion = pd.concat([suggestion, new_suggestion], ignore_index=True)
-                
-                st.success("Thank you for your suggestion!")
-                
-                # Push the updated suggestions to Google Drive
-                push_file_to_drive(suggestion, "suggestion.csv")
+                # Journal the suggestion, the sync queue adds it to the storage in the background
+                try:
+                    SYNC_QUEUE.submit_rows(new_suggestion, SUGGESTION_FILE_NAME)
+                    st.success("Thank you for your suggestion!")
+                except Exception as e:
+                    st.error(f"Error saving your suggestion: {e}")
             else:
                 st.warning("Please write a suggestion before submitting.")
+
+    lazy_section("Suggestions so far", "section_suggestions", display_suggestions)
+
+    ### PERFORMANCE (admins only, while recording is enabled)
+    if PERF.enabled and username in PERF_CONFIG.get("admins", []):
+        lazy_section("Performance", "section_perf", display_perf_panel, PERF)
 else:
     st.text("Log in to see data and log pushups")
 
@@ -1323,5 +1143,7 @@ st.subheader("")
 💟 Happy pushing. Stefan.
 """
 
+PERF.finish(PERF_RUN)
+
 
 
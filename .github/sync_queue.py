@@ -0,0 +1,297 @@
+# Write-behind queue for logged sets (and other added rows, e.g. suggestions).
+# "Log Push-Ups" only writes the entry to a local journal file and returns. A background
+# thread drains the journal to the storage backend in batches (one append per batch) and
+# retries when the storage is unreachable. Entries that were journaled but not synced yet
+# (e.g. because the server restarted) are replayed when the queue is created again.
+# An entry the storage keeps rejecting (e.g. a malformed row or a missing permission) is set
+# aside in a dead-letter file, so it doesn't hold up the entries logged after it.
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from storage import ENTRY_ID_COLUMN, REPS_COLUMN, STORED_REPS_COLUMN
+
+logger = logging.getLogger(__name__)
+
+# Most entries written with one append
+SYNC_BATCH_SIZE = 50
+
+# Seconds to wait before retrying a failed sync (doubles up to SYNC_MAX_RETRY_DELAY)
+SYNC_RETRY_DELAY = 2
+SYNC_MAX_RETRY_DELAY = 60
+
+# Failed attempts after which an entry that was rejected for what it is gets set aside
+# (network trouble and server errors are retried until they pass)
+SYNC_MAX_ATTEMPTS = 5
+
+# HTTP statuses besides the 5xx that go away by themselves (timeout, rate limit)
+TRANSIENT_STATUSES = (408, 429)
+
+
+# Function to tell whether a failed sync can go through when it is retried later
+def is_transient(error):
+    """
+    The storage being down for a while must not cost any sets, so network trouble and server
+    errors count as transient. An entry rejected for what it is (a malformed row, a 4xx answer
+    like a missing permission) is rejected again on every retry.
+    :param error: The exception raised by the storage
+    :return: True if the error is likely to pass
+    """
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status is not None:
+        return int(status) >= 500 or int(status) in TRANSIENT_STATUSES
+    return (isinstance(error, (OSError, sqlite3.OperationalError))
+            or type(error).__module__.split('.')[0] == 'httplib2')
+
+
+class SyncQueue:
+    """
+    Durable write-behind queue in front of StorageBackend.append() (and append_rows()).
+    The journal is a JSON-lines file: {"id", "log", "entry"} lines for submitted entries
+    ({"id", "log", "entry", "rows": true} for rows added with submit_rows()) and
+    {"done": id} lines once an entry reached the storage. It is emptied whenever the
+    queue is fully drained, so it stays short. Entries that were set aside are kept in
+    the dead-letter file (JSON lines: the journal record plus "error").
+    """
+
+    def __init__(self, storage, journal_path, batch_size=SYNC_BATCH_SIZE, retry_delay=SYNC_RETRY_DELAY,
+                 dead_letter_path=None):
+        """
+        :param storage: StorageBackend the entries are synced to
+        :param journal_path: Path of the local journal file (created if needed)
+        :param batch_size: Most entries written with one append
+        :param retry_delay: Seconds to wait before the first retry of a failed sync
+        :param dead_letter_path: Path of the file entries are set aside in (None: next to the journal,
+                                 e.g. 'sync_journal.dead.jsonl')
+        """
+        self.storage = storage
+        self.journal_path = journal_path
+        self.dead_letter_path = dead_letter_path or f"{os.path.splitext(journal_path)[0]}.dead.jsonl"
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.synced = 0
+        self.failures = 0
+        self.last_error = None
+        self._pending = []  # journal records not synced yet, oldest first
+        self._dead_letters = []  # records that were set aside, oldest first
+        self._shared_logs = {}  # log name -> SharedLog told about every append to that log
+        self._condition = threading.Condition()
+
+        self._replay()
+        self._worker = threading.Thread(target=self._run, name="sync-queue", daemon=True)
+        self._worker.start()
+
+    def _replay(self):
+        """Loads the entries that were journaled but never synced (e.g. before a restart)."""
+        if os.path.exists(self.dead_letter_path):
+            with open(self.dead_letter_path, encoding='utf-8') as dead_letters:
+                self._dead_letters = [json.loads(line) for line in dead_letters if line.strip()]
+        if not os.path.exists(self.journal_path):
+            return
+        records, done = [], set()
+        with open(self.journal_path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Half written last line from a crash - the entry was never acknowledged
+                    continue
+                if 'done' in record:
+                    done.add(record['done'])
+                else:
+                    if not record.get('rows'):
+                        # Journaled before entries had IDs: the record's ID becomes the entry's
+                        record['entry'].setdefault(ENTRY_ID_COLUMN, record['id'])
+                        # Journaled while the repetitions were still called by their stored name
+                        if STORED_REPS_COLUMN in record['entry']:
+                            record['entry'][REPS_COLUMN] = record['entry'].pop(STORED_REPS_COLUMN)
+                    records.append(record)
+        self._pending = [record for record in records if record['id'] not in done]
+        if self._pending:
+            logger.info("Replaying %d unsynced entries from %s", len(self._pending), self.journal_path)
+
+    def _write_journal(self, records):
+        with open(self.journal_path, 'a', encoding='utf-8') as journal:
+            for record in records:
+                journal.write(json.dumps(record, default=str) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def register(self, shared_log):
+        """
+        Tells a SharedLog about every append the worker makes to its log, so the SharedLog can
+        move its revision forward instead of taking the new delta for a change from outside.
+        :param shared_log: The SharedLog (see SharedLog.synced())
+        """
+        with self._condition:
+            self._shared_logs[shared_log.log_name] = shared_log
+
+    def submit(self, new_entry, log_name):
+        """
+        Journals new log entries and returns right away; the worker syncs them later.
+        Each entry gets the ID of its journal record as its entry ID.
+        :param new_entry: DataFrame holding the entries to append
+        :param log_name: Name of the log (e.g. 'pushup_log.csv')
+        :return: The entries with their entry IDs, as they will be stored
+        """
+        new_entry = new_entry.assign(**{ENTRY_ID_COLUMN: [uuid.uuid4().hex for _ in range(len(new_entry))]})
+        records = [
+            {'id': entry[ENTRY_ID_COLUMN], 'log': log_name, 'entry': entry}
+            for entry in new_entry.to_dict(orient='records')
+        ]
+        with self._condition:
+            self._write_journal(records)
+            self._pending.extend(records)
+            self._condition.notify()
+        return new_entry
+
+    def submit_rows(self, new_rows, file_name):
+        """
+        Journals rows for a file of records (see StorageBackend.append_rows()) and returns right away.
+        :param new_rows: DataFrame holding the rows to add
+        :param file_name: Name of the file (e.g. 'suggestion.csv')
+        """
+        records = [
+            {'id': uuid.uuid4().hex, 'log': file_name, 'entry': row, 'rows': True}
+            for row in new_rows.to_dict(orient='records')
+        ]
+        with self._condition:
+            self._write_journal(records)
+            self._pending.extend(records)
+            self._condition.notify()
+
+    def pending_entries(self, log_name):
+        """
+        :param log_name: Name of the log
+        :return: DataFrame of the entries for that log that didn't reach the storage yet
+        """
+        with self._condition:
+            entries = [record['entry'] for record in self._pending if record['log'] == log_name]
+        return pd.DataFrame(entries)
+
+    def backlog(self):
+        """
+        :return: Number of entries waiting to be synced
+        """
+        with self._condition:
+            return len(self._pending)
+
+    def flush(self, timeout=30):
+        """
+        Waits until every submitted entry reached the storage (e.g. before rewriting the log).
+        :param timeout: Seconds to wait at most
+        :return: True if the queue is drained, False if the timeout ran out
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def dead_letters(self):
+        """
+        :return: List of the journal records that were set aside (each with its "error"), oldest first
+        """
+        with self._condition:
+            return list(self._dead_letters)
+
+    def stats(self):
+        """
+        :return: Dictionary with backlog, synced, failure and dead-letter counters and the last error
+        """
+        with self._condition:
+            return {"backlog": len(self._pending), "synced": self.synced, "failures": self.failures,
+                    "dead_letters": len(self._dead_letters), "last_error": self.last_error}
+
+    def _next_batch(self, batch_size):
+        """Waits for pending entries and returns the oldest ones that belong to the same log (or file)."""
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            log_name = self._pending[0]['log']
+            batch = []
+            for record in self._pending:
+                if record['log'] != log_name or len(batch) == batch_size:
+                    break
+                batch.append(record)
+            return log_name, batch
+
+    def _sync(self, log_name, batch):
+        """Appends a batch of records to the storage (raises whatever the storage raises)."""
+        entries = pd.DataFrame([record['entry'] for record in batch])
+        if batch[0].get('rows'):
+            self.storage.append_rows(entries, log_name)
+            return
+        with self._condition:
+            shared_log = self._shared_logs.get(log_name)
+        based_on = shared_log.revision() if shared_log is not None else None
+        revision = self.storage.append(entries, log_name, based_on)
+        if shared_log is not None:
+            shared_log.synced(based_on, revision)
+
+    def _done(self, batch):
+        """Takes records out of the queue (and the journal). Call with the condition held."""
+        self._write_journal([{'done': record['id']} for record in batch])
+        done_ids = {record['id'] for record in batch}
+        self._pending = [record for record in self._pending if record['id'] not in done_ids]
+        if not self._pending:
+            # Everything is in the storage (or set aside), start over with an empty journal
+            open(self.journal_path, 'w').close()
+        self._condition.notify_all()
+
+    def _set_aside(self, log_name, record, error):
+        """Moves a record the storage keeps rejecting to the dead-letter file."""
+        logger.error("Setting aside an entry for %s that can't be synced: %s", log_name, error)
+        dead_letter = dict(record, error=str(error))
+        with self._condition:
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as dead_letters:
+                dead_letters.write(json.dumps(dead_letter, default=str) + "\n")
+            self._dead_letters.append(dead_letter)
+            self._done([record])
+            shared_log = self._shared_logs.get(log_name)
+        if shared_log is not None and not record.get('rows'):
+            # The set stays in the dead-letter file, but not in the log everybody sees
+            shared_log.drop_entries([record['entry'][ENTRY_ID_COLUMN]])
+
+    def _run(self):
+        delay = self.retry_delay
+        attempts = 0  # failed attempts of the oldest entries that waiting won't fix
+        one_by_one = 0  # entries still to sync on their own, to find the one the storage rejects
+        while True:
+            log_name, batch = self._next_batch(1 if one_by_one else self.batch_size)
+            try:
+                self._sync(log_name, batch)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                if not is_transient(e):
+                    attempts += 1
+                    if attempts >= SYNC_MAX_ATTEMPTS:
+                        attempts, delay = 0, self.retry_delay
+                        if len(batch) > 1:
+                            one_by_one = len(batch)
+                        else:
+                            self._set_aside(log_name, batch[0], e)
+                            one_by_one = max(one_by_one - 1, 0)
+                        continue
+                logger.warning("Syncing %d entries to %s failed, retrying in %ss: %s", len(batch), log_name, delay, e)
+                time.sleep(delay)
+                delay = min(delay * 2, SYNC_MAX_RETRY_DELAY)
+                continue
+
+            delay = self.retry_delay
+            attempts = 0
+            one_by_one = max(one_by_one - 1, 0)
+            with self._condition:
+                self._done(batch)
+                self.synced += len(batch)
+                self.last_error = None
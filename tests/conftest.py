@@ -0,0 +1,5 @@
+# The app's modules live next to streamlit_app.py in .github/ (like for the benchmark scripts)
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".github"))
@@ -0,0 +1,64 @@
+# Incremental updates of the aggregates (what SharedLog does on every logged or deleted set)
+# checked against a full recompute from the log
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import ActivityCube, DailyAggregates
+from benchmark_startup import sample_log
+from storage import LOG_COLUMNS, ingest_log
+
+USERS = ["alice", "bob", "carol", "dave"]
+
+
+# Function to make random log entries
+def random_entries(rng, count, start="2025-12-01", days=90):
+    """
+    :param rng: numpy Generator
+    :param count: Number of entries
+    :param start: First day the entries can fall on
+    :param days: Number of days the entries are spread over
+    :return: Ingested DataFrame of the entries (as SharedLog.add_entries() passes them on)
+    """
+    seconds = rng.integers(0, days * 24 * 3600, count)
+    timestamps = pd.Timestamp(start) + pd.to_timedelta(seconds, unit="s")
+    return ingest_log(pd.DataFrame({
+        "Timestamp": timestamps.strftime("%Y-%m-%d %H:%M:%S"),
+        "Reps": rng.integers(1, 60, count),
+        "User": rng.choice(USERS, count),
+        "comment": [None] * count,
+    }))
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("start_empty", [True, False])
+def test_random_adds_and_removes_match_a_full_recompute(seed, start_empty):
+    rng = np.random.default_rng(seed)
+    if start_empty:
+        log = ingest_log(pd.DataFrame(columns=LOG_COLUMNS))
+    else:
+        log = ingest_log(sample_log(60, 3, USERS[:2]))
+    aggregates, activity = DailyAggregates.from_log(log), ActivityCube.from_log(log)
+
+    for step in range(30):
+        if len(log) and rng.random() < 0.4:
+            removed = log.loc[rng.choice(log.index, min(len(log), int(rng.integers(1, 4))), replace=False)]
+            log = log.drop(removed.index)
+            aggregates, activity = aggregates.remove(removed), activity.remove(removed)
+        else:
+            # Spread over a range that reaches before and after the entries logged so far
+            added = random_entries(rng, int(rng.integers(1, 5)), start=f"2025-{rng.integers(1, 13):02d}-01")
+            log = pd.concat([log, added], ignore_index=True)
+            aggregates, activity = aggregates.add(added), activity.add(added)
+        assert aggregates.differences(log) == [], f"step {step}"
+        assert activity.differences(log) == [], f"step {step}"
+
+
+def test_removing_every_entry_leaves_empty_aggregates():
+    log = ingest_log(sample_log(10, 2, USERS[:2]))
+    aggregates, activity = DailyAggregates.from_log(log), ActivityCube.from_log(log)
+    aggregates, activity = aggregates.remove(log), activity.remove(log)
+    empty = log.iloc[0:0]
+    assert aggregates.total() == 0
+    assert aggregates.differences(empty) == []
+    assert activity.heatmap().to_numpy().sum() == 0
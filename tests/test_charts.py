@@ -0,0 +1,104 @@
+# Downsampling of the accumulated charts (LTTB) checked against a plain per-point version
+import numpy as np
+import pandas as pd
+import pytest
+
+from charts import accumulated_figure, downsample_per_user, lttb_indices
+
+USER_COLORS = {"alice": "#1f77b4", "bob": "#ff7f0e"}
+
+
+# Function to pick the points the slow, obvious way (same buckets as lttb_indices())
+def reference_lttb(x, y, max_points):
+    """
+    :return: List of the positions of the kept points
+    """
+    count = len(x)
+    edges = list(np.linspace(1, count - 1, max_points - 1).astype('int64')) + [count]
+    selected, previous = [0], 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        following = range(edges[bucket + 1], edges[bucket + 2])
+        next_x = sum(x[i] for i in following) / len(following)
+        next_y = sum(y[i] for i in following) / len(following)
+        areas = [abs((x[previous] - next_x) * (y[i] - y[previous]) - (x[previous] - x[i]) * (next_y - y[previous]))
+                 for i in range(start, end)]
+        previous = start + areas.index(max(areas))
+        selected.append(previous)
+    return selected + [count - 1]
+
+
+@pytest.mark.parametrize("count, max_points", [(10, 5), (1000, 100), (1001, 999), (5000, 3)])
+def test_lttb_keeps_the_same_points_as_the_reference(count, max_points):
+    rng = np.random.default_rng(count)
+    x = np.cumsum(rng.integers(1, 100, count)).astype('float64')
+    y = np.cumsum(rng.normal(size=count))
+    kept = lttb_indices(x, y, max_points)
+    assert kept.tolist() == reference_lttb(x - x[0], y, max_points)
+    assert len(kept) == max_points
+    assert kept[0] == 0 and kept[-1] == count - 1
+    assert (np.diff(kept) > 0).all()
+
+
+def test_lttb_keeps_every_point_if_there_are_few():
+    assert lttb_indices(np.arange(5), np.arange(5), 5).tolist() == [0, 1, 2, 3, 4]
+    assert lttb_indices(np.arange(5), np.arange(5), 100).tolist() == [0, 1, 2, 3, 4]
+    # Two points can't hold a bucket in between
+    assert lttb_indices(np.arange(5), np.arange(5), 2).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(1000)
+    y[537] = 50.0
+    assert 537 in lttb_indices(np.arange(1000), y, 20)
+
+
+# Function to build a long-format frame of accumulated reps
+def accumulated(rng, users, count, shares=None):
+    """
+    :param shares: Share of the entries per user (None: the same for everybody)
+    :return: DataFrame with Timestamp, User and Accumulated Reps, sorted by Timestamp
+    """
+    timestamps = pd.Timestamp("2026-01-01") + pd.to_timedelta(np.sort(rng.integers(0, 300 * 86400, count)), unit="s")
+    data = pd.DataFrame({"Timestamp": timestamps, "User": rng.choice(users, count, p=shares),
+                         "Reps": rng.integers(1, 60, count)})
+    data["Accumulated Reps"] = data.groupby("User")["Reps"].cumsum()
+    return data
+
+
+def test_every_user_keeps_their_budget_and_line_ends():
+    rng = np.random.default_rng(0)
+    data = accumulated(rng, ["alice", "bob", "carol"], 6000, shares=[0.495, 0.495, 0.01])
+
+    reduced = downsample_per_user(data, "Timestamp", "Accumulated Reps", 200)
+    # Rows keep their order (still sorted by time), and lines with fewer points keep all of them
+    assert reduced.index.is_monotonic_increasing
+    counts = reduced["User"].value_counts()
+    assert counts["alice"] == counts["bob"] == 200
+    assert counts["carol"] == (data["User"] == "carol").sum() < 200
+    for user, rows in data.groupby("User"):
+        kept = reduced[reduced["User"] == user]
+        assert kept.index[0] == rows.index[0] and kept.index[-1] == rows.index[-1]
+        # The datetimes are turned into numbers for the triangles, the picks match the reference's
+        x = rows["Timestamp"].to_numpy().astype('int64')
+        expected = reference_lttb(x - x[0], rows["Accumulated Reps"].to_numpy(), 200) if len(rows) > 200 else range(len(rows))
+        assert kept.index.tolist() == rows.index[list(expected)].tolist()
+
+
+def test_nothing_is_dropped_without_a_budget_or_below_it():
+    data = accumulated(np.random.default_rng(1), ["alice", "bob"], 300)
+    assert downsample_per_user(data, "Timestamp", "Accumulated Reps", None) is data
+    assert downsample_per_user(data, "Timestamp", "Accumulated Reps", 300) is data
+
+
+def test_accumulated_figure_draws_each_line_with_its_budget():
+    rng = np.random.default_rng(2)
+    log = accumulated(rng, ["alice", "bob"], 5000).drop(columns="Accumulated Reps")
+    totals = log.groupby("User")["Reps"].sum()
+
+    figure = accumulated_figure(log, ["alice", "bob"], USER_COLORS, max_points=100)
+    assert sorted(trace.name for trace in figure.data) == ["alice", "bob"]
+    for trace in figure.data:
+        assert len(trace.y) == 100
+        # The line still ends at the user's total
+        assert trace.y[-1] == totals[trace.name]
@@ -0,0 +1,96 @@
+# The season manifest and the SeasonArchive, against the local backend
+import pandas as pd
+import pytest
+
+from seasons import (MANIFEST_NAME, Season, SeasonArchive, calendar_season, manifest_frame, parse_manifest, same_log,
+                     season_log_name)
+from shared_log import SharedLog
+from storage import LocalBackend
+
+SEASONS = [
+    Season("2024", "pushup_log_2024.csv", pd.Timestamp(2024, 1, 1), pd.Timestamp(2024, 12, 31)),
+    Season("2026", "pushup_log.parquet", pd.Timestamp(2026, 1, 1), pd.Timestamp(2026, 12, 31)),
+    Season("2025", "pushup_log_2025.csv", pd.Timestamp(2025, 1, 1), pd.Timestamp(2025, 12, 31)),
+]
+
+
+# Function to build a log with one entry per day of a season
+def season_entries(season, days=3):
+    """
+    :return: DataFrame of log entries
+    """
+    timestamps = pd.date_range(season.start + pd.Timedelta(hours=8), periods=days, freq="D")
+    return pd.DataFrame({"Timestamp": timestamps.strftime("%Y-%m-%d %H:%M:%S"), "Reps": [int(season.name)] * days,
+                         "User": ["alice"] * days, "comment": [None] * days})
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalBackend(str(tmp_path / "drive"))
+    for season in SEASONS:
+        storage.append(season_entries(season), season.log_name)
+    return storage
+
+
+def test_manifest_round_trip_lists_the_latest_season_first():
+    manifest = manifest_frame(SEASONS)
+    assert manifest["Season"].tolist() == ["2026", "2025", "2024"]
+    assert manifest.loc[0, "Start"] == "2026-01-01"
+    # As read back from the CSV file: numbers for names, strings with times for days
+    stored = manifest.assign(Season=manifest["Season"].astype(int), End=manifest["End"] + " 23:59:59")
+    assert parse_manifest(stored) == sorted(SEASONS, key=lambda season: season.start, reverse=True)
+
+
+def test_season_names_and_days():
+    season = calendar_season(2024, "pushup_log.csv")
+    assert season.days == 366
+    assert season_log_name("pushup_log.parquet", "2025") == "pushup_log_2025.parquet"
+    # The manifest may still name the log with its old extension
+    assert same_log("pushup_log.csv", "pushup_log.parquet")
+    assert not same_log("pushup_log.csv", "pushup_log_2025.csv")
+
+
+def test_without_a_manifest_the_fallbacks_are_offered(storage):
+    active_log = SharedLog(storage, "pushup_log.parquet")
+    archive = SeasonArchive(storage, active_log, fallback_seasons=[SEASONS[2]], fallback_active=SEASONS[1])
+    assert archive.seasons() == [SEASONS[1], SEASONS[2]]
+    assert archive.active() == SEASONS[1]
+    assert archive.archived() == [SEASONS[2]]
+
+
+def test_the_active_season_is_found_in_either_file_format(storage):
+    storage.push(manifest_frame([season._replace(log_name="pushup_log.csv") if season.name == "2026" else season
+                                 for season in SEASONS]), MANIFEST_NAME)
+    active_log = SharedLog(storage, "pushup_log.parquet")
+    archive = SeasonArchive(storage, active_log)
+    assert archive.active().name == "2026"
+    assert [season.name for season in archive.archived()] == ["2025", "2024"]
+    assert archive.log(archive.active()) is active_log
+
+
+def test_archived_seasons_are_loaded_on_demand_and_evicted(storage):
+    storage.push(manifest_frame(SEASONS), MANIFEST_NAME)
+    archive = SeasonArchive(storage, SharedLog(storage, "pushup_log.parquet"), loaded_seasons=1)
+    season_2025, season_2024 = archive.archived()
+    assert archive.stats()["loads"] == 0
+
+    log_2025 = archive.log(season_2025)
+    assert log_2025.snapshot()[0]["Reps"].tolist() == [2025] * 3
+    assert archive.log(season_2025) is log_2025
+    assert archive.log(season_2024).snapshot()[0]["Reps"].tolist() == [2024] * 3
+    # Only one archived season stays loaded, going back to 2025 loads it again
+    assert archive.stats()["loaded"] == ["2024"]
+    assert archive.log(season_2025) is not log_2025
+    assert archive.stats() == {"seasons": 3, "loaded": ["2025"], "loads": 3}
+
+
+def test_a_changed_manifest_is_picked_up_after_the_check_interval(storage):
+    storage.push(manifest_frame(SEASONS[1:]), MANIFEST_NAME)
+    archive = SeasonArchive(storage, SharedLog(storage, "pushup_log.parquet"), check_interval=3600)
+    assert len(archive.seasons()) == 2
+    storage.push(manifest_frame(SEASONS), MANIFEST_NAME)
+    assert len(archive.seasons()) == 2
+
+    archive.check_interval = 0
+    assert archive.due()
+    assert [season.name for season in archive.archived()] == ["2025", "2024"]
@@ -0,0 +1,325 @@
+# Requests and bytes the storage causes on Drive, counted by the in-memory fake (fake_drive.py)
+import io
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from benchmark_startup import sample_log
+from fake_drive import FakeDriveService
+from storage import (DELTA_COMPACTION_THRESHOLD, ENTRY_ID_COLUMN, STORED_REPS_COLUMN, DriveBackend, SQLiteBackend,
+                     delta_prefix, deserialize_frame, log_row_keys, merge_log_deltas, serialize_frame, typed_log,
+                     with_entry_ids)
+
+LOG_FILE_NAME = "pushup_log.csv"
+MANIFEST_NAME = "seasons.csv"
+
+
+# Function to build one log entry
+def entry(timestamp, pushups=10, user="alice"):
+    """
+    :return: DataFrame with one entry (as the app submits it)
+    """
+    return pd.DataFrame({"Timestamp": [timestamp], "Reps": [pushups], "User": [user], "comment": [None]})
+
+
+# Function to count the requests the fake received since its last reset
+def requests(drive):
+    """
+    :return: Dictionary API method -> number of requests, without the methods that weren't used
+    """
+    return {method: count for method, count in drive.request_counts.items() if count}
+
+
+@pytest.fixture
+def drive():
+    drive = FakeDriveService()
+    drive.add_file(LOG_FILE_NAME, sample_log(30, 4, ["alice", "bob"]).to_csv(index=False))
+    drive.add_file(MANIFEST_NAME, "Season,Log,Start,End\n2026,pushup_log.csv,2026-01-01,2026-12-31\n")
+    return drive
+
+
+# Function to create a backend with empty caches on the fake (like a new server process)
+def backend(drive):
+    return DriveBackend(drive, drive.folder_id, http_factory=drive.new_http)
+
+
+def test_prefetch_looks_up_in_one_batch_and_downloads_each_file_once(drive):
+    storage = backend(drive)
+    drive.reset_counters()
+    storage.prefetch([MANIFEST_NAME], [LOG_FILE_NAME])
+    assert requests(drive) == {"batch": 1, "get_media": 2}
+    assert drive.bytes_downloaded == len(drive.content(LOG_FILE_NAME)) + len(drive.content(MANIFEST_NAME))
+
+    # The reads of the page then need no request at all
+    drive.reset_counters()
+    storage.fetch(MANIFEST_NAME)
+    log, revision = storage.fetch_log(LOG_FILE_NAME)
+    assert requests(drive) == {}
+    assert len(log) == 120
+
+
+def test_tail_read_downloads_only_the_end_of_the_log(drive):
+    storage = backend(drive)
+    drive.reset_counters()
+    tail = storage.read_log_tail(LOG_FILE_NAME, 5)
+    assert len(tail) == 5
+    assert requests(drive).get("get_media", 0) <= 2
+    assert drive.bytes_downloaded < len(drive.content(LOG_FILE_NAME)) / 2
+    full = deserialize_frame(io.BytesIO(drive.content(LOG_FILE_NAME)), LOG_FILE_NAME)
+    assert log_row_keys(tail).tolist() == log_row_keys(full.tail(5)).tolist()
+
+
+def test_append_uploads_only_the_new_entries(drive):
+    storage = backend(drive)
+    storage.fetch_log(LOG_FILE_NAME)
+    new_entry = entry("2026-10-18 10:00:00")
+    drive.reset_counters()
+    storage.append(new_entry, LOG_FILE_NAME)
+    assert requests(drive) == {"create": 1}
+    assert drive.bytes_downloaded == 0
+    assert drive.bytes_uploaded == len(serialize_frame(new_entry, LOG_FILE_NAME)[0])
+
+
+def test_stale_write_merges_without_downloading_the_base_again(drive):
+    storage = backend(drive)
+    original, revision = storage.fetch_log(LOG_FILE_NAME)
+    # Somebody else logs a set after `original` was read
+    backend(drive).append(entry("2026-10-18 10:00:00", 33, "bob"), LOG_FILE_NAME)
+    delta_size, = [len(file["content"]) for file in drive.files_by_id.values() if file["name"].startswith(delta_prefix(LOG_FILE_NAME))]
+
+    drive.reset_counters()
+    removed = original.index[:2]
+    written, written_revision = storage.write_log(original.drop(removed), LOG_FILE_NAME, revision, original)
+    # Only the other writer's delta is downloaded, the base comes from the cache
+    assert requests(drive)["get_media"] == 1
+    assert drive.bytes_downloaded == delta_size
+    assert requests(drive)["update"] == 1
+    assert requests(drive)["delete"] == 1
+    assert len(written) == len(original) - 2 + 1
+    assert 33 in written["Reps"].tolist()
+    assert written_revision.delta_ids == frozenset()
+
+
+# Function to wait for the background compaction started by fetch_log()
+def wait_for_compaction(drive, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if drive.request_counts["update"]:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_compaction_starts_at_its_threshold(drive):
+    storage = backend(drive)
+    storage.fetch_log(LOG_FILE_NAME)
+    for number in range(DELTA_COMPACTION_THRESHOLD - 1):
+        storage.append(entry(f"2026-10-18 10:{number:02d}:00", number + 1), LOG_FILE_NAME)
+
+    # One delta short of the threshold: no compaction
+    drive.reset_counters()
+    storage.fetch_log(LOG_FILE_NAME)
+    assert not wait_for_compaction(drive, timeout=0.2)
+
+    storage.append(entry("2026-10-18 11:00:00", 99), LOG_FILE_NAME)
+    drive.reset_counters()
+    log, revision = storage.fetch_log(LOG_FILE_NAME)
+    assert wait_for_compaction(drive)
+    # Wait for the deletes that follow the rewrite of the base file
+    deadline = time.monotonic() + 10
+    while drive.request_counts["delete"] < DELTA_COMPACTION_THRESHOLD and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert requests(drive)["update"] == 1
+    assert requests(drive)["delete"] == DELTA_COMPACTION_THRESHOLD
+    # The deltas this process wrote are cached since their upload and the base since the first
+    # read, so neither is downloaded again
+    base_size = len(drive.content(LOG_FILE_NAME))
+    compacted = pd.read_csv(io.BytesIO(drive.content(LOG_FILE_NAME)))
+    assert drive.bytes_downloaded < base_size
+    assert drive.bytes_uploaded >= base_size
+    assert len(compacted) == len(log) == 120 + DELTA_COMPACTION_THRESHOLD
+    assert not [file for file in drive.files_by_id.values()
+                if file["name"].startswith(delta_prefix(LOG_FILE_NAME)) and not file["trashed"]]
+
+
+def test_added_rows_are_compacted_at_the_threshold(drive):
+    storage = backend(drive)
+    for number in range(DELTA_COMPACTION_THRESHOLD):
+        storage.append_rows(pd.DataFrame({"Timestamp": [f"2026-10-18 10:{number:02d}:00"], "Username": ["alice"],
+                                          "Suggestion": [f"idea {number}"]}), "suggestion.csv")
+    rows = storage.read_rows("suggestion.csv")
+
+    deadline = time.monotonic() + 10
+    while storage.list_files(delta_prefix("suggestion.csv")) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert storage.list_files(delta_prefix("suggestion.csv")) == []
+    # Same rows in the same order, now read from the base file alone
+    drive.reset_counters()
+    assert storage.read_rows("suggestion.csv").equals(rows)
+    assert list(rows["Suggestion"]) == [f"idea {number}" for number in range(DELTA_COMPACTION_THRESHOLD)]
+    # The compacted base was cached when it was written
+    assert drive.bytes_downloaded == 0
+
+
+@pytest.mark.parametrize("kind", ["drive", "sqlite"])
+def test_identical_sets_stay_separate_entries(drive, tmp_path, kind):
+    storage = backend(drive) if kind == "drive" else SQLiteBackend(str(tmp_path / "log.db"))
+    # Two sets with the same time, user and count, submitted separately (IDs as the sync queue gives them)
+    for entry_id in ["first", "second"]:
+        storage.append(entry("2026-10-18 10:00:00").assign(**{ENTRY_ID_COLUMN: entry_id}), LOG_FILE_NAME)
+    storage.compact_log(LOG_FILE_NAME)
+    log, revision, deltas = storage.read_log(LOG_FILE_NAME)
+    assert sorted(log[ENTRY_ID_COLUMN].iloc[-2:]) == ["first", "second"]
+
+    # Deleting one of them keeps the other
+    storage.write_log(log[log[ENTRY_ID_COLUMN] != "first"], LOG_FILE_NAME, revision, log)
+    log = storage.read_log(LOG_FILE_NAME)[0]
+    assert len(log) == (120 if kind == "drive" else 0) + 1
+    assert log[ENTRY_ID_COLUMN].iloc[-1] == "second"
+
+
+def test_entries_without_ids_keep_their_identical_twins():
+    # Files written before there were entry IDs
+    base = pd.concat([entry("2026-10-18 10:00:00")] * 2, ignore_index=True)
+    delta = entry("2026-10-18 10:00:00")
+    merged = merge_log_deltas(base, [delta, delta])
+    # Both sets of the base stay; the delta (first of its kind in its file) is the base's first one again
+    assert len(merged) == 2
+    assert merged[ENTRY_ID_COLUMN].is_unique
+
+
+def test_every_thread_sends_its_requests_on_its_own_connection(drive):
+    storage = backend(drive)
+    storage.fetch_log(LOG_FILE_NAME)
+    drive.reset_counters()
+
+    def session(number):
+        storage.append(entry(f"2026-10-18 10:00:0{number}", number), LOG_FILE_NAME)
+        storage.get_log_revision(LOG_FILE_NAME)
+        storage.read_log_tail(LOG_FILE_NAME, 5)
+    threads = [threading.Thread(target=session, args=(number,), name=f"session-{number}") for number in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    connections = [drive.connections[thread.name] for thread in threads]
+    assert all(len(used) == 1 and None not in used for used in connections)
+    assert len(set.union(*connections)) == len(threads)
+
+
+# SQLite backend
+
+def test_sqlite_reads_agree_with_the_appended_entries(tmp_path):
+    storage = SQLiteBackend(str(tmp_path / "log.db"))
+    assert storage.read_log(LOG_FILE_NAME) == (None, None, [])
+    for day in range(1, 6):
+        storage.append(entry(f"2026-05-0{day} 08:00:00", day), LOG_FILE_NAME)
+
+    log, revision, deltas = storage.read_log(LOG_FILE_NAME)
+    assert log["Reps"].tolist() == [1, 2, 3, 4, 5]
+    assert deltas == [] and revision.delta_ids == frozenset()
+    assert storage.read_log_tail(LOG_FILE_NAME, 2)["Reps"].tolist() == [4, 5]
+    assert storage.read_log_range(LOG_FILE_NAME, "2026-05-02", "2026-05-04")["Reps"].tolist() == [2, 3]
+    # Another process (own backend, own cache) sees the same log
+    assert SQLiteBackend(str(tmp_path / "log.db")).read_log(LOG_FILE_NAME)[0].equals(log)
+
+
+def test_sqlite_append_reports_whether_the_caller_is_current(tmp_path):
+    storage = SQLiteBackend(str(tmp_path / "log.db"))
+    storage.append(entry("2026-05-01 08:00:00"), LOG_FILE_NAME)
+    log, revision, deltas = storage.read_log(LOG_FILE_NAME)
+    current = storage.append(entry("2026-05-01 09:00:00"), LOG_FILE_NAME, revision)
+    assert current == storage.get_log_revision(LOG_FILE_NAME)[0]
+    # Based on an older revision: somebody else wrote in between, the caller has to reload
+    assert storage.append(entry("2026-05-01 10:00:00"), LOG_FILE_NAME, revision) is None
+
+
+def test_sqlite_rewrite_keeps_concurrent_appends(tmp_path):
+    storage = SQLiteBackend(str(tmp_path / "log.db"))
+    for hour in range(3):
+        storage.append(entry(f"2026-05-01 0{hour}:00:00", hour + 1), LOG_FILE_NAME)
+    original, revision, deltas = storage.read_log(LOG_FILE_NAME)
+    # Somebody else logs a set after `original` was read
+    SQLiteBackend(str(tmp_path / "log.db")).append(entry("2026-05-01 09:00:00", 33, "bob"), LOG_FILE_NAME)
+
+    written, written_revision = storage.write_log(original.iloc[1:], LOG_FILE_NAME, revision, original)
+    assert written["Reps"].tolist() == [2, 3, 33]
+    assert written_revision == storage.get_log_revision(LOG_FILE_NAME)[0]
+
+
+def test_sqlite_databases_without_entry_ids_get_one_per_row(tmp_path):
+    path = str(tmp_path / "log.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE log_entries (id INTEGER PRIMARY KEY, log_name TEXT NOT NULL, "
+                     "Timestamp TEXT NOT NULL, Pushups INTEGER NOT NULL, User TEXT NOT NULL, comment TEXT)")
+        conn.execute("CREATE TABLE log_versions (log_name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        conn.executemany("INSERT INTO log_entries (log_name, Timestamp, Pushups, User) VALUES (?, ?, ?, ?)",
+                         [(LOG_FILE_NAME, "2026-05-01 08:00:00", 10, "alice")] * 2)
+        conn.execute("INSERT INTO log_versions VALUES (?, 1)", (LOG_FILE_NAME,))
+    conn.close()
+
+    log, revision, deltas = SQLiteBackend(path).read_log(LOG_FILE_NAME)
+    assert log[ENTRY_ID_COLUMN].tolist() == ["row-1", "row-2"]
+    assert log["Reps"].tolist() == [10, 10]
+
+
+def test_sqlite_stores_other_files_as_blobs(tmp_path):
+    storage = SQLiteBackend(str(tmp_path / "log.db"))
+    manifest = pd.DataFrame({"Season": ["2026"], "Log": [LOG_FILE_NAME], "Start": ["2026-01-01"], "End": ["2026-12-31"]})
+    first = storage.push(manifest, MANIFEST_NAME)
+    second = storage.push(manifest.assign(End="2027-01-31"), MANIFEST_NAME)
+    assert second != first
+    assert SQLiteBackend(str(tmp_path / "log.db")).fetch(MANIFEST_NAME)["End"].tolist() == ["2027-01-31"]
+    assert storage.fetch_tail(MANIFEST_NAME, 1)["Season"].tolist() == [2026]
+    storage.delete_file(MANIFEST_NAME)
+    assert storage.fetch(MANIFEST_NAME) is None
+
+
+# Parquet files
+
+# Function to load a sample log the way the app gets it from a CSV file
+def loaded_sample(days):
+    """
+    :return: DataFrame with the sample log's entries
+    """
+    return deserialize_frame(io.BytesIO(sample_log(days, 4, ["alice", "bob"]).to_csv(index=False).encode()),
+                             LOG_FILE_NAME)
+
+
+def test_parquet_round_trip_keeps_entries_and_types():
+    log = typed_log(with_entry_ids(loaded_sample(10)))
+    content, mimetype = serialize_frame(log, "pushup_log.parquet")
+    assert mimetype == "application/vnd.apache.parquet"
+    # Stored under the column's old name, like the CSV files
+    assert STORED_REPS_COLUMN in pd.read_parquet(io.BytesIO(content)).columns
+
+    loaded = deserialize_frame(io.BytesIO(content), "pushup_log.parquet")
+    assert list(loaded.columns) == list(log.columns)
+    assert pd.api.types.is_datetime64_any_dtype(loaded["Timestamp"])
+    assert loaded["Timestamp"].equals(log["Timestamp"])
+    assert loaded["Reps"].tolist() == log["Reps"].tolist()
+    assert loaded["User"].tolist() == log["User"].tolist()
+    assert loaded[ENTRY_ID_COLUMN].tolist() == log[ENTRY_ID_COLUMN].tolist()
+
+
+def test_parquet_log_takes_csv_deltas(drive):
+    log = loaded_sample(30)
+    drive.add_file("pushup_log.parquet", serialize_frame(log, "pushup_log.parquet")[0])
+    storage = backend(drive)
+    storage.append(entry("2026-10-18 10:00:00", 33, "bob"), "pushup_log.parquet")
+
+    merged, revision = backend(drive).fetch_log("pushup_log.parquet")
+    assert len(merged) == len(log) + 1
+    assert pd.api.types.is_datetime64_any_dtype(merged["Timestamp"])
+    assert merged["Reps"].iloc[-1] == 33
+    assert merged["Timestamp"].iloc[-1] == pd.Timestamp("2026-10-18 10:00:00")
+
+    # Compacting writes the Parquet base again, and reading it back gives the same log
+    storage.compact_log("pushup_log.parquet")
+    compacted, revision = backend(drive).fetch_log("pushup_log.parquet")
+    assert revision.delta_ids == frozenset()
+    assert log_row_keys(compacted).tolist() == log_row_keys(merged).tolist()
@@ -0,0 +1,119 @@
+# Journal, replay and drain of the sync queue, against the local backend
+import json
+
+import pandas as pd
+import pytest
+
+import sync_queue
+from shared_log import SharedLog
+from storage import ENTRY_ID_COLUMN, LocalBackend
+from sync_queue import SyncQueue
+
+LOG_FILE_NAME = "pushup_log.csv"
+
+
+# Function to build one log entry
+def entry(timestamp, pushups=10, user="alice"):
+    """
+    :return: DataFrame with one entry (as the app submits it)
+    """
+    return pd.DataFrame({"Timestamp": [timestamp], "Reps": [pushups], "User": [user], "comment": [None]})
+
+
+# Storage that fails like the real one does: unreachable for a while, or rejecting certain entries for good
+class FlakyBackend(LocalBackend):
+    def __init__(self, directory, outages=0, rejected_user=None):
+        """
+        :param directory: Directory holding the files
+        :param outages: Number of appends that fail because the storage is unreachable
+        :param rejected_user: User whose entries are always rejected
+        """
+        super().__init__(directory)
+        self.outages = outages
+        self.rejected_user = rejected_user
+
+    def append(self, new_entry, log_name, based_on=None):
+        if self.outages:
+            self.outages -= 1
+            raise ConnectionError("storage unreachable")
+        if self.rejected_user is not None and (new_entry["User"] == self.rejected_user).any():
+            raise ValueError(f"malformed entry for {self.rejected_user}")
+        return super().append(new_entry, log_name, based_on)
+
+
+# Function to read the journal lines
+def journal_lines(path):
+    """
+    :return: List of the journal's records
+    """
+    with open(path, encoding="utf-8") as journal:
+        return [json.loads(line) for line in journal if line.strip()]
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "sync_journal.jsonl")
+
+
+def test_submitted_entries_reach_the_storage_and_the_journal_is_emptied(tmp_path, journal_path):
+    storage = LocalBackend(str(tmp_path / "drive"))
+    queue = SyncQueue(storage, journal_path, retry_delay=0.01)
+    submitted = pd.concat([queue.submit(entry(f"2026-05-0{day} 08:00:00"), LOG_FILE_NAME) for day in range(1, 4)])
+
+    assert queue.flush(timeout=10)
+    log, _ = storage.fetch_log(LOG_FILE_NAME)
+    assert list(log[ENTRY_ID_COLUMN]) == list(submitted[ENTRY_ID_COLUMN])
+    assert journal_lines(journal_path) == []
+    assert queue.stats()["synced"] == 3
+
+
+def test_unsynced_entries_are_replayed_after_a_restart(tmp_path, journal_path):
+    # The storage stays unreachable for the first queue, its entries only live in the journal
+    storage = FlakyBackend(str(tmp_path / "drive"), outages=10 ** 6)
+    queue = SyncQueue(storage, journal_path, retry_delay=60)
+    submitted = queue.submit(entry("2026-05-01 08:00:00"), LOG_FILE_NAME)
+    assert [record["id"] for record in journal_lines(journal_path)] == list(submitted[ENTRY_ID_COLUMN])
+
+    restarted = SyncQueue(LocalBackend(str(tmp_path / "drive")), journal_path, retry_delay=0.01)
+    assert list(restarted.pending_entries(LOG_FILE_NAME)[ENTRY_ID_COLUMN]) == list(submitted[ENTRY_ID_COLUMN])
+    assert restarted.flush(timeout=10)
+    log, _ = restarted.storage.fetch_log(LOG_FILE_NAME)
+    assert list(log[ENTRY_ID_COLUMN]) == list(submitted[ENTRY_ID_COLUMN])
+
+
+def test_outages_are_retried_until_the_entries_go_through(tmp_path, journal_path):
+    storage = FlakyBackend(str(tmp_path / "drive"), outages=3)
+    queue = SyncQueue(storage, journal_path, retry_delay=0.01)
+    queue.submit(entry("2026-05-01 08:00:00"), LOG_FILE_NAME)
+
+    assert queue.flush(timeout=10)
+    assert queue.stats()["failures"] == 3
+    assert queue.dead_letters() == []
+
+
+def test_a_rejected_entry_is_set_aside_and_the_later_ones_still_sync(tmp_path, journal_path, monkeypatch):
+    monkeypatch.setattr(sync_queue, "SYNC_MAX_ATTEMPTS", 2)
+    storage = FlakyBackend(str(tmp_path / "drive"), rejected_user="mallory")
+    storage.append(entry("2026-04-30 08:00:00"), LOG_FILE_NAME)
+    shared_log = SharedLog(storage, LOG_FILE_NAME, check_interval=3600)
+    queue = SyncQueue(storage, journal_path, retry_delay=0.01)
+    queue.register(shared_log)
+    shared_log.snapshot()
+
+    for timestamp, user in [("2026-05-01 08:00:00", "alice"), ("2026-05-01 09:00:00", "mallory"),
+                            ("2026-05-01 10:00:00", "bob")]:
+        shared_log.add_entries(queue.submit(entry(timestamp, user=user), LOG_FILE_NAME))
+
+    assert queue.flush(timeout=10)
+    log, _ = storage.fetch_log(LOG_FILE_NAME)
+    assert sorted(log["User"]) == ["alice", "alice", "bob"]
+    # The set is kept in the dead-letter file, and no longer shown in the log
+    assert [letter["entry"]["User"] for letter in queue.dead_letters()] == ["mallory"]
+    assert "malformed entry" in queue.dead_letters()[0]["error"]
+    assert "mallory" not in set(shared_log.snapshot()[0]["User"])
+    assert queue.stats()["dead_letters"] == 1
+
+    # Set aside for good: nothing is replayed after a restart, the dead letters are still reported
+    restarted = SyncQueue(storage, journal_path, retry_delay=0.01)
+    assert restarted.backlog() == 0
+    assert [letter["entry"]["User"] for letter in restarted.dead_letters()] == ["mallory"]